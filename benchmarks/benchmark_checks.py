@@ -0,0 +1,404 @@
+"""Benchmark the whole check flow against simulated instruments.
+
+Creates N throwaway git repositories (an origin plus one clone per instrument, with
+the requested divergence and uncommitted diff), serves them with
+simulated_instruments.py, stands in a fake CS:INSTLIST PV and a fake gitweb version
+endpoint, and runs RepoChecker.check_instruments() against them. Reports wall time,
+per-host latency percentiles, SSH round trips and connections, and peak memory.
+
+Usage:
+    python benchmarks/benchmark_checks.py --instruments 50 --latency 0.05
+
+Settings for the checker itself are passed with --env, e.g.
+    --env CHECK_ENGINE=async --env BATCHED_PROBE=true
+"""
+
+import argparse
+import binascii
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+
+def _git(repo_dir: str, *args: str) -> None:
+    subprocess.run(
+        ["git", *args],
+        cwd=repo_dir,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def _commit(repo_dir: str, file_name: str, message: str) -> None:
+    with open(os.path.join(repo_dir, file_name), "a", encoding="utf-8") as file:
+        file.write(f"{message}\n")
+    _git(repo_dir, "add", file_name)
+    _git(repo_dir, "commit", "-q", "-m", message)
+
+
+def make_repos(
+    root: str,
+    count: int,
+    local_commits: int,
+    upstream_commits: int,
+    diff_lines: int,
+) -> List[str]:
+    """Create an origin and a diverged clone of it for each simulated instrument.
+
+    Args:
+        root (str): The directory to create the repositories in.
+        count (int): The number of instruments.
+        local_commits (int): Commits on each instrument that aren't on origin.
+        upstream_commits (int): Commits on origin that aren't on the instruments.
+        diff_lines (int): Lines of uncommitted changes on each instrument.
+
+    Returns:
+        list: The repository directory of each instrument.
+
+    """
+    seed = os.path.join(root, "seed")
+    origin = os.path.join(root, "origin.git")
+    os.makedirs(seed)
+    _git(seed, "init", "-q", "-b", "main")
+    _git(seed, "config", "user.email", "benchmark@localhost")
+    _git(seed, "config", "user.name", "benchmark")
+    _commit(seed, "config.txt", "initial")
+    _git(root, "clone", "-q", "--bare", seed, origin)
+
+    template = os.path.join(root, "template")
+    _git(root, "clone", "-q", origin, template)
+    _git(template, "config", "user.email", "benchmark@localhost")
+    _git(template, "config", "user.name", "benchmark")
+    for i in range(local_commits):
+        _commit(template, "local.txt", f"Hotfix: local change {i}")
+    if diff_lines:
+        with open(os.path.join(template, "config.txt"), "a", encoding="utf-8") as file:
+            file.writelines(f"uncommitted line {i}\n" for i in range(diff_lines))
+
+    for i in range(upstream_commits):
+        _commit(seed, "config.txt", f"upstream change {i}")
+    _git(seed, "push", "-q", origin, "main")
+
+    repos = []
+    for i in range(count):
+        repo = os.path.join(root, f"inst_{i}")
+        shutil.copytree(template, repo, symlinks=True)
+        repos.append(repo)
+    return repos
+
+
+def instrument_addresses(count: int) -> List[str]:
+    """Get a distinct loopback address for each simulated instrument.
+
+    Args:
+        count (int): The number of instruments.
+
+    Returns:
+        list: The addresses, starting at 127.0.1.2.
+
+    """
+    return [f"127.0.{1 + i // 250}.{2 + i % 250}" for i in range(count)]
+
+
+class FakeGitweb:
+    """Serves each instrument's config_version.txt the way gitweb does, with ETags."""
+
+    def __init__(self, versions: Dict[str, str]) -> None:
+        """Initialize the FakeGitweb object.
+
+        Args:
+            versions (dict): The version string of each instrument keyed by hostname.
+
+        """
+        self.requests = 0
+
+        gitweb = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                gitweb.requests += 1
+                hostname = self.path.rsplit("/", 1)[-1]
+                version = versions.get(hostname)
+                if version is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{version}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = version.encode("utf-8")
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        """Stop serving.
+
+        Returns:
+            None
+
+        """
+        self._server.shutdown()
+
+
+def start_simulator(
+    addresses: List[str],
+    repos: List[str],
+    port: int,
+    latency: float,
+    failure_rate: float,
+    drop_rate: float = 0.0,
+    hang: List[str] = (),
+) -> subprocess.Popen:
+    """Start the simulated instruments in their own process.
+
+    They run in a separate process so their CPU and memory aren't counted against
+    the checker.
+
+    Args:
+        addresses (list): The address of each instrument.
+        repos (list): The repository of each instrument.
+        port (int): The SSH port to listen on.
+        latency (float): Seconds added to each command.
+        failure_rate (float): The fraction of commands that fail outright.
+        drop_rate (float): The fraction of commands whose connection is dropped.
+        hang (list): The addresses of instruments whose commands never finish.
+
+    Returns:
+        subprocess.Popen: The simulator process, terminate it to stop it.
+
+    """
+    simulator = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(BENCHMARK_DIR, "simulated_instruments.py"),
+            "--port",
+            str(port),
+            "--latency",
+            str(latency),
+            "--failure-rate",
+            str(failure_rate),
+            "--drop-rate",
+            str(drop_rate),
+            *[f"--hang={address}" for address in hang],
+            *[f"{address}={repo}" for address, repo in zip(addresses, repos)],
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # the simulator prints a line once every instrument is listening
+    simulator.stdout.readline()
+    return simulator
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of some values, by the nearest rank.
+
+    Args:
+        values (list): The values.
+        fraction (float): The percentile as a fraction, e.g. 0.9.
+
+    Returns:
+        float: The percentile, or 0 if there are no values.
+
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def encode_inst_list(instruments: List[Dict]) -> str:
+    """Encode an instrument list the way the CS:INSTLIST PV holds it.
+
+    Args:
+        instruments (list): The instruments.
+
+    Returns:
+        str: The hex of the zlib compressed JSON.
+
+    """
+    return binascii.hexlify(
+        zlib.compress(json.dumps(instruments).encode("utf-8"))
+    ).decode("ascii")
+
+
+def run_checks(addresses: List[str], gitweb_url: str) -> Dict:
+    """Run the whole check flow in this process and measure it.
+
+    The environment must already be set up for the checker.
+
+    Args:
+        addresses (list): The hostnames of the simulated instruments.
+        gitweb_url (str): The URL of the fake gitweb.
+
+    Returns:
+        dict: The measurements.
+
+    """
+    from utils.communication_utils import config_version_access
+    from utils.communication_utils.channel_access import ChannelAccessUtils
+    from utils.hotfix_utils.RepoChecker import RepoChecker
+    from utils.jenkins_utils.timing_utils import timings
+
+    config_version_access.CONFIG_VERSION_URL = gitweb_url
+    inst_list = encode_inst_list(
+        [
+            {"name": f"NDXSIM{i}", "hostName": address, "seci": False}
+            for i, address in enumerate(addresses)
+        ]
+    )
+    ChannelAccessUtils.get_value = lambda self, pv: (
+        inst_list if pv == "CS:INSTLIST" else None
+    )
+
+    start = time.perf_counter()
+    try:
+        RepoChecker().check_instruments()
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code
+    wall_time = time.perf_counter() - start
+
+    records = timings.records()
+    host_totals = [summary["total"] for summary in timings.host_summaries().values()]
+    peak_memory = None
+    if resource is not None:
+        # kilobytes on Linux
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "wall_time": round(wall_time, 3),
+        "exit_code": exit_code,
+        "hosts": len(host_totals),
+        "host_p50": round(percentile(host_totals, 0.5), 3),
+        "host_p90": round(percentile(host_totals, 0.9), 3),
+        "host_p99": round(percentile(host_totals, 0.99), 3),
+        "host_max": round(max(host_totals, default=0.0), 3),
+        "round_trips": sum(1 for record in records if record["phase"] == "exec"),
+        "connections": sum(
+            1
+            for record in records
+            if record["operation"] == "ssh" and record["phase"] == "auth"
+        ),
+        "peak_memory_kb": peak_memory,
+    }
+
+
+def main() -> None:
+    """Set up the simulated instruments, run the benchmark and print the report.
+
+    Returns:
+        None
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--instruments", type=int, default=10)
+    parser.add_argument("--port", type=int, default=2223)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--local-commits", type=int, default=1)
+    parser.add_argument("--upstream-commits", type=int, default=1)
+    parser.add_argument("--diff-lines", type=int, default=10)
+    parser.add_argument("--version", default="21.0.0")
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        help="KEY=VALUE checker setting, may be given more than once",
+    )
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the temp dir")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="hotfix_benchmark_")
+    addresses = instrument_addresses(args.instruments)
+    print(f"INFO: Creating {args.instruments} repositories in {root}")
+    repos = make_repos(
+        root,
+        args.instruments,
+        args.local_commits,
+        args.upstream_commits,
+        args.diff_lines,
+    )
+
+    os.environ.update(
+        {
+            "REPO_DIR": "C:\\Instrument\\Settings\\config\\",
+            "UPSTREAM_BRANCH_CONFIG": "main",
+            "WORKSPACE": os.path.join(root, "workspace"),
+            "SSH_CREDENTIALS_USR": "benchmark",
+            "SSH_CREDENTIALS_PSW": "benchmark",
+            "USE_TEST_INSTRUMENT_LIST": "false",
+            "TEST_INSTRUMENT_LIST": "",
+            "DEBUG_MODE": "false",
+            "SHOW_UNCOMMITTED_CHANGES_MESSAGES": "false",
+            "SSH_PORT": str(args.port),
+        }
+    )
+    for setting in args.env:
+        key, _, value = setting.partition("=")
+        os.environ[key] = value
+
+    gitweb = FakeGitweb({address: args.version for address in addresses})
+    simulator = start_simulator(
+        addresses,
+        repos,
+        args.port,
+        args.latency,
+        args.failure_rate,
+        args.drop_rate,
+    )
+    try:
+        report = run_checks(addresses, gitweb.url)
+    finally:
+        simulator.terminate()
+        simulator.wait()
+        gitweb.close()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report["settings"] = {
+        "instruments": args.instruments,
+        "latency": args.latency,
+        "failure_rate": args.failure_rate,
+        "drop_rate": args.drop_rate,
+        "env": args.env,
+    }
+    print("INFO: Benchmark results")
+    for key, value in report.items():
+        print(f"INFO:   {key}: {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
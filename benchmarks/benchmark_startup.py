@@ -0,0 +1,173 @@
+"""Benchmark how long the checker takes to start on a test instrument list.
+
+Starts a fresh interpreter several times, each one importing hotfix_checker and
+making a RepoChecker with USE_TEST_INSTRUMENT_LIST set, which is everything a run
+does before it connects to its first instrument. Reports the median and slowest
+times for the whole process, the import and the setup, and which of the slow to
+load Channel Access, HTTP and asyncssh modules were loaded, none should be until
+the run needs them.
+
+Usage:
+    python benchmarks/benchmark_startup.py --repeat 10 --max-seconds 1
+
+Exits with 1 if the median start up time is over --max-seconds or any of those
+modules were loaded, so it can be run as a check.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+# Modules that should only be loaded once a run needs them
+LAZY_MODULES = ("genie_python", "CaChannel", "requests", "packaging", "asyncssh")
+
+# Run in the fresh interpreter, prints the in process timings as JSON
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import hotfix_checker
+imported = time.perf_counter()
+from utils.hotfix_utils.RepoChecker import RepoChecker
+from utils.settings import get_settings
+get_settings().require_for_check()
+RepoChecker()
+ready = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "setup": ready - imported,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def time_startup(env: Dict[str, str]) -> Dict:
+    """Start a fresh interpreter and time how long the checker takes to get ready.
+
+    Args:
+        env (dict): The environment to start it with.
+
+    Returns:
+        dict: The "total", "import" and "setup" times in seconds and the "loaded"
+            modules.
+
+    Raises:
+        RuntimeError: If the interpreter doesn't start the checker.
+
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT % (LAZY_MODULES,)],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    total = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"The checker didn't start:\n{process.stderr}")
+    timing = json.loads(process.stdout.strip().splitlines()[-1])
+    timing["total"] = total
+    return timing
+
+
+def summarise(timings: List[Dict], key: str) -> Dict[str, float]:
+    """Get the median and slowest of one of the times.
+
+    Args:
+        timings (list): The timings of each start.
+        key (str): The time, "total", "import" or "setup".
+
+    Returns:
+        dict: The "median" and "max" in seconds.
+
+    """
+    values = [timing[key] for timing in timings]
+    return {
+        "median": round(statistics.median(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def main() -> None:
+    """Time the start up and print the report.
+
+    Returns:
+        None
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--instruments",
+        default="NDXSCIDEMO",
+        help="comma separated TEST_INSTRUMENT_LIST to start with",
+    )
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        help="KEY=VALUE checker setting, may be given more than once",
+    )
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="hotfix_startup_") as workspace:
+        env = dict(os.environ)
+        env.update(
+            {
+                "REPO_DIR": "C:\\Instrument\\Settings\\config\\",
+                "UPSTREAM_BRANCH_CONFIG": "main",
+                "WORKSPACE": workspace,
+                "SSH_CREDENTIALS_USR": "benchmark",
+                "SSH_CREDENTIALS_PSW": "benchmark",
+                "USE_TEST_INSTRUMENT_LIST": "true",
+                "TEST_INSTRUMENT_LIST": args.instruments,
+                "DEBUG_MODE": "false",
+            }
+        )
+        for setting in args.env:
+            key, _, value = setting.partition("=")
+            env[key] = value
+
+        timings = [time_startup(env) for _ in range(args.repeat)]
+
+    loaded = sorted({name for timing in timings for name in timing["loaded"]})
+    report = {
+        "total": summarise(timings, "total"),
+        "import": summarise(timings, "import"),
+        "setup": summarise(timings, "setup"),
+        "loaded": loaded,
+        "settings": {"repeat": args.repeat, "env": args.env},
+    }
+    print("INFO: Start up benchmark results")
+    for key, value in report.items():
+        print(f"INFO:   {key}: {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=1)
+
+    exit_code = 0
+    if report["total"]["median"] > args.max_seconds:
+        print(
+            f"ERROR: Median start up of {report['total']['median']}s is over "
+            f"{args.max_seconds}s"
+        )
+        exit_code = 1
+    if loaded:
+        print(f"ERROR: Modules loaded before they were needed: {', '.join(loaded)}")
+        exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
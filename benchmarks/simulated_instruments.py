@@ -0,0 +1,370 @@
+"""A local SSH server that stands in for instrument machines.
+
+Each simulated instrument is a loopback address (127.0.0.2, 127.0.0.3, ...) mapped
+to a local git repository. Commands arrive as the cmd.exe command lines the checker
+sends to real instruments, and are run by a small interpreter that understands
+the parts of cmd.exe syntax the checker uses (cd /d, &, &&, ||, |, brackets,
+^ escapes, redirects to nul, echo, findstr and cmd /c). Everything else, i.e. git,
+is run as a real process in the instrument's repository.
+
+Usage:
+    python benchmarks/simulated_instruments.py --port 2222 127.0.0.2=/tmp/repo_a
+
+then run the checker with SSH_PORT=2222 and TEST_INSTRUMENT_LIST=127.0.0.2.
+"""
+
+import argparse
+import asyncio
+import random
+import re
+from typing import Dict, List, Tuple
+
+import asyncssh
+
+NULL = "nul"
+OPERATORS = ("&&", "||", "&", "|", "(", ")")
+
+
+class SimulatedInstrument(object):
+    """A simulated instrument: an address to listen on and a repository to serve."""
+
+    def __init__(
+        self,
+        address: str,
+        repo_dir: str,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        hang: bool = False,
+    ) -> None:
+        """Initialize the SimulatedInstrument object.
+
+        Args:
+            address (str): The loopback address the instrument answers on.
+            repo_dir (str): The local git repository standing in for the repo dir.
+            latency (float): Seconds added before each command's output is sent.
+            failure_rate (float): The fraction of commands that fail outright.
+            drop_rate (float): The fraction of commands whose connection is dropped
+                before they answer.
+            hang (bool): Whether commands never finish, like a git fetch stuck on
+                a network share that has gone away.
+
+        """
+        self.address = address
+        self.repo_dir = repo_dir
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.hang = hang
+        self.commands_run = 0
+
+
+class MiniCmd(object):
+    """A tiny interpreter for the subset of cmd.exe the checker sends."""
+
+    def __init__(self, cwd: str) -> None:
+        """Initialize the MiniCmd object.
+
+        Args:
+            cwd (str): The directory to run commands in.
+
+        """
+        self._cwd = cwd
+
+    async def run(self, command: str) -> Tuple[bytes, bytes, int]:
+        """Run a command line.
+
+        Args:
+            command (str): The cmd.exe command line.
+
+        Returns:
+            tuple: stdout, stderr and exit code.
+
+        """
+        match = re.match(r'^cmd\s+((?:/\S+\s+)*)/c\s+"(.*)"\s*(\S*)\s*$', command, re.S)
+        if match:
+            out, err, code = await self.run(match.group(2))
+            if match.group(3) == "2>&1":
+                out, err = out + err, b""
+            return out, err, code
+
+        tokens = MiniCmd._tokenize(command)
+        node, position = self._parse_sequence(tokens, 0)
+        if position != len(tokens):
+            return b"", f"unexpected {tokens[position]}\r\n".encode(), 1
+        return await self._execute(node, b"")
+
+    @staticmethod
+    def _tokenize(command: str) -> List[Tuple[str, str]]:
+        tokens = []
+        depth = 0
+        i = 0
+        while i < len(command):
+            char = command[i]
+            if char.isspace():
+                i += 1
+                continue
+            redirect = re.match(r"([12]?)>(&1|[^\s()&|]+)", command[i:])
+            if redirect and (i == 0 or command[i - 1].isspace() or char == ">"):
+                fd = redirect.group(1) or "1"
+                tokens.append(("redirect", f"{fd}>{redirect.group(2)}"))
+                i += redirect.end()
+                continue
+            operator = next((op for op in OPERATORS if command.startswith(op, i)), None)
+            if operator == ")" and depth == 0:
+                operator = None
+            if operator is not None:
+                depth += {"(": 1, ")": -1}.get(operator, 0)
+                tokens.append(("op", operator))
+                i += len(operator)
+                continue
+            word = ""
+            in_quotes = False
+            while i < len(command):
+                char = command[i]
+                if char == '"':
+                    in_quotes = not in_quotes
+                elif not in_quotes and char == "^" and i + 1 < len(command):
+                    # a caret outside quotes makes the next character literal
+                    i += 1
+                    char = command[i]
+                elif not in_quotes and (
+                    char.isspace()
+                    or char in "&|("
+                    or (char == ")" and depth > 0)
+                    or char == ">"
+                ):
+                    break
+                word += char
+                i += 1
+            tokens.append(("word", word))
+        return tokens
+
+    def _parse_sequence(self, tokens: List, position: int) -> Tuple[tuple, int]:
+        node, position = self._parse_condition(tokens, position)
+        while position < len(tokens) and tokens[position] == ("op", "&"):
+            right, position = self._parse_condition(tokens, position + 1)
+            node = ("&", node, right)
+        return node, position
+
+    def _parse_condition(self, tokens: List, position: int) -> Tuple[tuple, int]:
+        node, position = self._parse_pipe(tokens, position)
+        while position < len(tokens) and tokens[position] in (
+            ("op", "&&"),
+            ("op", "||"),
+        ):
+            operator = tokens[position][1]
+            right, position = self._parse_pipe(tokens, position + 1)
+            node = (operator, node, right)
+        return node, position
+
+    def _parse_pipe(self, tokens: List, position: int) -> Tuple[tuple, int]:
+        node, position = self._parse_unit(tokens, position)
+        while position < len(tokens) and tokens[position] == ("op", "|"):
+            right, position = self._parse_unit(tokens, position + 1)
+            node = ("|", node, right)
+        return node, position
+
+    def _parse_unit(self, tokens: List, position: int) -> Tuple[tuple, int]:
+        redirects = []
+        if position < len(tokens) and tokens[position] == ("op", "("):
+            node, position = self._parse_sequence(tokens, position + 1)
+            position += 1  # closing bracket
+        else:
+            words = []
+            while position < len(tokens) and tokens[position][0] != "op":
+                kind, value = tokens[position]
+                (words if kind == "word" else redirects).append(value)
+                position += 1
+            node = ("simple", words)
+        while position < len(tokens) and tokens[position][0] == "redirect":
+            redirects.append(tokens[position][1])
+            position += 1
+        if redirects:
+            node = ("redirect", node, redirects)
+        return node, position
+
+    async def _execute(self, node: tuple, stdin: bytes) -> Tuple[bytes, bytes, int]:
+        kind = node[0]
+        if kind == "&":
+            out1, err1, _ = await self._execute(node[1], stdin)
+            out2, err2, code = await self._execute(node[2], stdin)
+            return out1 + out2, err1 + err2, code
+        if kind in ("&&", "||"):
+            out, err, code = await self._execute(node[1], stdin)
+            if (code == 0) == (kind == "&&"):
+                out2, err2, code = await self._execute(node[2], stdin)
+                out, err = out + out2, err + err2
+            return out, err, code
+        if kind == "|":
+            out, err, _ = await self._execute(node[1], stdin)
+            out2, err2, code = await self._execute(node[2], out)
+            return out2, err + err2, code
+        if kind == "redirect":
+            out, err, code = await self._execute(node[1], stdin)
+            for redirect in node[2]:
+                fd, target = redirect.split(">", 1)
+                if target == "&1" and fd == "2":
+                    out, err = out + err, b""
+                elif target.lower() == NULL:
+                    out, err = (b"", err) if fd == "1" else (out, b"")
+            return out, err, code
+        return await self._execute_simple(node[1], stdin)
+
+    async def _execute_simple(
+        self, words: List[str], stdin: bytes
+    ) -> Tuple[bytes, bytes, int]:
+        if not words:
+            return b"", b"", 0
+        name = words[0].lower()
+        if name == "cd":
+            return b"", b"", 0
+        if name == "echo":
+            return (" ".join(words[1:]) + "\r\n").encode(), b"", 0
+        if name == "findstr":
+            patterns = []
+            for word in words[1:]:
+                if word.lower().startswith("/c:"):
+                    patterns.append(word[3:].strip('"'))
+                elif not word.startswith("/"):
+                    patterns.extend(word.strip('"').split(" "))
+            lines = [
+                line
+                for line in stdin.decode("utf-8", "replace").splitlines(keepends=True)
+                if any(pattern in line for pattern in patterns)
+            ]
+            return "".join(lines).encode(), b"", 0 if lines else 1
+
+        process = await asyncio.create_subprocess_exec(
+            *[word.replace('"', "") for word in words],
+            cwd=self._cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        out, err = await process.communicate(stdin)
+        return out, err, process.returncode
+
+
+class _SimulatedInstrumentServer(asyncssh.SSHServer):
+    def begin_auth(self, username: str) -> bool:
+        return True
+
+    def password_auth_supported(self) -> bool:
+        return True
+
+    def validate_password(self, username: str, password: str) -> bool:
+        return True
+
+
+async def start_server(
+    instruments: List[SimulatedInstrument], port: int
+) -> List[asyncssh.SSHAcceptor]:
+    """Start answering SSH connections for the simulated instruments.
+
+    Args:
+        instruments (list): The instruments to simulate.
+        port (int): The port to listen on.
+
+    Returns:
+        list: The listening servers, close them to stop.
+
+    """
+    by_address: Dict[str, SimulatedInstrument] = {
+        instrument.address: instrument for instrument in instruments
+    }
+
+    async def handle(process: asyncssh.SSHServerProcess) -> None:
+        instrument = by_address[process.get_extra_info("sockname")[0]]
+        instrument.commands_run += 1
+        if instrument.latency:
+            await asyncio.sleep(instrument.latency)
+        if instrument.hang:
+            # the channel stays open with no output and no EOF until the client
+            # gives up on it
+            await asyncio.Event().wait()
+        if random.random() < instrument.drop_rate:
+            process.get_extra_info("connection").abort()
+            return
+        if random.random() < instrument.failure_rate:
+            process.stderr.write("simulated failure\r\n")
+            process.exit(1)
+            return
+        out, err, code = await MiniCmd(instrument.repo_dir).run(process.command)
+        process.stdout.write(out.decode("utf-8", "replace"))
+        process.stderr.write(err.decode("utf-8", "replace"))
+        process.exit(code)
+
+    host_key = asyncssh.generate_private_key("ssh-ed25519")
+    return [
+        await asyncssh.create_server(
+            _SimulatedInstrumentServer,
+            instrument.address,
+            port,
+            server_host_keys=[host_key],
+            process_factory=handle,
+        )
+        for instrument in instruments
+    ]
+
+
+def main() -> None:
+    """Serve simulated instruments until interrupted.
+
+    Returns:
+        None
+
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to each command"
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="fraction of commands that fail outright",
+    )
+    parser.add_argument(
+        "--drop-rate",
+        type=float,
+        default=0.0,
+        help="fraction of commands whose connection is dropped before they answer",
+    )
+    parser.add_argument(
+        "--hang",
+        action="append",
+        default=[],
+        help="address of an instrument whose commands never finish",
+    )
+    parser.add_argument(
+        "instruments",
+        nargs="+",
+        help="address=repo_dir pairs, e.g. 127.0.0.2=/tmp/repo_a",
+    )
+    args = parser.parse_args()
+    instruments = [
+        SimulatedInstrument(
+            address,
+            repo_dir,
+            latency=args.latency,
+            failure_rate=args.failure_rate,
+            drop_rate=args.drop_rate,
+            hang=address in args.hang,
+        )
+        for address, repo_dir in (
+            instrument.split("=", 1) for instrument in args.instruments
+        )
+    ]
+
+    async def serve() -> None:
+        await start_server(instruments, args.port)
+        print(f"INFO: Serving {len(instruments)} simulated instruments on {args.port}")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
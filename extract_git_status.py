@@ -0,0 +1,84 @@
+"""Extracts git status artefacts saved with GIT_STATUS_STORE from their blobs.
+
+Examples:
+    python extract_git_status.py list
+    python extract_git_status.py show NDXALF
+    python extract_git_status.py extract --output git_status_text
+    python extract_git_status.py --dir archive/common/git_status extract NDXALF
+    python extract_git_status.py --dir b52/git_status --blobs b51/git_status/new_blobs
+        show NDXALF
+
+Each build only archives the blobs it stored first, in git_status/new_blobs, so
+reading an archived build's artefacts may need the new_blobs of earlier builds. On
+the agent the workspace has every blob.
+
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import find_dotenv, load_dotenv
+
+from utils.jenkins_utils.git_status_store import GitStatusStore
+from utils.settings import get_settings
+
+if __name__ == "__main__":
+    load_dotenv(find_dotenv())
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--dir",
+        default=os.path.join(get_settings().workspace or ".", "git_status"),
+        help="the git_status directory, by default the one in WORKSPACE",
+    )
+    parser.add_argument(
+        "--blobs",
+        action="append",
+        default=[],
+        help="another directory of blobs, e.g. an earlier build's new_blobs",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="the hosts with an artefact and their blobs")
+    show = commands.add_parser("show", help="print the artefact of a host")
+    show.add_argument("host")
+    extract = commands.add_parser(
+        "extract", help="write artefacts out as <host>.txt files"
+    )
+    extract.add_argument("hosts", nargs="*", help="the hosts, by default all of them")
+    extract.add_argument("--output", default=".", help="the directory to write them to")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        parser.error(f"no git_status directory at {args.dir}")
+    store = GitStatusStore(args.dir, args.blobs)
+
+    if args.command == "list":
+        for host in sorted(store.hostnames()):
+            manifest = store.manifest(host) or {}
+            print(
+                f"{host} {manifest.get('digest', '?')[:12]} "
+                f"{manifest.get('bytes', '?')} bytes, "
+                f"{manifest.get('stored', '?')} stored"
+                + (" (truncated)" if manifest.get("truncated") else "")
+                + ("" if store.has(host) else " (blob missing)")
+            )
+    elif args.command == "show":
+        if not store.extract(args.host, sys.stdout.buffer):
+            print(f"No git status artefact for {args.host}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        missing = []
+        for host in args.hosts or sorted(store.hostnames()):
+            path = os.path.join(args.output, f"{host}.txt")
+            with open(path + ".part", "wb") as file:
+                extracted = store.extract(host, file)
+            if extracted:
+                os.replace(path + ".part", path)
+                print(path)
+            else:
+                os.remove(path + ".part")
+                missing.append(host)
+        if missing:
+            print(f"No git status artefact for {', '.join(missing)}", file=sys.stderr)
+            sys.exit(1)
@@ -1,6 +1,17 @@
+REM reuse the virtual environment if it was made today from the same requirements,
+REM so the unpinned genie_python and CaChannel (and uv) are still updated daily.
+REM Delete .venv to make it again sooner
+if exist .venv\scripts\activate.bat (
+    (type "%~dp0\requirements.txt" & echo %DATE%) > .venv\requirements.new 2>nul
+    fc /b .venv\requirements.new .venv\requirements.txt >nul 2>&1 && (
+        call .venv\scripts\activate
+        goto :eof
+    )
+)
+
 CALL \\isis.cclrc.ac.uk\Shares\ISIS_Experiment_Controls_Public\ibex_utils\installation_and_upgrade\install_or_update_uv.bat
 
 set UV_PYTHON=3.11
 uv venv
 call .venv\scripts\activate
-uv pip install -r "%~dp0\requirements.txt"
+uv pip install -r "%~dp0\requirements.txt" && (type "%~dp0\requirements.txt" & echo %DATE%) > .venv\requirements.txt
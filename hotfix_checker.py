@@ -1,26 +1,39 @@
 """Creates a RepoChecker object and calls the check_instruments method to check for changes in the instruments repository."""
 
-import os
-
 from dotenv import find_dotenv, load_dotenv
 
-# Load environment variables from .env file
-load_dotenv(find_dotenv())
-
-# importing here so it doesn't set variables that are populated from env vars before actually having the env vars loaded
-# needed for when running locally to get the contents of a .env fil
-# Jenkins will have the env vars set in the pipeline
 from utils.hotfix_utils.RepoChecker import RepoChecker
+from utils.settings import get_settings
 
-if __name__ == "__main__":
-    if os.environ["DEBUG_MODE"] == "true":
+
+def main() -> None:
+    """Read the settings and check the instruments.
+
+    Channel Access, HTTP and asyncssh are only loaded once a check needs them, so a
+    run on a few instruments from TEST_INSTRUMENT_LIST starts quickly.
+
+    Returns:
+        None
+
+    """
+    # Load environment variables from a .env file when running locally, Jenkins
+    # sets them in the pipeline. Nothing reads them before get_settings() below.
+    load_dotenv(find_dotenv())
+    settings = get_settings()
+    settings.require_for_check()
+
+    if settings.debug_mode:
         print("INFO: Running in debug mode")
-        print(f"INFO: REPO_DIR: {os.environ['REPO_DIR']}")
-        print(f"INFO: UPSTREAM_BRANCH: {os.environ['UPSTREAM_BRANCH_CONFIG']}")
-        print(f"INFO: ARTEFACT_DIR: {os.environ['WORKSPACE']}")
-        print(f"INFO: USE_TEST_INSTRUMENT_LIST: {os.environ['USE_TEST_INSTRUMENT_LIST']}")
-        print(f"INFO: TEST_INSTRUMENT_LIST: {os.environ['TEST_INSTRUMENT_LIST']}")
-        print(f"INFO: DEBUG_MODE: {os.environ['DEBUG_MODE']}")
+        print(f"INFO: REPO_DIR: {settings.repo_dir}")
+        print(f"INFO: UPSTREAM_BRANCH: {settings.upstream_branch_config}")
+        print(f"INFO: ARTEFACT_DIR: {settings.workspace}")
+        print(f"INFO: USE_TEST_INSTRUMENT_LIST: {settings.use_test_instrument_list}")
+        print(f"INFO: TEST_INSTRUMENT_LIST: {','.join(settings.test_instrument_list)}")
+        print(f"INFO: DEBUG_MODE: {settings.debug_mode}")
 
     repo_checker = RepoChecker()
     repo_checker.check_instruments()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Merges the results of a run split into shards into one summary and exit code.
+
+Each shard is run with SHARD_INDEX and SHARD_COUNT set, in its own workspace. Point
+this at each shard's workspace (or its results_shard_*.json file) and it combines
+their results and git_status artefacts into WORKSPACE, prints the summary and exits
+with the code an unsharded run would have. With REPO_TARGETS set, the results of each
+target are merged from its directory in the shard workspaces.
+
+Example:
+    python merge_shard_results.py shard_0 shard_1 shard_2 shard_3
+
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+
+from dotenv import find_dotenv, load_dotenv
+
+from utils.hotfix_utils.RepoChecker import RepoChecker
+from utils.hotfix_utils.sharding import find_shard_results, merge_shard_results
+from utils.jenkins_utils.git_status_store import GitStatusStore
+
+if __name__ == "__main__":
+    load_dotenv(find_dotenv())
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "shards",
+        nargs="+",
+        help="shard workspaces or results_shard_*.json files",
+    )
+    args = parser.parse_args()
+
+    checker = RepoChecker()
+    exit_codes = {}
+    for target in checker.targets:
+        # each named target keeps its results in its own directory of a workspace
+        if target.name is None:
+            shards = args.shards
+        else:
+            shards = [os.path.join(shard, target.name) for shard in args.shards]
+        files = find_shard_results(shards)
+        try:
+            summary, instruments, seconds = merge_shard_results(files)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR: Could not merge the shard results: {str(e)}")
+            sys.exit(1)
+        print(
+            f"INFO: Merged {len(files)} shard results covering "
+            f"{len(instruments)} instruments"
+        )
+
+        artefact_dir = os.path.join(target.artefact_dir, "git_status")
+        GitStatusStore(artefact_dir).start_run()
+        for file_name in files:
+            shard_artefacts = os.path.join(os.path.dirname(file_name), "git_status")
+            if os.path.abspath(shard_artefacts) == os.path.abspath(artefact_dir):
+                continue
+            os.makedirs(artefact_dir, exist_ok=True)
+            for artefact in glob.glob(os.path.join(shard_artefacts, "*.txt")):
+                shutil.copy2(artefact, artefact_dir)
+            shard_store = GitStatusStore(shard_artefacts)
+            if os.path.isdir(shard_store.blobs_dir):
+                GitStatusStore(artefact_dir).copy_from(shard_store)
+
+        exit_codes[target.name] = checker.report_results(
+            summary, instruments, seconds, target
+        )
+
+    if len(checker.targets) > 1:
+        print(f"INFO: Exit code of each repository: {json.dumps(exit_codes)}")
+    sys.exit(max(exit_codes.values()))
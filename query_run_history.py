@@ -0,0 +1,69 @@
+"""Answers questions about previous runs from the run history in the workspace.
+
+Examples:
+    python query_run_history.py first-seen NDXALF 1a2b3c4
+    python query_run_history.py undeterminable --runs 3
+    python query_run_history.py changes
+
+"""
+
+import argparse
+import os
+
+from dotenv import find_dotenv, load_dotenv
+
+from utils.hotfix_utils.run_history import LOCAL, UPSTREAM, RunHistoryStore
+from utils.settings import get_settings
+
+if __name__ == "__main__":
+    load_dotenv(find_dotenv())
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--history",
+        default=os.path.join(get_settings().workspace or ".", "run_history.sqlite"),
+        help="the run history database, by default the one in WORKSPACE",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    first_seen = commands.add_parser(
+        "first-seen", help="the first run a commit was seen on a host"
+    )
+    first_seen.add_argument("host")
+    first_seen.add_argument("commit")
+    first_seen.add_argument(
+        "--upstream",
+        action="store_true",
+        help="look for a commit upstream but not on the host",
+    )
+    undeterminable = commands.add_parser(
+        "undeterminable", help="hosts undeterminable in each of the latest runs"
+    )
+    undeterminable.add_argument("--runs", type=int, default=3)
+    changes = commands.add_parser(
+        "changes", help="what changed between a run and the one before it"
+    )
+    changes.add_argument("--run", type=int, help="the run id, by default the latest")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.history):
+        parser.error(f"no run history at {args.history}")
+    history = RunHistoryStore(args.history)
+
+    if args.command == "first-seen":
+        seen = history.first_seen(
+            args.host, args.commit, UPSTREAM if args.upstream else LOCAL
+        )
+        if seen is None:
+            print(f"{args.commit} has not been seen on {args.host}")
+        else:
+            print(
+                f"{seen['hash']} {seen['subject']} first seen on {args.host} "
+                f"in run {seen['run_id']} at {seen['started']}"
+            )
+    elif args.command == "undeterminable":
+        for host in history.consecutive_undeterminable(args.runs):
+            print(host)
+    else:
+        for line in RunHistoryStore.change_lines(
+            history.changes_since_previous_run(args.run)
+        ):
+            print(line)
@@ -0,0 +1,204 @@
+"""Tests for building batched git probes and splitting their output back up."""
+
+import io
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from utils.hotfix_utils.batch_probe import (  # noqa: E402
+    SECTION_BEGIN,
+    SECTION_END,
+    GitProbeBatch,
+)
+
+
+def _batch(*names: str) -> GitProbeBatch:
+    """Make a batch with a placeholder command for each name.
+
+    Args:
+        *names (str): The section names.
+
+    Returns:
+        GitProbeBatch: The batch.
+
+    """
+    batch = GitProbeBatch("C:\\Instrument\\Apps\\EPICS\\")
+    for name in names:
+        batch.add(name, f"git {name}")
+    return batch
+
+
+def _output(*sections: tuple) -> str:
+    """Make the output the composite command would print.
+
+    Args:
+        *sections (tuple): (name, lines, return code) for each section.
+
+    Returns:
+        str: The output, with Windows line endings.
+
+    """
+    lines = []
+    for name, body, return_code in sections:
+        lines.append(f"{SECTION_BEGIN} {name}")
+        lines.extend(body)
+        lines.append(f"{SECTION_END} {name} {return_code}")
+    return "".join(line + "\r\n" for line in lines)
+
+
+def test_percent_signs_are_escaped() -> None:
+    """A git log format can't be expanded as cmd variables.
+
+    Returns:
+        None
+
+    """
+    batch = GitProbeBatch("C:\\Instrument\\Apps\\EPICS\\")
+    batch.add("log", "git log --format=%h%x20%s HEAD..origin/main")
+
+    command = batch.command()
+
+    assert "--format=^%h^%x20^%s " in command
+    assert "%h%" not in command
+
+
+def test_sections_are_split_by_markers() -> None:
+    """Each section gets its own lines and success.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("status", "log")
+    output = _output(
+        ("status", [" M file.txt", "?? new.txt"], 0),
+        ("log", ["abc1234 A commit"], 0),
+    )
+
+    results = batch.parse({"success": True, "output": output})
+
+    assert results == {
+        "status": {"success": True, "output": " M file.txt\n?? new.txt\n"},
+        "log": {"success": True, "output": "abc1234 A commit\n"},
+    }
+
+
+def test_empty_section_succeeds_with_empty_output() -> None:
+    """A command that prints nothing, e.g. a clean git status, still succeeds.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("status", "log")
+    output = _output(("status", [], 0), ("log", ["abc1234 A commit"], 0))
+
+    results = batch.parse({"success": True, "output": output})
+
+    assert results["status"] == {"success": True, "output": ""}
+    assert results["log"]["success"]
+
+
+def test_failed_section_does_not_fail_the_others() -> None:
+    """A non-zero exit only marks its own section as failed.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("fetch", "status")
+    output = _output(
+        ("fetch", ["fatal: unable to access 'origin'"], 1),
+        ("status", [" M file.txt"], 0),
+    )
+
+    results = batch.parse({"success": True, "output": output})
+
+    assert results["fetch"] == {
+        "success": False,
+        "output": "fatal: unable to access 'origin'\n",
+    }
+    assert results["status"] == {"success": True, "output": " M file.txt\n"}
+
+
+def test_section_without_end_marker_is_missing() -> None:
+    """A section cut off part way through is reported as failed.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("status", "diff")
+    output = _output(("status", [], 0)) + f"{SECTION_BEGIN} diff\r\n+a line\r\n"
+
+    results = batch.parse({"success": True, "output": output})
+
+    assert results["status"]["success"]
+    assert results["diff"] == {
+        "success": False,
+        "output": "missing from batched output",
+    }
+
+
+def test_failed_ssh_command_fails_every_section() -> None:
+    """Every section carries the SSH failure and its reason.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("status", "log")
+    ssh_process = {
+        "success": False,
+        "output": "127.0.0.9 is unreachable",
+        "reason": "unreachable",
+    }
+
+    results = batch.parse(ssh_process)
+
+    for name in ("status", "log"):
+        assert results[name] == {
+            "success": False,
+            "output": "127.0.0.9 is unreachable",
+            "reason": "unreachable",
+        }
+
+
+def test_stream_parser_handles_split_chunks_and_sinks() -> None:
+    """Markers and multi-byte characters split across chunks are reassembled.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("status", "diff")
+    sink = io.BytesIO()
+    parser = batch.stream_parser({"diff": sink})
+    raw = _output(("status", ["?? caf\u00e9.txt"], 0), ("diff", ["+a", "-b"], 0))
+    raw = raw.encode("utf-8")
+
+    for i in range(0, len(raw), 3):
+        parser.write(raw[i : i + 3])
+    results = parser.results({"success": True, "output": ""})
+
+    assert results["status"] == {"success": True, "output": "?? caf\u00e9.txt\n"}
+    assert results["diff"] == {"success": True, "output": ""}
+    assert sink.getvalue() == b"+a\n-b\n"
+
+
+def test_stream_parser_flushes_unterminated_last_line() -> None:
+    """An end marker with no trailing newline is still seen.
+
+    Returns:
+        None
+
+    """
+    batch = _batch("status")
+    parser = batch.stream_parser()
+
+    parser.feed(f"{SECTION_BEGIN} status\r\n M file.txt\r\n{SECTION_END} status 0")
+    results = parser.results({"success": True, "output": ""})
+
+    assert results["status"] == {"success": True, "output": " M file.txt\n"}
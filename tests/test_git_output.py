@@ -0,0 +1,201 @@
+"""Tests for parsing git log and git status output a line at a time."""
+
+import hashlib
+import io
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from utils.hotfix_utils.git_output import (  # noqa: E402
+    MAX_SUBJECT_LENGTH,
+    GitLogParser,
+    LineParser,
+    PorcelainStatusParser,
+)
+
+
+def _feed_in_chunks(parser: LineParser, raw: bytes, size: int) -> None:
+    """Write raw output to a parser a few bytes at a time, then close it.
+
+    Args:
+        parser (LineParser): The parser.
+        raw (bytes): The output.
+        size (int): The chunk size.
+
+    Returns:
+        None
+
+    """
+    for i in range(0, len(raw), size):
+        parser.write(raw[i : i + size])
+    parser.close()
+
+
+def test_log_keeps_commits_up_to_the_cap_but_counts_them_all() -> None:
+    """Commits past max_commits are counted in total but not kept.
+
+    Returns:
+        None
+
+    """
+    parser = GitLogParser(max_commits=2)
+
+    parser.feed("aaa1111 First\r\nbbb2222 Second\r\nccc3333 Third\r\n")
+    parser.close()
+
+    assert parser.commits == {"aaa1111": "First", "bbb2222": "Second"}
+    assert parser.total == 3
+
+
+def test_log_with_no_cap_keeps_every_commit() -> None:
+    """A max_commits of 0 keeps everything.
+
+    Returns:
+        None
+
+    """
+    parser = GitLogParser(max_commits=0)
+
+    parser.feed("".join(f"{i:07x} Commit {i}\n" for i in range(50)))
+    parser.close()
+
+    assert len(parser.commits) == 50
+    assert parser.total == 50
+
+
+def test_log_cuts_long_subjects_and_keeps_missing_ones() -> None:
+    """Subjects are cut to MAX_SUBJECT_LENGTH, and a bare hash has an empty one.
+
+    Returns:
+        None
+
+    """
+    parser = GitLogParser(max_commits=0)
+
+    parser.feed(f"aaa1111 {'x' * (MAX_SUBJECT_LENGTH + 50)}\nbbb2222\n\n")
+    parser.close()
+
+    assert parser.commits == {"aaa1111": "x" * MAX_SUBJECT_LENGTH, "bbb2222": ""}
+    assert parser.total == 2
+
+
+def test_log_prefix_filters_what_is_counted() -> None:
+    """Only commits whose subject starts with the prefix are counted.
+
+    Returns:
+        None
+
+    """
+    parser = GitLogParser(prefix="Hotfix:", max_commits=1)
+
+    parser.feed("aaa1111 Hotfix: one\nbbb2222 Other\nccc3333 Hotfix: two\n")
+    parser.close()
+
+    assert parser.commits == {"aaa1111": "Hotfix: one"}
+    assert parser.total == 2
+
+
+def test_log_reassembles_lines_split_across_chunks() -> None:
+    """Lines and multi-byte characters split between writes parse as a whole.
+
+    Returns:
+        None
+
+    """
+    sink = io.BytesIO()
+    parser = GitLogParser(max_commits=0, sink=sink)
+    raw = "aaa1111 Café fix\r\nbbb2222 Naïve change\r\n".encode("utf-8")
+
+    _feed_in_chunks(parser, raw, 1)
+
+    assert parser.commits == {"aaa1111": "Café fix", "bbb2222": "Naïve change"}
+    assert sink.getvalue() == raw
+
+
+def test_log_close_parses_an_unterminated_last_line() -> None:
+    """The last line is only parsed once close() is called if it has no newline.
+
+    Returns:
+        None
+
+    """
+    parser = GitLogParser(max_commits=0)
+
+    parser.feed("aaa1111 First\nbbb2222 Last")
+    assert parser.total == 1
+    parser.close()
+
+    assert parser.commits == {"aaa1111": "First", "bbb2222": "Last"}
+    assert parser.total == 2
+
+
+def test_status_keeps_files_up_to_the_cap_but_counts_them_all() -> None:
+    """Files past max_files are counted in total but not kept.
+
+    Returns:
+        None
+
+    """
+    parser = PorcelainStatusParser(max_files=2)
+
+    parser.feed(" M a.txt\n M b.txt\n?? c.txt\n?? d.txt\n")
+    parser.close()
+
+    assert parser.files == [" M a.txt", " M b.txt"]
+    assert parser.total == 4
+
+
+def test_status_digest_matches_the_whole_stripped_status() -> None:
+    """The digest is the same however the status arrives and whatever the cap.
+
+    Returns:
+        None
+
+    """
+    status = " M a.txt\r\n M b.txt\r\n?? cé.txt\r\n"
+    expected = hashlib.sha1(
+        status.replace("\r\n", "\n").strip().encode("utf-8")
+    ).hexdigest()
+    parser = PorcelainStatusParser(max_files=1)
+
+    _feed_in_chunks(parser, status.encode("utf-8"), 3)
+
+    assert parser.files == [" M a.txt"]
+    assert parser.total == 3
+    assert parser.hexdigest() == expected
+
+
+def test_status_close_parses_an_unterminated_last_line() -> None:
+    """A status with no trailing newline still counts its last file.
+
+    Returns:
+        None
+
+    """
+    parser = PorcelainStatusParser(max_files=0)
+
+    parser.feed(" M a.txt\n?? b.txt")
+    assert parser.files == [" M a.txt"]
+    parser.close()
+
+    assert parser.files == [" M a.txt", "?? b.txt"]
+    assert parser.total == 2
+
+
+def test_empty_status_has_no_files() -> None:
+    """A clean repository parses to nothing.
+
+    Returns:
+        None
+
+    """
+    parser = PorcelainStatusParser(max_files=0)
+
+    parser.feed("\r\n")
+    parser.close()
+
+    assert parser.files == []
+    assert parser.total == 0
+    assert parser.hexdigest() == hashlib.sha1(b"").hexdigest()
@@ -0,0 +1,91 @@
+"""Tests that RUN_TIMEOUT bounds a run even when an instrument never answers."""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("asyncssh")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+from benchmark_checks import make_repos, start_simulator  # noqa: E402
+
+RUN_TIMEOUT = 5
+
+
+def _free_port() -> int:
+    """Get a port nothing is listening on.
+
+    Returns:
+        int: The port.
+
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_hung_instrument_is_reported_over_budget(tmp_path: str, engine: str) -> None:
+    """A host whose command never sends EOF is stopped at the run's budget.
+
+    Args:
+        tmp_path (str): A directory for the repositories and the workspace.
+        engine (str): The CHECK_ENGINE to run with.
+
+    Returns:
+        None
+
+    """
+    healthy, hung = "127.0.0.2", "127.0.0.3"
+    repos = make_repos(str(tmp_path), 2, 1, 1, 1)
+    port = _free_port()
+    simulator = start_simulator([healthy, hung], repos, port, 0.0, 0.0, hang=[hung])
+    env = dict(
+        os.environ,
+        REPO_DIR="C:\\Instrument\\Settings\\config\\",
+        UPSTREAM_BRANCH_CONFIG="main",
+        WORKSPACE=str(tmp_path / "workspace"),
+        SSH_CREDENTIALS_USR="test",
+        SSH_CREDENTIALS_PSW="test",
+        SSH_PORT=str(port),
+        USE_TEST_INSTRUMENT_LIST="true",
+        TEST_INSTRUMENT_LIST=f"{healthy},{hung}",
+        CHECK_ENGINE=engine,
+        # the hung host holds one worker until the budget is spent
+        CHECK_WORKERS="2",
+        RUN_TIMEOUT=str(RUN_TIMEOUT),
+        DEBUG_MODE="false",
+        SHOW_UNCOMMITTED_CHANGES_MESSAGES="false",
+    )
+    start = time.monotonic()
+    try:
+        checker = subprocess.run(
+            [sys.executable, os.path.join(ROOT_DIR, "hotfix_checker.py")],
+            cwd=str(tmp_path),
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            timeout=RUN_TIMEOUT + 60,
+        )
+    finally:
+        simulator.terminate()
+        simulator.wait()
+    elapsed = time.monotonic() - start
+
+    undeterminable = [
+        line
+        for line in checker.stdout.splitlines()
+        if line.startswith("ERROR: Undeterminable at some point:")
+    ]
+    assert elapsed < RUN_TIMEOUT + 30, checker.stdout
+    assert len(undeterminable) == 1, checker.stdout
+    assert f'{{"{hung}": "budget exceeded"}}' in undeterminable[0]
+    assert healthy not in undeterminable[0], checker.stdout
+    assert f'"{healthy}"' in checker.stdout
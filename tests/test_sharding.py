@@ -0,0 +1,171 @@
+"""Tests for splitting a run into shards and merging the shards' results."""
+
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from utils.hotfix_utils.check import CHECK  # noqa: E402
+from utils.hotfix_utils.check_result import (  # noqa: E402
+    CHECK_NAMES,
+    CheckResult,
+    ResultSummary,
+)
+from utils.hotfix_utils.sharding import (  # noqa: E402
+    SHARD_MISSING,
+    merge_shard_results,
+    save_shard_results,
+    shard_of,
+    shard_results_path,
+)
+
+INSTRUMENTS = [f"NDX{name}" for name in ("ALF", "CRISP", "EMU", "GEM")] + [
+    f"NDXINST{i:02d}" for i in range(40)
+]
+
+
+def _result(hostname: str, index: int) -> CheckResult:
+    """Make a result, varying what was found by the instrument's position.
+
+    Args:
+        hostname (str): The hostname of the instrument.
+        index (int): The instrument's position in the list.
+
+    Returns:
+        CheckResult: The result.
+
+    """
+    result = CheckResult(hostname)
+    for name in CHECK_NAMES:
+        setattr(result, name, CHECK.FALSE)
+    if index % 5 == 0:
+        result.uncommitted_changes = CHECK.TRUE
+        result.uncommitted_changes_messages = [" M settings.py"]
+        result.uncommitted_changes_total = 1
+    if index % 7 == 0:
+        result.commits_local_not_on_upstream = CHECK.TRUE
+        result.commits_local_not_on_upstream_messages = {"abc1234": "Hotfix: x"}
+        result.commits_local_not_on_upstream_total = 3
+    if index % 11 == 0:
+        for name in CHECK_NAMES:
+            setattr(result, name, CHECK.UNDETERMINABLE)
+        result.reason = "unreachable"
+    return result
+
+
+def _save_shards(directory: str, count: int, instruments: list) -> list:
+    """Save the results each shard of a run would, checking only its instruments.
+
+    Args:
+        directory (str): The directory to save the shard results in.
+        count (int): The number of shards.
+        instruments (list): The instruments in the run.
+
+    Returns:
+        list: The shard result files, by shard index.
+
+    """
+    files = []
+    for shard in range(count):
+        summary = ResultSummary(
+            _result(host, index)
+            for index, host in enumerate(instruments)
+            if shard_of(host, count) == shard
+        )
+        seconds = {result.hostname: 1.0 for result in summary.results()}
+        path = shard_results_path(os.path.join(directory, str(shard)), shard, count)
+        save_shard_results(path, summary, shard, count, instruments, seconds)
+        files.append(path)
+    return files
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 8])
+def test_shards_are_disjoint_and_cover_every_instrument(count: int) -> None:
+    """Each instrument is in exactly one shard, whatever its case or padding.
+
+    Args:
+        count (int): The number of shards.
+
+    Returns:
+        None
+
+    """
+    shards = [
+        {host for host in INSTRUMENTS if shard_of(host, count) == index}
+        for index in range(count)
+    ]
+
+    assert sum(len(shard) for shard in shards) == len(INSTRUMENTS)
+    assert set().union(*shards) == set(INSTRUMENTS)
+    for host in INSTRUMENTS:
+        assert shard_of(f" {host.lower()} ", count) == shard_of(host, count)
+
+
+@pytest.mark.parametrize("count", [1, 3, 8])
+def test_merged_shards_match_an_unsharded_run(tmp_path: str, count: int) -> None:
+    """The merge gives the same lists and exit status as checking everything at once.
+
+    Args:
+        tmp_path (str): A directory for the shard results.
+        count (int): The number of shards.
+
+    Returns:
+        None
+
+    """
+    unsharded = ResultSummary(
+        _result(host, index) for index, host in enumerate(INSTRUMENTS)
+    )
+    files = _save_shards(str(tmp_path), count, INSTRUMENTS)
+
+    merged, instruments, seconds = merge_shard_results(reversed(files))
+
+    assert instruments == INSTRUMENTS
+    assert set(seconds) == set(INSTRUMENTS)
+    assert merged.lists(instruments) == unsharded.lists(INSTRUMENTS)
+    assert merged.summary_lines(instruments) == unsharded.summary_lines(INSTRUMENTS)
+    assert merged.has_findings(instruments) == unsharded.has_findings(INSTRUMENTS)
+
+
+def test_missing_shard_is_reported_undeterminable(tmp_path: str) -> None:
+    """The instruments of a shard with no results fail the run.
+
+    Args:
+        tmp_path (str): A directory for the shard results.
+
+    Returns:
+        None
+
+    """
+    instruments = INSTRUMENTS[1:5]
+    files = _save_shards(str(tmp_path), 2, instruments)
+    missing = {host for host in instruments if shard_of(host, 2) == 1}
+    assert missing, "expected both shards to have instruments"
+
+    merged, _, _ = merge_shard_results(files[:1])
+
+    reasons = {result.hostname: result.reason for result in merged.results()}
+    assert {host for host in reasons if reasons[host] == SHARD_MISSING} == missing
+    for result in merged.results(missing):
+        assert result.is_undeterminable()
+    assert merged.has_findings(instruments)
+
+
+def test_shards_of_different_runs_are_not_merged(tmp_path: str) -> None:
+    """Results of runs split different ways can't be merged.
+
+    Args:
+        tmp_path (str): A directory for the shard results.
+
+    Returns:
+        None
+
+    """
+    files = _save_shards(str(tmp_path / "two"), 2, INSTRUMENTS)
+    files += _save_shards(str(tmp_path / "three"), 3, INSTRUMENTS)
+
+    with pytest.raises(ValueError):
+        merge_shard_results(files)
@@ -0,0 +1,349 @@
+"""Module provides asyncio versions of the SSH access utilities."""
+
+import asyncio
+import socket
+import time
+from typing import BinaryIO, Dict, Tuple
+
+import asyncssh
+
+from ..jenkins_utils.timing_utils import describe_command, timings
+from ..settings import get_settings
+from .ssh_access import (
+    AUTH_FAILURE,
+    SSH_CHUNK_SIZE,
+    CommandRetries,
+    HostUnreachableError,
+    SSHAccessUtils,
+)
+
+
+class AsyncSSHAccessUtils(object):
+    """Class containing coroutine methods for SSH access.
+
+    Results have the same shape as SSHAccessUtils.run_ssh_command results, so the
+    async check engine can share the result handling of the blocking one.
+    """
+
+    @staticmethod
+    async def connect(
+        host: str,
+        username: str,
+        password: str,
+        timeout: float = None,
+    ) -> asyncssh.SSHClientConnection:
+        """Open an authenticated SSH connection to a remote host.
+
+        A host that can't be reached is tried again up to SSH_RETRIES more times
+        after a random backoff, unless its circuit breaker has given up on it.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            timeout (float): Seconds to allow for connecting and authenticating,
+                each attempt.
+
+        Returns:
+            asyncssh.SSHClientConnection: The connection.
+
+        """
+        retries = CommandRetries(host, "connect")
+        while True:
+            try:
+                connection = await AsyncSSHAccessUtils._connect_once(
+                    host, username, password, timeout
+                )
+            except (OSError, asyncssh.Error) as e:
+                delay = retries.retry_delay(AsyncSSHAccessUtils.failure_result(e))
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            SSHAccessUtils.record_attempt(host)
+            return connection
+
+    @staticmethod
+    async def _connect_once(
+        host: str,
+        username: str,
+        password: str,
+        timeout: float = None,
+    ) -> asyncssh.SSHClientConnection:
+        """Make one attempt at opening an authenticated SSH connection.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            timeout (float): Seconds to allow for connecting and authenticating.
+
+        Returns:
+            asyncssh.SSHClientConnection: The connection.
+
+        """
+        timeouts = SSHAccessUtils.connect_timeouts(host)
+        connect_timeout = timeouts["connect"]
+        if timeout is not None:
+            connect_timeout = min(connect_timeout, timeout)
+
+        # the TCP connect and the SSH handshake are timed separately
+        try:
+            with timings.measure(host, "ssh", "connect"):
+                sock = await asyncio.wait_for(
+                    AsyncSSHAccessUtils._open_socket(host, get_settings().ssh_port),
+                    connect_timeout,
+                )
+        except OSError as e:
+            raise HostUnreachableError(
+                f"{host} is unreachable ({str(e) or type(e).__name__})"
+            ) from e
+
+        try:
+            with timings.measure(host, "ssh", "auth"):
+                return await asyncssh.connect(
+                    host,
+                    port=get_settings().ssh_port,
+                    username=username,
+                    password=password,
+                    known_hosts=None,
+                    connect_timeout=timeout,
+                    login_timeout=timeouts["auth"],
+                    sock=sock,
+                )
+        except asyncssh.PermissionDenied:
+            sock.close()
+            SSHAccessUtils.mark_dead(host, AUTH_FAILURE)
+            raise
+        except BaseException:
+            sock.close()
+            raise
+
+    @staticmethod
+    def failure_reason(exception: Exception) -> str:
+        """Classify why a command could not be run.
+
+        Args:
+            exception (Exception): The exception raised running the command.
+
+        Returns:
+            str: UNREACHABLE, AUTH_FAILURE or CONNECTION_FAILURE.
+
+        """
+        if isinstance(exception, asyncssh.PermissionDenied):
+            return AUTH_FAILURE
+        return SSHAccessUtils.failure_reason(exception)
+
+    @staticmethod
+    def failure_result(exception: Exception) -> Dict[str, bool | str]:
+        """Get the result of a command that could not be run.
+
+        Args:
+            exception (Exception): The exception raised running the command.
+
+        Returns:
+            dict: The failed result, as returned by run_ssh_command.
+
+        """
+        return {
+            "success": False,
+            "output": str(exception),
+            "reason": AsyncSSHAccessUtils.failure_reason(exception),
+        }
+
+    @staticmethod
+    async def _open_socket(host: str, port: int) -> socket.socket:
+        """Open a TCP connection without blocking the event loop.
+
+        Args:
+            host (str): The hostname to connect to.
+            port (int): The port to connect to.
+
+        Returns:
+            socket.socket: The connected socket.
+
+        """
+        loop = asyncio.get_running_loop()
+        family, kind, protocol, _, address = (
+            await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        )[0]
+        sock = socket.socket(family, kind, protocol)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, address)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    async def _read_stream(
+        stream: asyncssh.SSHReader,
+        sink: BinaryIO = None,
+        max_output: int = 0,
+        transferred: Dict[str, int] = None,
+    ) -> Tuple[bytes, bool]:
+        """Read a stream of a remote process in chunks until it ends.
+
+        Args:
+            stream (asyncssh.SSHReader): The stream to read.
+            sink (BinaryIO): If given, the data is written to this instead of kept.
+            max_output (int): The most bytes to keep, any more is read and dropped
+                (0 for no limit).
+            transferred (dict): If given, its "bytes" is increased by the bytes read.
+
+        Returns:
+            bytes: The data kept.
+            bool: Whether any data was dropped.
+
+        """
+        kept = bytearray()
+        truncated = False
+        while True:
+            data = await stream.read(SSH_CHUNK_SIZE)
+            if not data:
+                return bytes(kept), truncated
+            if transferred is not None:
+                transferred["bytes"] += len(data)
+            if sink is not None:
+                sink.write(data)
+                continue
+            if max_output and len(kept) + len(data) > max_output:
+                data = data[: max(0, max_output - len(kept))]
+                truncated = True
+            kept += data
+
+    @staticmethod
+    async def _run(
+        host: str,
+        connection: asyncssh.SSHClientConnection,
+        command: str,
+        stdout_sink: BinaryIO,
+        max_output: int,
+        received: Dict[str, int],
+    ) -> Tuple[bytes, bytes, int | None, bool]:
+        operation = describe_command(command)
+        start = time.perf_counter()
+        async with connection.create_process(command, encoding=None) as process:
+            timings.record(host, operation, "exec", time.perf_counter() - start)
+            process.stdin.write_eof()
+            with timings.measure(host, operation, "read") as read:
+                (
+                    (stdout, stdout_truncated),
+                    (stderr, stderr_truncated),
+                ) = await asyncio.gather(
+                    AsyncSSHAccessUtils._read_stream(
+                        process.stdout, stdout_sink, max_output, received
+                    ),
+                    AsyncSSHAccessUtils._read_stream(
+                        process.stderr, None, max_output, received
+                    ),
+                )
+                read["bytes"] += received["bytes"]
+                await process.wait()
+        return (
+            stdout,
+            stderr,
+            process.exit_status,
+            stdout_truncated or stderr_truncated,
+        )
+
+    @staticmethod
+    async def run_ssh_command(
+        host: str,
+        username: str,
+        password: str,
+        command: str,
+        connection: asyncssh.SSHClientConnection = None,
+        stdout_sink: BinaryIO = None,
+        max_output: int = None,
+    ) -> Dict[str, bool | str]:
+        """Run a command on a remote host using SSH.
+
+        stdout and stderr are read at the same time in chunks, and failed attempts
+        are tried again, as the blocking SSHAccessUtils.run_ssh_command does. A
+        retry, or a command whose connection has already been lost, runs over a
+        new connection of its own.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            command (str): The command to run on the remote host.
+            connection (asyncssh.SSHClientConnection): An open connection to run
+                the command over, a new one is opened and closed if not given.
+            stdout_sink (BinaryIO): If given, stdout is written to this as it arrives
+                instead of being returned in the output.
+            max_output (int): The most bytes of each stream to keep in memory, any
+                more is read and dropped (0 for no limit), by default SSH_MAX_OUTPUT.
+
+        Returns:
+            dict: A dictionary with the success status and the output of the command,
+                and whether the output was truncated.
+
+        """
+        if max_output is None:
+            max_output = get_settings().ssh_max_output
+        retries = CommandRetries(host, describe_command(command))
+        while True:
+            result = retries.skipped()
+            if result is not None:
+                return result
+            if connection is not None and connection.is_closed():
+                connection = None
+            result, received = await AsyncSSHAccessUtils._run_once(
+                host, username, password, command, connection, stdout_sink, max_output
+            )
+            delay = retries.retry_delay(result, received)
+            if delay is None:
+                retries.report(result)
+                return result
+            # the attempt's connection may have been dropped, retry on a new one
+            connection = None
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _run_once(
+        host: str,
+        username: str,
+        password: str,
+        command: str,
+        connection: asyncssh.SSHClientConnection | None,
+        stdout_sink: BinaryIO,
+        max_output: int,
+    ) -> Tuple[Dict[str, bool | str], bool]:
+        """Run a command on a remote host once, classifying how it went.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            command (str): The command to run on the remote host.
+            connection (asyncssh.SSHClientConnection): An open connection to run
+                the command over, or None to open and close one for it.
+            stdout_sink (BinaryIO): If given, stdout is written to this as it arrives.
+            max_output (int): The most bytes of each stream to keep in memory.
+
+        Returns:
+            dict: The result, as returned by run_ssh_command.
+            bool: Whether any output was received.
+
+        """
+        received = {"bytes": 0}
+        try:
+            if connection is None:
+                # retries are made by run_ssh_command, not by connect
+                async with await AsyncSSHAccessUtils._connect_once(
+                    host, username, password
+                ) as new_connection:
+                    output = await AsyncSSHAccessUtils._run(
+                        host, new_connection, command, stdout_sink, max_output, received
+                    )
+            else:
+                output = await AsyncSSHAccessUtils._run(
+                    host, connection, command, stdout_sink, max_output, received
+                )
+            result = SSHAccessUtils.command_result(*output)
+        except (OSError, asyncssh.Error) as e:
+            result = AsyncSSHAccessUtils.failure_result(e)
+        return result, received["bytes"] > 0
@@ -9,7 +9,7 @@ from builtins import (
 from enum import (
     Enum,
 )
-from typing import Any, Dict
+from typing import Dict, List
 
 from genie_python.channel_access_exceptions import (
     ReadAccessException,
@@ -67,12 +67,16 @@ class ChannelAccessUtils(object):
 
     def get_inst_list(
         self,
-    ) -> Dict | Any:
+    ) -> List[Dict] | None:
         """Gets a list with all instruments running on IBEX from CS:INSTLIST.
-        :return: a list of strings of instrument names.
+        Use InstrumentListProvider instead to fall back to the last known good list.
+        :return: a list of instruments, or None if CS:INSTLIST could not be read.
         """
         pv_value = self.get_value("CS:INSTLIST")
-        return {} if pv_value is None else json.loads(self._dehex_and_decompress(pv_value))
+        if pv_value is None:
+            print("ERROR: Could not read CS:INSTLIST")
+            return None
+        return json.loads(self._dehex_and_decompress(pv_value))
 
 
 class PvInterestingLevel(Enum):
@@ -0,0 +1,182 @@
+"""Module provides access to the IBEX version each instrument's configuration is on."""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..jenkins_utils.timing_utils import timings
+
+CONFIG_VERSION_URL = (
+    "https://control-svcs.isis.cclrc.ac.uk/git/?p=instconfigs/inst.git;a=blob_plain;"
+    "f=configurations/config_version.txt;hb=refs/heads/"
+)
+
+# Seconds to wait for gitweb to respond before giving up on an instrument
+HTTP_TIMEOUT = 10
+
+
+class ConfigVersionAccessUtils(object):
+    """Looks up config_version.txt for many instruments concurrently, with a cache.
+
+    Requests share one pooled HTTP session and have an explicit timeout. Responses
+    are kept in a JSON cache file in the workspace. An entry younger than the TTL is
+    used without asking gitweb at all, and older entries are revalidated with
+    If-None-Match/If-Modified-Since so unchanged files are not downloaded again. If
+    gitweb can't be reached the last cached version is used.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        ttl: float = 0,
+        timeout: float = HTTP_TIMEOUT,
+        workers: int = 8,
+    ) -> None:
+        """Initialize the ConfigVersionAccessUtils object.
+
+        Args:
+            cache_path (str): The JSON file to keep the cache in.
+            ttl (float): Seconds a cached version is used without revalidating it.
+            timeout (float): Seconds to wait for each request.
+            workers (int): The number of requests to make at once.
+
+        """
+        self._cache_path = cache_path
+        self._ttl = ttl
+        self._timeout = timeout
+        self._workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._workers)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        try:
+            with open(self._cache_path, encoding="utf-8") as file:
+                cache = json.load(file)
+            return cache if isinstance(cache, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save_cache(self) -> None:
+        """Write the cache to disk.
+
+        Returns:
+            None
+
+        """
+        directory = os.path.dirname(self._cache_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary_path = self._cache_path + ".tmp"
+        with self._lock, open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self._cache, file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self._cache_path)
+
+    def get_version(self, hostname: str) -> str | None:
+        """Get the contents of config_version.txt on an instrument's config branch.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            str: The version string, or None if it could not be fetched or cached.
+
+        """
+        with self._lock:
+            cached = self._cache.get(hostname)
+        if cached is not None and time.time() - cached["fetched_at"] < self._ttl:
+            return cached["version"]
+
+        headers = {}
+        if cached is not None and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached is not None and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            with timings.measure(hostname, "config version", "http") as http:
+                response = self._session.get(
+                    CONFIG_VERSION_URL + hostname,
+                    headers=headers,
+                    timeout=self._timeout,
+                )
+                http["bytes"] = len(response.content)
+            if response.status_code == 304 and cached is not None:
+                entry = dict(cached, fetched_at=time.time())
+            else:
+                response.raise_for_status()
+                entry = {
+                    "version": response.text,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": time.time(),
+                }
+        except requests.RequestException as e:
+            if cached is None:
+                print(f"INFO: Could not get config version of {hostname} ({str(e)})")
+                return None
+            print(f"INFO: Using cached config version of {hostname} ({str(e)})")
+            return cached["version"]
+
+        with self._lock:
+            self._cache[hostname] = entry
+        return entry["version"]
+
+    def cached_versions(self) -> Dict[str, str]:
+        """Get the versions found for each instrument on previous runs.
+
+        Returns:
+            dict: The cached version string of each instrument keyed by hostname.
+
+        """
+        with self._lock:
+            return {host: entry["version"] for host, entry in self._cache.items()}
+
+    def iter_versions(self, hostnames: List[str]) -> Iterator[Tuple[str, str | None]]:
+        """Get the config versions of several instruments concurrently.
+
+        Versions are yielded as soon as each lookup finishes, so callers can act on
+        early results while the rest are still in flight. The cache is saved once
+        every lookup has finished.
+
+        Args:
+            hostnames (list): The hostnames of the instruments.
+
+        Yields:
+            tuple: The hostname and its version string, or None if unavailable.
+
+        """
+        executor = ThreadPoolExecutor(max_workers=self._workers)
+        try:
+            futures = {
+                executor.submit(self.get_version, hostname): hostname
+                for hostname in hostnames
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.save_cache()
+
+    def get_versions(self, hostnames: List[str]) -> Dict[str, str | None]:
+        """Get the config versions of several instruments concurrently.
+
+        Args:
+            hostnames (list): The hostnames of the instruments.
+
+        Returns:
+            dict: The version string (or None) of each instrument keyed by hostname.
+
+        """
+        versions = dict(self.iter_versions(hostnames))
+        return {hostname: versions[hostname] for hostname in hostnames}
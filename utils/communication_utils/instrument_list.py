@@ -0,0 +1,245 @@
+"""Module provides the instrument list from CS:INSTLIST, with a last known good copy."""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List
+
+INSTLIST_PV = "CS:INSTLIST"
+
+# Seconds a last known good copy of the instrument list may be used for when
+# CS:INSTLIST can't be read
+INSTLIST_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+# The source of an instrument list
+LIVE = "live"
+CACHE = "cache"
+
+
+class InstrumentListUnavailableError(RuntimeError):
+    """CS:INSTLIST couldn't be read and there is no usable cached copy of it."""
+
+
+def validate_instruments(instruments: object) -> List[Dict]:
+    """Check a decoded instrument list looks like CS:INSTLIST.
+
+    Args:
+        instruments (object): The decoded list.
+
+    Returns:
+        list: The instruments.
+
+    Raises:
+        ValueError: If it isn't a non-empty list of instruments each with a name,
+            hostName and seci flag.
+
+    """
+    if not isinstance(instruments, list) or len(instruments) == 0:
+        raise ValueError("the instrument list is empty or not a list")
+    for instrument in instruments:
+        if not isinstance(instrument, dict) or not all(
+            key in instrument for key in ("name", "hostName", "seci")
+        ):
+            raise ValueError(f"malformed instrument list entry {instrument!r}")
+    return instruments
+
+
+class InstrumentList:
+    """The instruments in CS:INSTLIST, indexed by hostname, name, seci and group."""
+
+    def __init__(self, instruments: List[Dict], source: str, fetched: float) -> None:
+        """Initialize the InstrumentList object.
+
+        Args:
+            instruments (list): The instruments, as decoded from CS:INSTLIST.
+            source (str): LIVE if read from CS:INSTLIST now, CACHE if from the last
+                known good copy.
+            fetched (float): When the list was read from CS:INSTLIST, as a timestamp.
+
+        """
+        self.instruments = instruments
+        self.source = source
+        self.fetched = fetched
+        self.by_hostname = {inst["hostName"]: inst for inst in instruments}
+        self.by_name = {inst["name"]: inst for inst in instruments}
+        self._hostnames = {
+            seci: [inst["hostName"] for inst in instruments if inst["seci"] == seci]
+            for seci in (True, False)
+        }
+        self.groups: Dict[str, List[str]] = {}
+        for inst in instruments:
+            for group in inst.get("groups") or []:
+                self.groups.setdefault(group, []).append(inst["hostName"])
+
+    def hostnames(self, seci: bool | None = None) -> List[str]:
+        """Get the hostnames of the instruments, in instrument list order.
+
+        Args:
+            seci (bool): True for only SECI instruments, False for only IBEX ones,
+                None for all of them.
+
+        Returns:
+            list: The hostnames.
+
+        """
+        if seci is None:
+            return list(self.by_hostname)
+        return list(self._hostnames[seci])
+
+    def name(self, hostname: str) -> str:
+        """Get the name of an instrument from its hostname.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            str: Its name, or the hostname if it isn't in the list.
+
+        """
+        instrument = self.by_hostname.get(hostname)
+        return hostname if instrument is None else instrument["name"]
+
+    def age(self) -> float:
+        """Get how long ago the list was read from CS:INSTLIST.
+
+        Returns:
+            float: The age in seconds.
+
+        """
+        return max(0.0, time.time() - self.fetched)
+
+
+class InstrumentListProvider:
+    """Reads CS:INSTLIST once per run, falling back to a last known good copy.
+
+    Each good read is saved with a digest of the raw PV value, so when the PV hasn't
+    changed since the last good read it isn't decompressed and parsed again. If the
+    PV can't be read or doesn't decode to a valid list, the saved copy is used as
+    long as it is no older than max_age, otherwise InstrumentListUnavailableError is
+    raised rather than carrying on with no instruments.
+    """
+
+    def __init__(self, path: str, max_age: float = INSTLIST_CACHE_MAX_AGE) -> None:
+        """Initialize the InstrumentListProvider object.
+
+        Args:
+            path (str): The JSON file to keep the last known good copy in.
+            max_age (float): Seconds the copy may be used for, 0 for no limit.
+
+        """
+        self._path = path
+        self._max_age = max_age
+        self._instrument_list = None
+
+    def _load(self) -> Dict | None:
+        """Load the last known good copy, if there is a valid one.
+
+        Returns:
+            dict: The "digest", "fetched" time and "instruments", or None.
+
+        """
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                saved = json.load(file)
+            validate_instruments(saved["instruments"])
+            float(saved["fetched"])
+            return saved
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save(self, saved: Dict) -> None:
+        """Write the last known good copy to disk.
+
+        Args:
+            saved (dict): The "digest", "fetched" time and "instruments".
+
+        Returns:
+            None
+
+        """
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary_path = self._path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(saved, file)
+        os.replace(temporary_path, self._path)
+
+    def _read_live(self, saved: Dict | None) -> InstrumentList:
+        """Read CS:INSTLIST, reusing the saved copy if the PV hasn't changed.
+
+        Args:
+            saved (dict): The last known good copy, if there is one.
+
+        Returns:
+            InstrumentList: The instrument list.
+
+        Raises:
+            ValueError: If the PV can't be read or doesn't decode to a valid list.
+
+        """
+        # genie_python and CaChannel take a while to load, so they are only imported
+        # when the PV is actually read
+        from .channel_access import ChannelAccessUtils
+
+        payload = ChannelAccessUtils().get_value(INSTLIST_PV)
+        if payload is None:
+            raise ValueError(f"{INSTLIST_PV} could not be read")
+        if isinstance(payload, str):
+            payload = payload.encode("ascii", errors="replace")
+        digest = hashlib.sha256(payload).hexdigest()
+        now = time.time()
+
+        if saved is not None and saved.get("digest") == digest:
+            instruments = saved["instruments"]
+        else:
+            try:
+                instruments = validate_instruments(
+                    json.loads(ChannelAccessUtils._dehex_and_decompress(payload))
+                )
+            except Exception as e:
+                raise ValueError(f"{INSTLIST_PV} could not be decoded: {e}") from e
+        try:
+            self._save({"digest": digest, "fetched": now, "instruments": instruments})
+        except OSError as e:
+            print(f"INFO: Could not save the instrument list to {self._path} ({e})")
+        return InstrumentList(instruments, LIVE, now)
+
+    def get(self) -> InstrumentList:
+        """Get the instrument list, reading it the first time this is called.
+
+        Returns:
+            InstrumentList: The instrument list, with its source.
+
+        Raises:
+            InstrumentListUnavailableError: If CS:INSTLIST can't be read and there is
+                no cached copy young enough to use.
+
+        """
+        if self._instrument_list is not None:
+            return self._instrument_list
+
+        saved = self._load()
+        try:
+            self._instrument_list = self._read_live(saved)
+            return self._instrument_list
+        except ValueError as e:
+            problem = str(e)
+
+        if saved is None:
+            raise InstrumentListUnavailableError(
+                f"{problem}, and there is no cached copy"
+            )
+        cached = InstrumentList(saved["instruments"], CACHE, saved["fetched"])
+        if self._max_age and cached.age() > self._max_age:
+            raise InstrumentListUnavailableError(
+                f"{problem}, and the cached copy is {cached.age() / 3600:.1f} hours "
+                f"old (older than {self._max_age / 3600:.1f})"
+            )
+        print(
+            f"WARNING: {problem}, using the copy cached "
+            f"{cached.age() / 3600:.1f} hours ago"
+        )
+        self._instrument_list = cached
+        return self._instrument_list
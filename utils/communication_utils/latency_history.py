@@ -0,0 +1,125 @@
+"""Module keeps a history of how long connecting to each host takes."""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable
+
+from ..settings import get_settings
+
+# Seconds allowed for authentication and for the SSH banner with no history, these
+# are paramiko's defaults
+SSH_AUTH_TIMEOUT = 30.0
+SSH_BANNER_TIMEOUT = 15.0
+
+# Timeouts are this many times a host's usual latency, but never less than the floor
+TIMEOUT_MULTIPLIER = 5
+MIN_TIMEOUT = 2.0
+
+# Weight given to the latest run when updating a host's usual latency
+SMOOTHING = 0.3
+
+
+class LatencyHistory:
+    """The usual connect and auth latency of each host, used to pick its timeouts.
+
+    A host that normally connects in milliseconds doesn't need to be given the full
+    default timeout before it is given up on, so timeouts are a multiple of the
+    host's smoothed latency from previous runs, clamped between a floor and the
+    defaults. Hosts with no history get the defaults.
+    """
+
+    def __init__(self, path: str = None) -> None:
+        """Initialize the LatencyHistory object.
+
+        Args:
+            path (str): The JSON file to keep the history in, or None to keep none.
+
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, float]] = {}
+        if path is not None:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    self._hosts = json.load(file)
+            except (OSError, ValueError):
+                self._hosts = {}
+
+    def timeouts(self, host: str) -> Dict[str, float]:
+        """Get the timeouts to use when connecting to a host.
+
+        Args:
+            host (str): The hostname.
+
+        Returns:
+            dict: The "connect", "auth" and "banner" timeouts in seconds.
+
+        """
+        # seconds allowed to open a TCP connection to a host with no history
+        connect_timeout = get_settings().ssh_connect_timeout
+        with self._lock:
+            latency = self._hosts.get(host)
+        if latency is None:
+            return {
+                "connect": connect_timeout,
+                "auth": SSH_AUTH_TIMEOUT,
+                "banner": SSH_BANNER_TIMEOUT,
+            }
+
+        def scaled(seconds: float, default: float) -> float:
+            return min(default, max(MIN_TIMEOUT, seconds * TIMEOUT_MULTIPLIER))
+
+        return {
+            "connect": scaled(latency["connect"], connect_timeout),
+            "auth": scaled(latency["auth"], SSH_AUTH_TIMEOUT),
+            "banner": scaled(latency["auth"], SSH_BANNER_TIMEOUT),
+        }
+
+    def update(self, records: Iterable[Dict]) -> None:
+        """Fold a run's SSH connect and auth timings into the history.
+
+        Args:
+            records (iterable): Timing records, as made by TimingRecorder.
+
+        Returns:
+            None
+
+        """
+        slowest: Dict[str, Dict[str, float]] = {}
+        for record in records:
+            if record["operation"] != "ssh" or record["host"] is None:
+                continue
+            if record["phase"] not in ("connect", "auth"):
+                continue
+            phases = slowest.setdefault(record["host"], {})
+            phases[record["phase"]] = max(
+                phases.get(record["phase"], 0.0), record["seconds"]
+            )
+
+        with self._lock:
+            for host, phases in slowest.items():
+                latency = self._hosts.setdefault(host, dict(phases))
+                for phase, seconds in phases.items():
+                    previous = latency.get(phase, seconds)
+                    latency[phase] = round(
+                        SMOOTHING * seconds + (1 - SMOOTHING) * previous, 6
+                    )
+                latency.setdefault("auth", latency["connect"])
+
+    def save(self) -> None:
+        """Write the history to disk, if it has a path.
+
+        Returns:
+            None
+
+        """
+        if self._path is None:
+            return
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary_path = self._path + ".tmp"
+        with self._lock, open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self._hosts, file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self._path)
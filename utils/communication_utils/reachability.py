@@ -0,0 +1,119 @@
+"""Module checks which hosts can be reached before any commands are sent to them."""
+
+import socket
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Tuple
+
+from ..jenkins_utils.console_utils import BufferedConsole
+from ..jenkins_utils.timing_utils import timings
+from ..settings import get_settings
+from .ssh_access import UNREACHABLE, CommandRetries, SSHAccessUtils
+
+
+class ReachabilityProbe:
+    """Probes hosts' SSH ports in parallel so dead hosts can be skipped up front.
+
+    A powered off instrument otherwise costs a full connect timeout before it is
+    found to be down. Each probe is a bare TCP connect with the host's adaptive
+    connect timeout. A host that doesn't answer is retried the way a command would
+    be, and is only skipped once its circuit breaker in SSHAccessUtils has given up
+    on it, so nothing else is sent to it.
+    """
+
+    def __init__(self, workers: int = 32) -> None:
+        """Initialize the ReachabilityProbe object.
+
+        Args:
+            workers (int): The number of hosts to probe at once.
+
+        """
+        self._workers = max(1, workers)
+
+    @staticmethod
+    def probe(host: str) -> bool:
+        """Check whether a host accepts TCP connections on the SSH port.
+
+        Retries are given the default connect timeout, in case the adaptive one
+        was too short for a slow handshake.
+
+        Args:
+            host (str): The hostname.
+
+        Returns:
+            bool: False if the host didn't answer and has been given up on.
+
+        """
+        timeout = SSHAccessUtils.connect_timeouts(host)["connect"]
+        address = (host, get_settings().ssh_port)
+        retries = CommandRetries(host, "reachability probe")
+        while True:
+            try:
+                with timings.measure(host, "reachability", "probe"):
+                    socket.create_connection(address, timeout=timeout).close()
+            except OSError as e:
+                error = str(e) or type(e).__name__
+                delay = retries.retry_delay(
+                    {
+                        "success": False,
+                        "output": f"{host} is unreachable ({error})",
+                        "reason": UNREACHABLE,
+                    }
+                )
+                if delay is None:
+                    # not given up on yet, so its checks get their own retries
+                    return SSHAccessUtils.dead_reason(host) is None
+                time.sleep(delay)
+                timeout = get_settings().ssh_connect_timeout
+                continue
+            SSHAccessUtils.record_attempt(host)
+            return True
+
+    @staticmethod
+    def _probe_buffered(host: str) -> bool:
+        """Probe a host, printing what its retries log as one block.
+
+        Args:
+            host (str): The hostname.
+
+        Returns:
+            bool: False if the host didn't answer and has been given up on.
+
+        """
+        console = sys.stdout
+        if not isinstance(console, BufferedConsole):
+            return ReachabilityProbe.probe(host)
+        with console.capture() as buffer:
+            reachable = ReachabilityProbe.probe(host)
+        console.emit(buffer.getvalue())
+        return reachable
+
+    def iter_probed(self, hosts: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+        """Probe hosts as they arrive, yielding each as soon as its probe finishes.
+
+        hosts may be a generator that is still discovering hosts, probes start as
+        soon as each host is yielded by it.
+
+        Args:
+            hosts (iterable): The hostnames to probe.
+
+        Yields:
+            tuple: The hostname and whether it is reachable.
+
+        """
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            pending = {}
+            seen = set()
+            for host in hosts:
+                if host in seen:
+                    continue
+                seen.add(host)
+                pending[executor.submit(ReachabilityProbe._probe_buffered, host)] = host
+                for future in [future for future in pending if future.done()]:
+                    yield pending.pop(future), future.result()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
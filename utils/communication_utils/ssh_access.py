@@ -1,64 +1,799 @@
 """This module provides utilities for SSH access."""
 
-from typing import Dict
+import random
+import select
+import socket
+import threading
+import time
+from typing import BinaryIO, Dict, Iterator, Tuple
 
 import paramiko
 
-SSH_PORT = 22
+from ..jenkins_utils.timing_utils import describe_command, timings
+from ..settings import get_settings
+from .latency_history import LatencyHistory
+
+# Sessions not used for this long are closed the next time the pool is used
+SSH_IDLE_TIMEOUT = 300
+
+# Bytes read from a channel at a time
+SSH_CHUNK_SIZE = 32768
+
+# Most seconds waited before retrying a command, however many attempts have failed
+SSH_RETRY_MAX_BACKOFF = 30.0
+
+# Reasons a command can fail, given as "reason" in failed results
+UNREACHABLE = "unreachable"
+AUTH_FAILURE = "auth failure"
+CONNECTION_FAILURE = "connection failure"
+COMMAND_FAILURE = "command failure"
+BUDGET_EXCEEDED = "budget exceeded"
+
+
+class HostUnreachableError(OSError):
+    """Raised when a TCP connection to a host's SSH port can't be made."""
+
+
+class BudgetExceededError(TimeoutError):
+    """Raised when the run's budget is spent before a command has finished."""
+
+
+class SSHSessionPool(object):
+    """A pool of authenticated SSH clients, one per (host, username).
+
+    Connecting to an instrument (TCP, key exchange and password auth) costs far more
+    than running a git command over an already open transport, so commands against
+    the same host share one client. Paramiko transports can multiplex channels, so a
+    client may be used from several threads at once.
+    """
+
+    def __init__(self, idle_timeout: float = SSH_IDLE_TIMEOUT) -> None:
+        """Initialize the SSHSessionPool object.
+
+        Args:
+            idle_timeout (float): Seconds a session may sit unused before it is closed.
+
+        """
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple[str, str], paramiko.SSHClient] = {}
+        self._last_used: Dict[Tuple[str, str], float] = {}
+        self._connect_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get_client(self, host: str, username: str, password: str) -> paramiko.SSHClient:
+        """Get a connected client for the host, connecting if there is no live one.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+
+        Returns:
+            paramiko.SSHClient: A connected and authenticated client.
+
+        """
+        self.evict_idle()
+        key = (host, username)
+        with self._lock:
+            connect_lock = self._connect_locks.setdefault(key, threading.Lock())
+
+        # only one thread connects to a given host, the others wait and reuse it
+        with connect_lock:
+            with self._lock:
+                client = self._sessions.get(key)
+            if client is None or not SSHSessionPool._is_active(client):
+                if client is not None:
+                    client.close()
+                client = SSHAccessUtils.connect(host, username, password)
+                with self._lock:
+                    self._sessions[key] = client
+            with self._lock:
+                self._last_used[key] = time.monotonic()
+            return client
+
+    def discard(self, host: str, username: str) -> None:
+        """Close and forget the session for a host, e.g. after it has failed.
+
+        Args:
+            host (str): The hostname of the session.
+            username (str): The username of the session.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            client = self._sessions.pop((host, username), None)
+            self._last_used.pop((host, username), None)
+        if client is not None:
+            client.close()
+
+    def close_host(self, host: str) -> None:
+        """Close every session open to a host.
+
+        Args:
+            host (str): The hostname to close sessions for.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            keys = [key for key in self._sessions if key[0] == host]
+        for key in keys:
+            self.discard(*key)
+
+    def evict_idle(self) -> None:
+        """Close sessions that have not been used within the idle timeout.
+
+        Returns:
+            None
+
+        """
+        now = time.monotonic()
+        with self._lock:
+            keys = [
+                key
+                for key, last_used in self._last_used.items()
+                if now - last_used > self._idle_timeout
+            ]
+        for key in keys:
+            self.discard(*key)
+
+    def close_all(self) -> None:
+        """Close every session in the pool.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            keys = list(self._sessions)
+        for key in keys:
+            self.discard(*key)
+
+    @staticmethod
+    def _is_active(client: paramiko.SSHClient) -> bool:
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+
+_session_pool = SSHSessionPool()
+
+# Hosts given up on for the rest of the run, with the reason, so no more commands
+# are sent to a host that is down or rejects our credentials
+_dead_hosts: Dict[str, str] = {}
+# Connection attempts to each host that have failed in a row, the host is given up
+# on once SSH_CIRCUIT_THRESHOLD have
+_failed_attempts: Dict[str, int] = {}
+_dead_hosts_lock = threading.Lock()
+
+_latency_history = LatencyHistory()
+
+# The time.monotonic() the run's budget runs out at, commands still running then
+# are stopped
+_deadline: float | None = None
 
 
 class SSHAccessUtils(object):
     """Class containing utility methods for SSH access."""
 
+    @staticmethod
+    def connect(
+        host: str,
+        username: str,
+        password: str,
+    ) -> paramiko.SSHClient:
+        """Open a new authenticated SSH connection to a remote host.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+
+        Returns:
+            paramiko.SSHClient: The connected client.
+
+        """
+        timeouts = SSHAccessUtils.connect_timeouts(host)
+        # the TCP connect and the SSH handshake are timed separately
+        try:
+            with timings.measure(host, "ssh", "connect"):
+                sock = socket.create_connection(
+                    (host, get_settings().ssh_port), timeout=timeouts["connect"]
+                )
+        except OSError as e:
+            raise HostUnreachableError(f"{host} is unreachable ({str(e)})") from e
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            with timings.measure(host, "ssh", "auth"):
+                client.connect(
+                    host,
+                    port=get_settings().ssh_port,
+                    username=username,
+                    password=password,
+                    sock=sock,
+                    banner_timeout=timeouts["banner"],
+                    auth_timeout=timeouts["auth"],
+                )
+        except paramiko.AuthenticationException:
+            sock.close()
+            SSHAccessUtils.mark_dead(host, AUTH_FAILURE)
+            raise
+        except Exception:
+            sock.close()
+            raise
+        return client
+
+    @staticmethod
+    def use_latency_history(history: LatencyHistory) -> None:
+        """Set the latency history connect, auth and banner timeouts are taken from.
+
+        Args:
+            history (LatencyHistory): The history.
+
+        Returns:
+            None
+
+        """
+        global _latency_history
+        _latency_history = history
+
+    @staticmethod
+    def use_deadline(deadline: float | None) -> None:
+        """Set the time commands must finish by, for the rest of the run.
+
+        Args:
+            deadline (float): The time.monotonic() the run's budget runs out at, or
+                None for no limit.
+
+        Returns:
+            None
+
+        """
+        global _deadline
+        _deadline = deadline
+
+    @staticmethod
+    def connect_timeouts(host: str) -> Dict[str, float]:
+        """Get the timeouts to use connecting to a host, from its latency history.
+
+        Args:
+            host (str): The hostname.
+
+        Returns:
+            dict: The "connect", "auth" and "banner" timeouts in seconds.
+
+        """
+        return _latency_history.timeouts(host)
+
+    @staticmethod
+    def mark_dead(host: str, reason: str) -> None:
+        """Stop sending commands to a host for the rest of the run.
+
+        Args:
+            host (str): The hostname.
+            reason (str): Why the host was given up on, e.g. UNREACHABLE.
+
+        Returns:
+            None
+
+        """
+        with _dead_hosts_lock:
+            _dead_hosts.setdefault(host, reason)
+
+    @staticmethod
+    def dead_reason(host: str) -> str | None:
+        """Get why a host was given up on.
+
+        Args:
+            host (str): The hostname.
+
+        Returns:
+            str: The reason, or None if the host hasn't been given up on.
+
+        """
+        with _dead_hosts_lock:
+            return _dead_hosts.get(host)
+
+    @staticmethod
+    def record_attempt(host: str, reason: str = None) -> bool:
+        """Count a connection attempt towards a host's circuit breaker.
+
+        A host is given up on for the rest of the run once SSH_CIRCUIT_THRESHOLD
+        attempts in a row have failed to reach it, or straight away if it rejects
+        the credentials, so the rest of its commands fail at once rather than each
+        waiting out the connect timeouts again.
+
+        Args:
+            host (str): The hostname.
+            reason (str): Why the attempt failed, None if the host answered.
+
+        Returns:
+            bool: True if the host has been given up on.
+
+        """
+        threshold = get_settings().ssh_circuit_threshold
+        with _dead_hosts_lock:
+            if reason is None:
+                _failed_attempts.pop(host, None)
+                return host in _dead_hosts
+            failures = _failed_attempts.get(host, 0) + 1
+            _failed_attempts[host] = failures
+            if reason == AUTH_FAILURE or failures >= threshold:
+                _dead_hosts.setdefault(host, reason)
+            return host in _dead_hosts
+
+    @staticmethod
+    def retry_delay(attempt: int) -> float:
+        """Get how long to wait before retrying after a failed attempt.
+
+        The wait is picked at random up to a limit that doubles with each attempt,
+        so hosts that failed together don't all retry together.
+
+        Args:
+            attempt (int): The number of attempts that have failed, from 1.
+
+        Returns:
+            float: The seconds to wait.
+
+        """
+        limit = min(
+            SSH_RETRY_MAX_BACKOFF,
+            get_settings().ssh_retry_backoff * 2 ** (attempt - 1),
+        )
+        if _deadline is not None:
+            # the retry would fail at once after the deadline, so don't wait past it
+            limit = min(limit, max(0.0, _deadline - time.monotonic()))
+        return random.uniform(0, limit)
+
+    @staticmethod
+    def is_transient(reason: str) -> bool:
+        """Whether a failure is worth retrying.
+
+        Args:
+            reason (str): Why the command failed, e.g. CONNECTION_FAILURE.
+
+        Returns:
+            bool: True for failures to reach the host or keep the connection to it,
+                False for rejected credentials and commands that ran and failed.
+
+        """
+        return reason in (UNREACHABLE, CONNECTION_FAILURE)
+
+    @staticmethod
+    def command_result(
+        stdout: bytes, stderr: bytes, exit_status: int | None, truncated: bool
+    ) -> Dict[str, bool | str]:
+        """Classify the outcome of a command that ran.
+
+        A command is failed by its exit status, so output on stderr from one that
+        succeeded, e.g. git fetch's progress, is kept as "stderr" but isn't a
+        failure. If the server didn't send an exit status, any stderr is taken as
+        a failure.
+
+        Args:
+            stdout (bytes): The stdout kept.
+            stderr (bytes): The stderr kept.
+            exit_status (int): The exit status, None if the server didn't send one.
+            truncated (bool): Whether any output was dropped.
+
+        Returns:
+            dict: The result, as returned by run_ssh_command.
+
+        """
+        output = stdout.decode("utf-8", "replace")
+        error = stderr.decode("utf-8", "replace")
+        if exit_status is None:
+            failed = error != ""
+        else:
+            failed = exit_status != 0
+        if failed:
+            return {
+                "success": False,
+                "output": error or output,
+                "truncated": truncated,
+                "reason": COMMAND_FAILURE,
+                "exit_status": exit_status,
+            }
+        result = {"success": True, "output": output, "truncated": truncated}
+        if error:
+            result["stderr"] = error
+        return result
+
+    @staticmethod
+    def failure_reason(exception: Exception) -> str:
+        """Classify why a command could not be run.
+
+        Args:
+            exception (Exception): The exception raised running the command.
+
+        Returns:
+            str: UNREACHABLE, AUTH_FAILURE, CONNECTION_FAILURE or BUDGET_EXCEEDED.
+
+        """
+        if isinstance(exception, BudgetExceededError):
+            return BUDGET_EXCEEDED
+        if isinstance(exception, HostUnreachableError):
+            return UNREACHABLE
+        if isinstance(exception, paramiko.AuthenticationException):
+            return AUTH_FAILURE
+        return CONNECTION_FAILURE
+
+    @staticmethod
+    def reuse_sessions() -> bool:
+        """Whether commands should share a pooled session per host.
+
+        Returns:
+            bool: False if SSH_REUSE_SESSIONS is set to "false", otherwise True.
+
+        """
+        return get_settings().ssh_reuse_sessions
+
+    @staticmethod
+    def close_sessions(host: str = None) -> None:
+        """Close pooled sessions to a host, or all pooled sessions if no host given.
+
+        Args:
+            host (str): The hostname to close sessions for.
+
+        Returns:
+            None
+
+        """
+        if host is None:
+            _session_pool.close_all()
+        else:
+            _session_pool.close_host(host)
+
+    @staticmethod
+    def _open_channel(
+        host: str,
+        username: str,
+        password: str,
+        command: str,
+    ) -> Tuple[paramiko.Channel, paramiko.SSHClient | None]:
+        """Start a command on a remote host.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            command (str): The command to run on the remote host.
+
+        Returns:
+            paramiko.Channel: The channel the command is running on.
+            paramiko.SSHClient: A client to close once the command has finished, or
+                None if the client belongs to the session pool.
+
+        """
+        operation = describe_command(command)
+        if not SSHAccessUtils.reuse_sessions():
+            client = SSHAccessUtils.connect(host, username, password)
+            try:
+                with timings.measure(host, operation, "exec"):
+                    channel = client.get_transport().open_session()
+                    channel.exec_command(command)
+            except Exception:
+                client.close()
+                raise
+            return channel, client
+
+        client = _session_pool.get_client(host, username, password)
+        start = time.perf_counter()
+        try:
+            channel = client.get_transport().open_session()
+        except (paramiko.SSHException, EOFError, OSError):
+            # the pooled session may have been dropped by the remote end since it
+            # was last used, so try once more on a fresh connection
+            _session_pool.discard(host, username)
+            client = _session_pool.get_client(host, username, password)
+            start = time.perf_counter()
+            channel = client.get_transport().open_session()
+        channel.exec_command(command)
+        timings.record(host, operation, "exec", time.perf_counter() - start)
+        return channel, None
+
+    @staticmethod
+    def _drain(
+        channel: paramiko.Channel,
+        chunk_size: int = SSH_CHUNK_SIZE,
+        deadline: float = None,
+    ) -> Iterator[Tuple[str, bytes]]:
+        """Read stdout and stderr from a channel as data arrives on either.
+
+        Reading one stream to the end before the other can deadlock once the remote
+        command fills the window of the stream not being read, so both are read as
+        they become ready.
+
+        Args:
+            channel (paramiko.Channel): The channel the command is running on.
+            chunk_size (int): The most bytes to read at a time.
+            deadline (float): The time.monotonic() to stop waiting at, if any.
+
+        Yields:
+            tuple: "stdout" or "stderr" and a chunk of bytes read from it.
+
+        Raises:
+            BudgetExceededError: If the deadline passes before the command finishes.
+
+        """
+        while True:
+            read = False
+            if channel.recv_ready():
+                yield "stdout", channel.recv(chunk_size)
+                read = True
+            if channel.recv_stderr_ready():
+                yield "stderr", channel.recv_stderr(chunk_size)
+                read = True
+            if read:
+                continue
+            if channel.eof_received or channel.closed:
+                return
+            wait = 1.0
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise BudgetExceededError(
+                        "run budget spent before the command finished"
+                    )
+            # the channel's fileno becomes readable when data or EOF arrives
+            select.select([channel], [], [], wait)
+
+    @staticmethod
+    def stream_ssh_command(
+        host: str,
+        username: str,
+        password: str,
+        command: str,
+        chunk_size: int = SSH_CHUNK_SIZE,
+        status: Dict[str, int | None] = None,
+    ) -> Iterator[Tuple[str, bytes]]:
+        """Run a command on a remote host using SSH, yielding its output as it arrives.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            command (str): The command to run on the remote host.
+            chunk_size (int): The most bytes to read at a time.
+            status (dict): If given, its "exit_status" is set once the command has
+                finished, None if the server didn't send one.
+
+        Yields:
+            tuple: "stdout" or "stderr" and a chunk of bytes of output.
+
+        Raises:
+            paramiko.SSHException: If the connection is lost before the command
+                finishes.
+            BudgetExceededError: If the run's budget is spent before the command
+                finishes, the channel is closed and the command left to the host.
+
+        """
+        deadline = _deadline
+        if deadline is not None and time.monotonic() >= deadline:
+            raise BudgetExceededError("run budget spent before the command started")
+        channel, client = SSHAccessUtils._open_channel(
+            host, username, password, command
+        )
+        try:
+            with timings.measure(host, describe_command(command), "read") as read:
+                for stream, data in SSHAccessUtils._drain(
+                    channel, chunk_size, deadline
+                ):
+                    read["bytes"] += len(data)
+                    yield stream, data
+            exit_status = channel.recv_exit_status()
+            if exit_status == -1:
+                transport = channel.get_transport()
+                if transport is None or not transport.is_active():
+                    raise paramiko.SSHException(
+                        f"connection to {host} lost before the command finished"
+                    )
+                exit_status = None
+            if status is not None:
+                status["exit_status"] = exit_status
+        finally:
+            channel.close()
+            if client is not None:
+                client.close()
+
     @staticmethod
     def run_ssh_command(
         host: str,
         username: str,
         password: str,
         command: str,
+        stdout_sink: BinaryIO = None,
+        max_output: int = None,
     ) -> Dict[str, bool | str]:
         """Run a command on a remote host using SSH.
 
+        If the host can't be reached or the connection drops before any output
+        arrives, the command is tried again up to SSH_RETRIES more times after a
+        random backoff, unless the host's circuit breaker has given up on it. A
+        command still running when the run's budget is spent is stopped and fails
+        with BUDGET_EXCEEDED.
+
         Args:
             host (str): The hostname to connect to.
             username (str): The username to use to connect.
             password (str): The password to use to connect.
             command (str): The command to run on the remote host.
+            stdout_sink (BinaryIO): If given, stdout is written to this as it arrives
+                instead of being returned in the output.
+            max_output (int): The most bytes of each stream to keep in memory, any
+                more is read and dropped (0 for no limit), by default SSH_MAX_OUTPUT.
 
         Returns:
-            dict: A dictionary with the success status and the output of the command.
+            dict: A dictionary with the success status and the output of the command,
+                and whether the output was truncated. A failed command has the
+                "reason" it failed, UNREACHABLE, AUTH_FAILURE, CONNECTION_FAILURE,
+                COMMAND_FAILURE or BUDGET_EXCEEDED.
 
         """
+        if max_output is None:
+            max_output = get_settings().ssh_max_output
+        retries = CommandRetries(host, describe_command(command))
+        while True:
+            result = retries.skipped()
+            if result is not None:
+                return result
+            result, received = SSHAccessUtils._run_once(
+                host, username, password, command, stdout_sink, max_output
+            )
+            delay = retries.retry_delay(result, received)
+            if delay is None:
+                retries.report(result)
+                return result
+            _session_pool.discard(host, username)
+            time.sleep(delay)
+
+    @staticmethod
+    def _run_once(
+        host: str,
+        username: str,
+        password: str,
+        command: str,
+        stdout_sink: BinaryIO,
+        max_output: int,
+    ) -> Tuple[Dict[str, bool | str], bool]:
+        """Run a command on a remote host once, classifying how it went.
+
+        Args:
+            host (str): The hostname to connect to.
+            username (str): The username to use to connect.
+            password (str): The password to use to connect.
+            command (str): The command to run on the remote host.
+            stdout_sink (BinaryIO): If given, stdout is written to this as it arrives.
+            max_output (int): The most bytes of each stream to keep in memory.
+
+        Returns:
+            dict: The result, as returned by run_ssh_command.
+            bool: Whether any output was received.
+
+        """
+        received = False
         try:
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(
-                host,
-                port=SSH_PORT,
-                username=username,
-                password=password,
+            kept = {"stdout": bytearray(), "stderr": bytearray()}
+            truncated = False
+            status = {"exit_status": None}
+            for stream, data in SSHAccessUtils.stream_ssh_command(
+                host, username, password, command, status=status
+            ):
+                received = True
+                if stream == "stdout" and stdout_sink is not None:
+                    stdout_sink.write(data)
+                    continue
+                buffer = kept[stream]
+                if max_output and len(buffer) + len(data) > max_output:
+                    data = data[: max(0, max_output - len(buffer))]
+                    truncated = True
+                buffer += data
+
+            result = SSHAccessUtils.command_result(
+                bytes(kept["stdout"]),
+                bytes(kept["stderr"]),
+                status["exit_status"],
+                truncated,
             )
-            (
-                stdin,
-                stdout,
-                stderr,
-            ) = client.exec_command(command)
-            output = stdout.read().decode("utf-8")
-            error = stderr.read().decode("utf-8")
-            client.close()
-            if error:
-                return {
-                    "success": False,
-                    "output": error,
-                }
-            else:
-                return {
-                    "success": True,
-                    "output": output,
-                }
         except Exception as e:
-            print(str(e))
-            return {
+            result = {
                 "success": False,
                 "output": str(e),
+                "reason": SSHAccessUtils.failure_reason(e),
             }
+        return result, received
+
+
+class CommandRetries(object):
+    """The attempts at one command on a host, deciding whether to try it again.
+
+    A command that couldn't reach the host, or lost the connection before any
+    output arrived, is tried again up to SSH_RETRIES more times after a random
+    backoff, unless the host's circuit breaker has given up on it. The blocking
+    and async engines each run the attempts and wait out the backoff their own
+    way, and share these decisions.
+    """
+
+    def __init__(self, host: str, operation: str) -> None:
+        """Initialize the CommandRetries object.
+
+        Args:
+            host (str): The hostname the command runs on.
+            operation (str): What the command does, for the console, e.g. "git fetch".
+
+        """
+        self.host = host
+        self.operation = operation
+        self.failures = 0
+
+    def skipped(self) -> Dict[str, bool | str] | None:
+        """Get the result of a command not run because the host was given up on.
+
+        Returns:
+            dict: The failed result, None if the command should be run.
+
+        """
+        reason = SSHAccessUtils.dead_reason(self.host)
+        if reason is None:
+            return None
+        return {
+            "success": False,
+            "output": f"{self.host} skipped, it was found to be {reason} earlier",
+            "reason": reason,
+        }
+
+    def retry_delay(
+        self, result: Dict[str, bool | str], received: bool = False
+    ) -> float | None:
+        """Count an attempt towards the host's circuit breaker and decide on a retry.
+
+        Args:
+            result (dict): The result of the attempt, as returned by run_ssh_command.
+            received (bool): Whether any output arrived before it failed.
+
+        Returns:
+            float: The seconds to wait before trying again, None if the result is
+                final.
+
+        """
+        reason = result.get("reason")
+        if reason in (AUTH_FAILURE, BUDGET_EXCEEDED):
+            return None
+        if reason is None or not SSHAccessUtils.is_transient(reason):
+            SSHAccessUtils.record_attempt(self.host)
+            return None
+        self.failures += 1
+        given_up = SSHAccessUtils.record_attempt(self.host, reason)
+        # output already passed to a sink can't be taken back, so a command that
+        # failed part way through isn't run again
+        if given_up or received or self.failures > get_settings().ssh_retries:
+            return None
+        delay = SSHAccessUtils.retry_delay(self.failures)
+        print(
+            f"INFO: {self.host}: {self.operation} attempt {self.failures} failed "
+            f"({reason}), retrying in {delay:.1f}s"
+        )
+        return delay
+
+    def report(self, result: Dict[str, bool | str]) -> None:
+        """Print why the command's final attempt couldn't be run, if it couldn't.
+
+        Args:
+            result (dict): The final result, as returned by run_ssh_command.
+
+        Returns:
+            None
+
+        """
+        reason = result.get("reason")
+        if reason == BUDGET_EXCEEDED:
+            print(
+                f"ERROR: {self.host}: {self.operation} stopped, "
+                f"the run budget was spent"
+            )
+        elif reason is not None and reason != COMMAND_FAILURE:
+            print(result["output"])
@@ -0,0 +1,420 @@
+"""A module for checking an instrument's repo status with asyncio."""
+
+import time
+from typing import BinaryIO, Dict, List, Tuple
+
+import asyncssh
+
+from ..communication_utils.async_ssh_access import AsyncSSHAccessUtils
+from ..jenkins_utils.jenkins_utils import JenkinsUtils
+from ..jenkins_utils.timing_utils import timed
+from .check import CHECK
+from .check_state import CheckStateStore
+from .git_output import GitLogParser, PorcelainStatusParser
+from .InstrumentChecker import InstrumentChecker
+from .repo_target import RepoTarget
+
+
+class AsyncInstrumentChecker(InstrumentChecker):
+    """An InstrumentChecker whose checks are coroutines.
+
+    All the commands for the instrument go over one SSH connection, and the output is
+    interpreted by the same code as the blocking InstrumentChecker, so both engines
+    give the same results.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        target: RepoTarget = None,
+        parent_store: CheckStateStore = None,
+        diff_store: CheckStateStore = None,
+    ) -> None:
+        """Initialize the AsyncInstrumentChecker object.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            target (RepoTarget): The repository to check, by default REPO_DIR.
+            parent_store (CheckStateStore): Where to remember the parent branch of
+                an EPICS instrument branch between runs, if anywhere.
+            diff_store (CheckStateStore): Where to remember the digests of the
+                status and diff in the git status artefact between runs, if
+                anywhere.
+
+        """
+        super().__init__(hostname, target, parent_store, diff_store)
+        self._connection: asyncssh.SSHClientConnection | None = None
+
+    async def run_command(
+        self, command: str, stdout_sink: BinaryIO = None
+    ) -> Dict[str, bool | str]:
+        """Run a command on the instrument over its open connection.
+
+        Args:
+            command (str): The command to run.
+            stdout_sink (BinaryIO): If given, stdout is written to this as it arrives
+                instead of being returned in the output.
+
+        Returns:
+            dict: A dictionary with the success status and the output of the command.
+
+        """
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
+
+        return await AsyncSSHAccessUtils.run_ssh_command(
+            self.hostname,
+            self.settings.ssh_user,
+            self.settings.ssh_password,
+            command,
+            connection=self._connection,
+            stdout_sink=stdout_sink,
+        )
+
+    async def fetch_origin_async(
+        self, upstream_branch: str = None
+    ) -> Dict[str, bool | str | float]:
+        """Fetch from origin on the instrument, at most once per run.
+
+        Args:
+            upstream_branch (str): The remote tracking branch being compared against.
+
+        Returns:
+            dict: The result of the fetch, with the time it took in seconds.
+
+        """
+        refspec = self._fetch_refspec(upstream_branch)
+        if "" in self._fetch_results:
+            return self._fetch_results[""]
+        if refspec in self._fetch_results:
+            return self._fetch_results[refspec]
+
+        start = time.monotonic()
+        ssh_process_fetch = await self.run_command(
+            f"cd /d {self.repo_dir} && git fetch origin {refspec}".rstrip()
+        )
+        result = dict(ssh_process_fetch, duration=time.monotonic() - start)
+        self._fetch_results[refspec] = result
+        return result
+
+    @timed("check")
+    async def git_branch_comparer_async(
+        self,
+        changes_on: str,
+        subtracted_against: str,
+        prefix: str = None,
+    ) -> Tuple[CHECK, dict | None, int | None]:
+        """Get the commit messages between two branches on the instrument.
+
+        Args:
+            changes_on (str): The branch to start from.
+            subtracted_against (str): The branch to end at.
+            prefix (str): The prefix to check for in commit messages.
+
+        Returns:
+            CHECK: The result of the check.
+            dict: A dictionary with the commit messages and their hashes.
+            int: How many commits there are, None if undeterminable.
+
+        """
+        upstream_branch = subtracted_against if changes_on == "HEAD" else changes_on
+        ssh_process_fetch = await self.fetch_origin_async(upstream_branch)
+        if not ssh_process_fetch["success"]:
+            self._note_failure(ssh_process_fetch)
+            return CHECK.UNDETERMINABLE, None, None
+
+        log = GitLogParser(prefix)
+        ssh_process = await self.run_command(
+            f'cd /d {self.repo_dir} && git log --format="%h %s" '
+            f"{subtracted_against}..{changes_on}",
+            stdout_sink=log,
+        )
+        return self._branch_comparison_result(ssh_process, log=log)
+
+    @timed("check")
+    async def compare_commit_counts_async(self, upstream_branch: str) -> None:
+        """Count the commits either side of the upstream branch in one command.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against.
+
+        Returns:
+            None
+
+        """
+        ssh_process_fetch = await self.fetch_origin_async(upstream_branch)
+        if not ssh_process_fetch["success"]:
+            self._note_failure(ssh_process_fetch)
+            self._set_commit_counts(None)
+            return
+
+        command = f"cd /d {self.repo_dir} && {self._count_command(upstream_branch)}"
+        counts = self._commit_counts(await self.run_command(command), command)
+        self._set_commit_counts(counts)
+        if counts is None or counts[0] == 0:
+            return
+
+        log = GitLogParser()
+        ssh_process = await self.run_command(
+            f"cd /d {self.repo_dir} && {self._local_log_command(upstream_branch)}",
+            stdout_sink=log,
+        )
+        self._set_local_commit_messages(ssh_process, log)
+
+    @timed("check")
+    async def check_for_uncommitted_changes_async(
+        self,
+    ) -> Tuple[CHECK, List[any], int | None]:
+        """Check if there are any uncommitted changes on the instrument.
+
+        Returns:
+            CHECK: The result of the check.
+            list: The changed files if SHOW_UNCOMMITTED_CHANGES_MESSAGES is true.
+            int: How many files have changed, None if undeterminable.
+
+        """
+        with JenkinsUtils.open_git_status(
+            self.hostname, self.target.artefact_dir
+        ) as diff_writer:
+            status = PorcelainStatusParser(sink=diff_writer.status_sink())
+            ssh_process = await self.run_command(
+                f"cd /d {self.repo_dir} && git status --porcelain", stdout_sink=status
+            )
+            if not ssh_process["success"]:
+                self._note_failure(ssh_process)
+                return CHECK.UNDETERMINABLE, [], None
+
+            ssh_process_diff = await self.run_command(
+                f"cd /d {self.repo_dir} && git --no-pager diff --ignore-cr-at-eol",
+                stdout_sink=diff_writer,
+            )
+            return self._uncommitted_changes_result(
+                ssh_process, ssh_process_diff, diff_writer, status
+            )
+
+    async def get_upstream_branch_async(self) -> str | bool:
+        """Get the upstream branch to compare the instrument against.
+
+        Returns:
+            str: The upstream branch, or False if it could not be determined.
+
+        """
+        if self.target.upstream_config == "epics":
+            parent = await self._run_parent_probe_async(
+                self._remembered_parent() is None
+            )
+            if parent is None:
+                # HEAD has moved since the parent was remembered
+                parent = await self._run_parent_probe_async(resolve=True)
+            return parent
+        return self.get_upstream_branch()
+
+    async def _run_parent_probe_async(self, resolve: bool) -> str | bool | None:
+        """Run a probe for the parent branch of the instrument branch.
+
+        Args:
+            resolve (bool): Whether to work the parent out from the commit ancestry
+                rather than check the remembered one.
+
+        Returns:
+            str: As for _parent_epics_branch_result().
+
+        """
+        batch = self._build_parent_batch(resolve)
+        ssh_process = await self.run_command(batch.command())
+        return self._parent_epics_branch_result(batch.parse(ssh_process), resolve)
+
+    @timed("check")
+    async def check_instrument_batched_async(self, upstream_branch: str = None) -> None:
+        """Run all the checks on the instrument in a single SSH round trip.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against, by
+                default the remembered or configured one.
+
+        Returns:
+            None
+
+        """
+        check_head = False
+        if upstream_branch is None:
+            upstream_branch = self._remembered_upstream_branch()
+            check_head = upstream_branch is not None
+        if upstream_branch is None:
+            upstream_branch = await self.get_upstream_branch_async()
+
+        batch = self._build_probe_batch(upstream_branch, check_head)
+        with JenkinsUtils.open_git_status(
+            self.hostname, self.target.artefact_dir
+        ) as diff_writer:
+            sinks = self._probe_sinks(diff_writer)
+            parser = batch.stream_parser(sinks=sinks)
+            ssh_process = await self.run_command(batch.command(), stdout_sink=parser)
+            results = parser.results(ssh_process)
+            self._apply_probe_results(batch, results, sinks)
+
+        if check_head and self._head_moved(results["head"]):
+            parent = await self._run_parent_probe_async(resolve=True)
+            if parent and parent != upstream_branch:
+                await self.check_instrument_batched_async(parent)
+
+    @timed("check")
+    async def check_instrument_remote_async(self, upstream_branch: str = None) -> None:
+        """Run all the checks on the instrument with the check script.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against, by
+                default the remembered or configured one.
+
+        Returns:
+            None
+
+        """
+        check_head = False
+        if upstream_branch is None:
+            upstream_branch = self._remembered_upstream_branch()
+            check_head = upstream_branch is not None
+        if upstream_branch is None:
+            upstream_branch = await self.get_upstream_branch_async()
+        self.upstream_branch = upstream_branch
+
+        report = self._apply_remote_report(
+            await self.run_command(self._remote_check_command(upstream_branch))
+        )
+        if report is None:
+            return
+
+        if check_head and self._head_moved(self._remote_head(report)):
+            parent = await self._run_parent_probe_async(resolve=True)
+            if parent and parent != upstream_branch:
+                await self.check_instrument_remote_async(parent)
+                return
+
+        if self.uncommitted_changes_enum != CHECK.UNDETERMINABLE and (
+            self._diff_changed(report)
+        ):
+            (
+                self.uncommitted_changes_enum,
+                self.uncommitted_changes_messages,
+                self.uncommitted_changes_total,
+            ) = await self.check_for_uncommitted_changes_async()
+            self._remember_diff(report)
+
+    async def _run_checks_async(self) -> None:
+        if self.remote_check:
+            await self.check_instrument_remote_async()
+            return
+
+        if self.batched_probe:
+            await self.check_instrument_batched_async()
+            return
+
+        upstream_branch = await self.get_upstream_branch_async()
+        self.upstream_branch = upstream_branch
+        if self.commit_counts_only:
+            await self.compare_commit_counts_async(upstream_branch)
+        else:
+            (
+                self.commits_upstream_not_on_local_enum,
+                self.commits_upstream_not_on_local_messages,
+                self.commits_upstream_not_on_local_total,
+            ) = await self.git_branch_comparer_async(
+                changes_on=upstream_branch, subtracted_against="HEAD"
+            )
+            (
+                self.commits_local_not_on_upstream_enum,
+                self.commits_local_not_on_upstream_messages,
+                self.commits_local_not_on_upstream_total,
+            ) = await self.git_branch_comparer_async(
+                changes_on="HEAD", subtracted_against=upstream_branch
+            )
+        (
+            self.uncommitted_changes_enum,
+            self.uncommitted_changes_messages,
+            self.uncommitted_changes_total,
+        ) = await self.check_for_uncommitted_changes_async()
+
+    async def check_instrument_async(
+        self,
+        connect_timeout: float = None,
+        state_store: CheckStateStore = None,
+        connection: asyncssh.SSHClientConnection = None,
+    ) -> None:
+        """Check if there are any hotfixes or uncommitted changes on AN instrument.
+
+        Args:
+            connect_timeout (float): Seconds to allow for connecting to the instrument.
+            state_store (CheckStateStore): If given, the previous result is reused
+                when the instrument's repo has not changed since the last run.
+            connection (asyncssh.SSHClientConnection): An open connection to the
+                instrument to use, e.g. one shared by several targets. It is left
+                open. By default a connection is opened for the check and closed
+                after it.
+
+        Returns:
+            None
+
+        """
+        if connection is not None:
+            self._connection = connection
+            try:
+                await self._check_over_connection(state_store)
+            finally:
+                self._connection = None
+            return
+
+        try:
+            self._connection = await AsyncSSHAccessUtils.connect(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                timeout=connect_timeout,
+            )
+        except (OSError, asyncssh.Error) as e:
+            print(f"ERROR: Could not connect to {self.hostname} ({str(e)})")
+            self.set_all_undeterminable(AsyncSSHAccessUtils.failure_reason(e))
+            return
+
+        try:
+            await self._check_over_connection(state_store)
+        finally:
+            self._connection.close()
+            self._connection = None
+
+    async def _check_over_connection(self, state_store: CheckStateStore = None) -> None:
+        """Run the checks over the open connection.
+
+        Args:
+            state_store (CheckStateStore): If given, the previous result is reused
+                when the instrument's repo has not changed since the last run.
+
+        Returns:
+            None
+
+        """
+        if state_store is None:
+            await self._run_checks_async()
+            return
+
+        previous = state_store.get(self.hostname)
+        if previous is not None:
+            upstream_branch = previous["upstream_branch"]
+        else:
+            upstream_branch = await self.get_upstream_branch_async()
+        batch = self._build_fingerprint_batch(upstream_branch)
+        fingerprint = self._fingerprint_result(
+            batch, batch.parse(await self.run_command(batch.command()))
+        )
+
+        if self._can_reuse_state(previous, fingerprint):
+            print(
+                f"INFO: {self.target.label(self.hostname)} unchanged since last run, "
+                "reusing its result"
+            )
+            self.upstream_branch = upstream_branch
+            self.status_digest = previous.get("status_digest")
+            self.restore_result(previous["result"])
+            return
+
+        await self._run_checks_async()
+        self._record_state(state_store, upstream_branch, fingerprint)
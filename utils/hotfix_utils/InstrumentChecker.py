@@ -1,37 +1,104 @@
 """A module for checking the status of an instrument in relation to it's repo."""
 
-import os
-from typing import List, Tuple, Union
+import time
+from typing import Dict, List, Tuple, Union
 
 from ..communication_utils.ssh_access import (
+    COMMAND_FAILURE,
     SSHAccessUtils,
 )
-from ..jenkins_utils.jenkins_utils import JenkinsUtils
+from ..jenkins_utils.jenkins_utils import GitStatusWriter, JenkinsUtils
+from ..jenkins_utils.timing_utils import timed
+from ..settings import get_settings
+from .batch_probe import GitProbeBatch
 from .check import CHECK
+from .check_result import CHECK_NAMES, CheckResult
+from .check_state import CheckStateStore
+from .git_output import GitLogParser, PorcelainStatusParser
+from .remote_check import parse_remote_report, remote_check_command
+from .repo_target import RepoTarget, default_target
+
+
+def _result_field(name: str) -> property:
+    """Make a property that reads and writes a field of the instrument's result.
+
+    Args:
+        name (str): The name of the CheckResult field.
+
+    Returns:
+        property: The property.
+
+    """
+
+    def get_field(self: "InstrumentChecker") -> object:
+        return getattr(self.result, name)
+
+    def set_field(self: "InstrumentChecker", value: object) -> None:
+        setattr(self.result, name, value)
+
+    return property(get_field, set_field, doc=f"The {name} field of the result.")
 
 
 class InstrumentChecker:
     """A class to represent an instrument in relation to the it's repo status."""
 
-    repo_dir = os.environ["REPO_DIR"]
+    commits_upstream_not_on_local_enum = _result_field("commits_upstream_not_on_local")
+    commits_upstream_not_on_local_messages = _result_field(
+        "commits_upstream_not_on_local_messages"
+    )
+    commits_local_not_on_upstream_enum = _result_field("commits_local_not_on_upstream")
+    commits_local_not_on_upstream_messages = _result_field(
+        "commits_local_not_on_upstream_messages"
+    )
+    uncommitted_changes_enum = _result_field("uncommitted_changes")
+    uncommitted_changes_messages = _result_field("uncommitted_changes_messages")
+    commits_upstream_not_on_local_total = _result_field(
+        "commits_upstream_not_on_local_total"
+    )
+    commits_local_not_on_upstream_total = _result_field(
+        "commits_local_not_on_upstream_total"
+    )
+    uncommitted_changes_total = _result_field("uncommitted_changes_total")
+    upstream_branch = _result_field("upstream_branch")
+    undeterminable_reason = _result_field("reason")
+    status_digest = _result_field("status_digest")
 
-    def __init__(self, hostname: str) -> None:
+    def __init__(
+        self,
+        hostname: str,
+        target: RepoTarget = None,
+        parent_store: CheckStateStore = None,
+        diff_store: CheckStateStore = None,
+    ) -> None:
         """Initialize the Instrument object.
 
         Args:
             hostname (str): The hostname of the instrument.
+            target (RepoTarget): The repository to check, by default REPO_DIR.
+            parent_store (CheckStateStore): Where to remember the parent branch of
+                an EPICS instrument branch between runs, if anywhere.
+            diff_store (CheckStateStore): Where to remember the digests of the
+                status and diff in the git status artefact between runs, if
+                anywhere, so a remote check only pulls the diff when it changes.
 
         """
+        self.settings = get_settings()
+        self.batched_probe = self.settings.batched_probe
+        self.narrow_fetch = self.settings.narrow_fetch
+        self.commit_counts_only = self.settings.commit_counts_only
+        self.remote_check = self.settings.remote_check
+        # the branches an EPICS instrument branch can be based on, the last is used
+        # unless the instrument's HEAD has commits from one of the others
+        self.epics_parent_branches = self.settings.epics_parent_branches
         self._hostname = hostname
+        self.target = target if target is not None else default_target()
+        self.repo_dir = self.target.repo_dir
+        self.parent_store = parent_store
+        self.diff_store = diff_store
 
-        self._commits_local_not_on_upstream_enum = None
-        self._commits_local_not_on_upstream_messages = None
-
-        self._commits_upstream_not_on_local_enum = None
-        self._commits_upstream_not_on_local_enum_messages = None
+        self.result = CheckResult(hostname)
 
-        self._uncommitted_changes_enum = None
-        self._uncommitted_changes_messages = None
+        self._fetch_results: Dict[str, Dict[str, bool | str | float]] = {}
 
     @property
     def hostname(self) -> str:
@@ -43,55 +110,140 @@ class InstrumentChecker:
         """
         return self._hostname
 
-    def check_for_uncommitted_changes(self) -> Tuple[CHECK, List[any]]:
-        """Check if there are any uncommitted changes on the instrument via SSH.
+    def _note_failure(self, ssh_process: Dict[str, bool | str]) -> None:
+        """Remember why a check couldn't be determined, if no reason is known yet.
 
         Args:
-            hostname (str): The hostname to connect to.
+            ssh_process (dict): The failed result that made the check undeterminable.
+
+        Returns:
+            None
+
+        """
+        if self.undeterminable_reason is None:
+            self.undeterminable_reason = ssh_process.get("reason") or COMMAND_FAILURE
+
+    def set_all_undeterminable(self, reason: str) -> None:
+        """Mark every check as undeterminable, e.g. when the host can't be reached.
+
+        Args:
+            reason (str): Why the checks couldn't be run.
+
+        Returns:
+            None
+
+        """
+        self.undeterminable_reason = reason
+        self.commits_upstream_not_on_local_enum = CHECK.UNDETERMINABLE
+        self.commits_upstream_not_on_local_messages = None
+        self.commits_local_not_on_upstream_enum = CHECK.UNDETERMINABLE
+        self.commits_local_not_on_upstream_messages = None
+        self.uncommitted_changes_enum = CHECK.UNDETERMINABLE
+        self.uncommitted_changes_messages = []
+        self.commits_upstream_not_on_local_total = None
+        self.commits_local_not_on_upstream_total = None
+        self.uncommitted_changes_total = None
+
+    @timed("check")
+    def check_for_uncommitted_changes(self) -> Tuple[CHECK, List[any], int | None]:
+        """Check if there are any uncommitted changes on the instrument via SSH.
 
         Returns:
             CHECK: The result of the check.
+            list: The changed files if SHOW_UNCOMMITTED_CHANGES_MESSAGES is true.
+            int: How many files have changed, None if undeterminable.
 
         """
-        command = f"cd /d {self.repo_dir} && git status --porcelain"
-        ssh_process = SSHAccessUtils.run_ssh_command(
-            self.hostname,
-            os.environ["SSH_CREDENTIALS_USR"],
-            os.environ["SSH_CREDENTIALS_PSW"],
-            command,
-        )
+        # the status and diff can be huge, so they are parsed and go straight to the
+        # artefact as they arrive
+        with JenkinsUtils.open_git_status(
+            self.hostname, self.target.artefact_dir
+        ) as diff_writer:
+            status = PorcelainStatusParser(sink=diff_writer.status_sink())
+            command = f"cd /d {self.repo_dir} && git status --porcelain"
+            ssh_process = SSHAccessUtils.run_ssh_command(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                command,
+                stdout_sink=status,
+            )
 
-        if os.environ["DEBUG_MODE"] == "true":
-            print(f"DEBUG: Running command {command}")
+            if self.settings.debug_mode:
+                print(f"DEBUG: Running command {command}")
 
-        command = f"cd /d {self.repo_dir} && git --no-pager diff --ignore-cr-at-eol"
-        ssh_process_diff = SSHAccessUtils.run_ssh_command(
-            self.hostname,
-            os.environ["SSH_CREDENTIALS_USR"],
-            os.environ["SSH_CREDENTIALS_PSW"],
-            command,
-        )
+            if not ssh_process["success"]:
+                self._note_failure(ssh_process)
+                return CHECK.UNDETERMINABLE, [], None
 
-        if os.environ["DEBUG_MODE"] == "true":
-            print(f"DEBUG: Running command {command}")
+            command = f"cd /d {self.repo_dir} && git --no-pager diff --ignore-cr-at-eol"
+            ssh_process_diff = SSHAccessUtils.run_ssh_command(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                command,
+                stdout_sink=diff_writer,
+            )
 
-        if ssh_process["success"]:
-            status = ssh_process["output"]
+            if self.settings.debug_mode:
+                print(f"DEBUG: Running command {command}")
+
+            return self._uncommitted_changes_result(
+                ssh_process, ssh_process_diff, diff_writer, status
+            )
+
+    def _uncommitted_changes_result(
+        self,
+        ssh_process: Dict[str, bool | str],
+        ssh_process_diff: Dict[str, bool | str],
+        diff_writer: GitStatusWriter = None,
+        status: PorcelainStatusParser = None,
+    ) -> Tuple[CHECK, List[any], int | None]:
+        """Work out the uncommitted changes check from git status and git diff output.
+
+        Args:
+            ssh_process (dict): The result of running git status --porcelain.
+            ssh_process_diff (dict): The result of running git diff.
+            diff_writer (GitStatusWriter): The writer the diff was streamed to, if
+                it isn't in the output of ssh_process_diff.
+            status (PorcelainStatusParser): The parser the status was streamed to,
+                and through it to diff_writer, if it isn't in the output of
+                ssh_process.
+
+        Returns:
+            CHECK: The result of the check.
+            list: The changed files if SHOW_UNCOMMITTED_CHANGES_MESSAGES is true.
+            int: How many files have changed, None if undeterminable.
+
+        """
+        if not ssh_process["success"]:
+            self._note_failure(ssh_process)
+            return CHECK.UNDETERMINABLE, [], None
+
+        status_text = None
+        if status is None:
+            status_text = ssh_process["output"]
+            status = PorcelainStatusParser()
+            status.feed(status_text)
+        status.close()
+        self.status_digest = status.hexdigest()
+
+        if diff_writer is not None:
+            diff_writer.save(status_text, include_diff=ssh_process_diff["success"])
+        else:
             if ssh_process_diff["success"]:
-                status_save = status + "\n\n" + ssh_process_diff["output"]
-            else:
-                status_save = status
-            JenkinsUtils.save_git_status(self.hostname, status_save, os.environ["WORKSPACE"])
-
-            status_stripped = status.strip()
-            if status_stripped != "" and os.environ["SHOW_UNCOMMITTED_CHANGES_MESSAGES"] == "true":
-                return CHECK.TRUE, status_stripped.split("\n")
-            elif status_stripped != "":
-                return CHECK.TRUE, []
+                status_save = status_text + "\n\n" + ssh_process_diff["output"]
             else:
-                return CHECK.FALSE, []
-        else:
-            return CHECK.UNDETERMINABLE, []
+                status_save = status_text
+            JenkinsUtils.save_git_status(
+                self.hostname, status_save, self.target.artefact_dir
+            )
+
+        if status.total == 0:
+            return CHECK.FALSE, [], 0
+        if self.settings.show_uncommitted_changes_messages:
+            return CHECK.TRUE, status.files, status.total
+        return CHECK.TRUE, [], status.total
 
     def get_parent_epics_branch(
         self,
@@ -99,35 +251,212 @@ class InstrumentChecker:
     ) -> Union[str | bool]:
         """Get the parent branch of the instrument branch.
 
+        The parent remembered from an earlier run is used as long as HEAD hasn't
+        moved since, otherwise it is worked out again from the commit ancestry.
+
+        Args:
+            hostname (str): The hostname to connect to.
+
+        Returns:
+            str: The name of the parent branch, or False if it couldn't be found.
+
+        """
+        parent = self._run_parent_probe(hostname, self._remembered_parent() is None)
+        if parent is None:
+            # HEAD has moved since the parent was remembered
+            parent = self._run_parent_probe(hostname, resolve=True)
+        return parent
+
+    def _run_parent_probe(self, hostname: str, resolve: bool) -> str | bool | None:
+        """Run a probe for the parent branch of the instrument branch.
+
         Args:
             hostname (str): The hostname to connect to.
+            resolve (bool): Whether to work the parent out from the commit ancestry
+                rather than check the remembered one.
 
         Returns:
-            str: The name of the parent branch.
+            str: As for _parent_epics_branch_result().
 
         """
-        command = f"cd /d {self.repo_dir} && git log"
+        batch = self._build_parent_batch(resolve)
+        command = batch.command()
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
         ssh_process = SSHAccessUtils.run_ssh_command(
             hostname,
-            os.environ["SSH_CREDENTIALS_USR"],
-            os.environ["SSH_CREDENTIALS_PSW"],
+            self.settings.ssh_user,
+            self.settings.ssh_password,
             command,
         )
-        if ssh_process["success"]:
-            if "galil-old" in ssh_process["output"]:
-                return "origin/galil-old"
-            else:
-                return "origin/main"
-        else:
+        return self._parent_epics_branch_result(batch.parse(ssh_process), resolve)
+
+    def _remembered_parent(self) -> Dict | None:
+        """Get the parent branch remembered for the instrument from an earlier run.
+
+        Returns:
+            dict: The "head" it was worked out at and the "parent", or None.
+
+        """
+        if self.parent_store is None:
+            return None
+        return self.parent_store.get(self.hostname)
+
+    def _build_parent_batch(self, resolve: bool) -> GitProbeBatch:
+        """Build the probe for the parent branch of the instrument branch.
+
+        The probe gets HEAD and, if resolving, how many commits each candidate
+        parent (but the last) has that the last doesn't, in all and outside HEAD.
+        If HEAD has fewer outside it, HEAD has some of them, so is based on it.
+
+        Args:
+            resolve (bool): Whether to work the parent out from the commit ancestry
+                rather than check the remembered one.
+
+        Returns:
+            GitProbeBatch: The batch of commands.
+
+        """
+        batch = GitProbeBatch(self.repo_dir)
+        batch.add("head", "git rev-parse HEAD")
+        if resolve:
+            default = self.epics_parent_branches[-1]
+            for branch in self.epics_parent_branches[:-1]:
+                batch.add(
+                    f"{branch}_only",
+                    f"git rev-list --count origin/{branch} --not origin/{default}",
+                )
+                batch.add(
+                    f"{branch}_outside_head",
+                    f"git rev-list --count origin/{branch} --not origin/{default} HEAD",
+                )
+        return batch
+
+    def _parent_epics_branch_result(
+        self, results: Dict[str, Dict[str, bool | str]], resolve: bool
+    ) -> str | bool | None:
+        """Work out the parent branch of the instrument branch from a parent probe.
+
+        A resolved parent is remembered, along with HEAD, for later runs.
+
+        Args:
+            results (dict): The result of each section of _build_parent_batch().
+            resolve (bool): Whether the probe resolved the parent.
+
+        Returns:
+            str: The name of the parent branch, False if HEAD couldn't be read, or
+                None if HEAD has moved since the remembered parent was worked out.
+
+        """
+        if not results["head"]["success"]:
             return False
+        head = results["head"]["output"].strip()
+        if not resolve:
+            remembered = self._remembered_parent()
+            return remembered["parent"] if remembered["head"] == head else None
+
+        parent = f"origin/{self.epics_parent_branches[-1]}"
+        for branch in self.epics_parent_branches[:-1]:
+            only = results[f"{branch}_only"]
+            outside_head = results[f"{branch}_outside_head"]
+            if not (only["success"] and outside_head["success"]):
+                continue
+            try:
+                if int(outside_head["output"]) < int(only["output"]):
+                    parent = f"origin/{branch}"
+                    break
+            except ValueError:
+                continue
+        if self.parent_store is not None:
+            self.parent_store.put(self.hostname, {"head": head, "parent": parent})
+        return parent
+
+    def _head_moved(self, head: Dict[str, bool | str]) -> bool:
+        """Whether HEAD has moved since the remembered parent was worked out.
+
+        Args:
+            head (dict): The result of running git rev-parse HEAD.
+
+        Returns:
+            bool: True if HEAD is different, couldn't be read, or there is no
+                remembered parent.
+
+        """
+        remembered = self._remembered_parent()
+        return (
+            not head["success"]
+            or remembered is None
+            or head["output"].strip() != remembered["head"]
+        )
+
+    def _fetch_refspec(self, upstream_branch: str = None) -> str:
+        """Get what to fetch from origin for a comparison against upstream_branch.
+
+        Args:
+            upstream_branch (str): The remote tracking branch being compared against.
+
+        Returns:
+            str: The branch to fetch, or "" to fetch all of origin.
+
+        """
+        if self.narrow_fetch and str(upstream_branch).startswith("origin/"):
+            return upstream_branch[len("origin/") :]
+        return ""
 
+    def fetch_origin(
+        self, upstream_branch: str = None
+    ) -> Dict[str, bool | str | float]:
+        """Fetch from origin on the instrument, at most once per run.
+
+        The result is remembered, so later comparisons reuse it rather than fetching
+        again. A fetch of all of origin also satisfies any narrow fetch.
+
+        Args:
+            upstream_branch (str): The remote tracking branch being compared against,
+                only that branch is fetched if NARROW_FETCH is true.
+
+        Returns:
+            dict: The result of the fetch, with the time it took in seconds.
+
+        """
+        refspec = self._fetch_refspec(upstream_branch)
+        if "" in self._fetch_results:
+            return self._fetch_results[""]
+        if refspec in self._fetch_results:
+            return self._fetch_results[refspec]
+
+        # Fetch latest changes from the remote, NOT PULL
+        fetch_command = f"cd /d {self.repo_dir} && git fetch origin {refspec}".rstrip()
+
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {fetch_command}")
+
+        start = time.monotonic()
+        ssh_process_fetch = SSHAccessUtils.run_ssh_command(
+            self.hostname,
+            self.settings.ssh_user,
+            self.settings.ssh_password,
+            fetch_command,
+        )
+        result = dict(ssh_process_fetch, duration=time.monotonic() - start)
+        self._fetch_results[refspec] = result
+
+        if self.settings.debug_mode:
+            print(
+                f"DEBUG: Fetch on {self.hostname} "
+                f"{'succeeded' if result['success'] else 'failed'} "
+                f"in {result['duration']:.2f}s"
+            )
+        return result
+
+    @timed("check")
     def git_branch_comparer(
         self,
         hostname: str,
         changes_on: str,
         subtracted_against: str = None,
         prefix: str = None,
-    ) -> CHECK:
+    ) -> Tuple[CHECK, dict | None, int | None]:
         """Get the commit messages between two branches on the instrument.
 
         Args:
@@ -139,6 +468,7 @@ class InstrumentChecker:
         Returns:
             CHECK: The result of the check.
             dict: A dictionary with the commit messages and their hashes.
+            int: How many commits there are, None if undeterminable.
 
         """
         branch_details = None
@@ -147,55 +477,85 @@ class InstrumentChecker:
         else:
             branch_details = ""
 
-        # Fetch latest changes from the remote, NOT PULL
-        fetch_command = f"cd /d {self.repo_dir} && git fetch origin"
-        ssh_process_fetch = SSHAccessUtils.run_ssh_command(
-            hostname,
-            os.environ["SSH_CREDENTIALS_USR"],
-            os.environ["SSH_CREDENTIALS_PSW"],
-            fetch_command,
+        upstream_branch = next(
+            (
+                branch
+                for branch in (changes_on, subtracted_against)
+                if isinstance(branch, str) and branch.startswith("origin/")
+            ),
+            None,
         )
-
-        if os.environ["DEBUG_MODE"] == "true":
-            print(f"DEBUG: Running command {fetch_command}")
+        ssh_process_fetch = self.fetch_origin(upstream_branch)
 
         if not ssh_process_fetch["success"]:
+            self._note_failure(ssh_process_fetch)
             return (
                 CHECK.UNDETERMINABLE,
                 None,
+                None,
             )
 
         command = f'cd /d {self.repo_dir} && git log --format="%h %s" {branch_details}'
 
-        if os.environ["DEBUG_MODE"] == "true":
+        if self.settings.debug_mode:
             print(f"DEBUG: Running command {command}")
 
+        log = GitLogParser(prefix)
         ssh_process = SSHAccessUtils.run_ssh_command(
             hostname,
-            os.environ["SSH_CREDENTIALS_USR"],
-            os.environ["SSH_CREDENTIALS_PSW"],
+            self.settings.ssh_user,
+            self.settings.ssh_password,
             command,
+            stdout_sink=log,
         )
 
+        return self._branch_comparison_result(ssh_process, log=log)
+
+    def _branch_comparison_result(
+        self,
+        ssh_process: Dict[str, bool | str],
+        prefix: str = None,
+        log: GitLogParser = None,
+    ) -> Tuple[CHECK, dict | None, int | None]:
+        """Work out a branch comparison check from the output of git log A..B.
+
+        Args:
+            ssh_process (dict): The result of running git log.
+            prefix (str): The prefix to check for in commit messages.
+            log (GitLogParser): The parser the log was streamed to, if it isn't in
+                the output of ssh_process.
+
+        Returns:
+            CHECK: The result of the check.
+            dict: A dictionary with the commit messages and their hashes.
+            int: How many commits there are, None if undeterminable.
+
+        """
         if ssh_process["success"]:
-            output = ssh_process["output"]
-            commit_dict = self.split_git_log(output, prefix)
+            if log is None:
+                log = GitLogParser(prefix)
+                log.feed(ssh_process["output"])
+            log.close()
 
-            if len(commit_dict) > 0:
+            if log.total > 0:
                 return (
                     CHECK.TRUE,
-                    commit_dict,
+                    log.commits,
+                    log.total,
                 )
             else:
                 return (
                     CHECK.FALSE,
                     None,
+                    0,
                 )
 
         else:
+            self._note_failure(ssh_process)
             return (
                 CHECK.UNDETERMINABLE,
                 None,
+                None,
             )
 
     def split_git_log(self, git_log: str, prefix: str) -> dict:
@@ -203,77 +563,885 @@ class InstrumentChecker:
 
         Args:
             git_log (str): The git log to split.
+            prefix (str): If given, only commits whose message starts with this are
+                included.
+
+        Returns:
+            dict: The commit hashes as keys and the commit messages as values, every
+                commit rather than the first GIT_LOG_MAX_COMMITS.
+
+        """
+        log = GitLogParser(prefix, max_commits=0)
+        log.feed(git_log)
+        log.close()
+        return log.commits
+
+    def _count_command(self, upstream_branch: str) -> str:
+        """Get the command that counts the commits either side of the upstream branch.
+
+        Args:
+            upstream_branch (str): The upstream branch.
+
+        Returns:
+            str: The git rev-list command, which outputs the number of commits on
+                local not upstream, then the number on upstream not on local.
+
+        """
+        return f"git rev-list --left-right --count HEAD...{upstream_branch}"
+
+    def _local_log_command(self, upstream_branch: str) -> str:
+        """Get the command that lists the commits on local not upstream, capped.
+
+        Args:
+            upstream_branch (str): The upstream branch.
+
+        Returns:
+            str: The git log command.
+
+        """
+        max_commits = self.settings.git_log_max_commits
+        max_count = f" --max-count={max_commits}" if max_commits else ""
+        return f"git log{max_count} --format=%h%x20%s {upstream_branch}..HEAD"
+
+    def _commit_counts(
+        self, ssh_process: Dict[str, bool | str], command: str = None
+    ) -> Tuple[int, int] | None:
+        """Work out the commit counts from the output of git rev-list --count.
+
+        Args:
+            ssh_process (dict): The result of running _count_command().
+            command (str): The command that was run, to report if its output can't
+                be parsed.
 
         Returns:
-            dict: A dictionary with the commit hashes as keys and the commit messages as values.
+            tuple: The number of commits on local not upstream and on upstream not
+                on local, or None if they couldn't be counted.
 
         """
-        commit_dict = {}
-        commit_lines = git_log.split("\n")
-        commit_lines = [line for line in commit_lines if line.strip() != ""]
-        for line in commit_lines:
-            split_line = line.split(
-                " ",
-                1,
+        if not ssh_process["success"]:
+            self._note_failure(ssh_process)
+            return None
+        try:
+            local, upstream = (int(count) for count in ssh_process["output"].split())
+        except ValueError:
+            ran = "" if command is None else f" from {command!r}"
+            print(
+                f"INFO: {self.hostname}: unexpected commit counts{ran}: "
+                f"{ssh_process['output'].strip()!r}"
             )
-            hash = split_line[0]
-            message = split_line[1]
-            if prefix is None or message.startswith(prefix):
-                commit_dict[hash] = message
-        return commit_dict
+            self._note_failure(ssh_process)
+            return None
+        return local, upstream
 
-    def check_instrument(self) -> dict:
-        """Check if there are any hotfixes or uncommitted changes on AN instrument.
+    def _set_commit_counts(self, counts: Tuple[int, int] | None) -> None:
+        """Set both commit checks from the commit counts, without any messages.
+
+        Args:
+            counts (tuple): The result of _commit_counts().
 
         Returns:
-            dict: A dictionary with the result of the checks.
+            None
 
         """
-        # Examples of how to use the git_branch_comparer function decided to not be used in this iteration of the check
-        # Check if any hotfixes run on the instrument with the prefix "Hotfix:"
-        # hotfix_commits_enum, hotfix_commits_messages = git_branch_comparer(
-        #     hostname, local_branch, upstream_branch, prefix="Hotfix:")
+        if counts is None:
+            self.commits_upstream_not_on_local_enum = CHECK.UNDETERMINABLE
+            self.commits_local_not_on_upstream_enum = CHECK.UNDETERMINABLE
+            local, upstream = None, None
+        else:
+            local, upstream = counts
+            self.commits_upstream_not_on_local_enum = (
+                CHECK.TRUE if upstream else CHECK.FALSE
+            )
+            self.commits_local_not_on_upstream_enum = (
+                CHECK.TRUE if local else CHECK.FALSE
+            )
+        self.commits_upstream_not_on_local_messages = None
+        self.commits_upstream_not_on_local_total = upstream
+        self.commits_local_not_on_upstream_messages = None
+        self.commits_local_not_on_upstream_total = local
+
+    def _set_local_commit_messages(
+        self, ssh_process: Dict[str, bool | str], log: GitLogParser = None
+    ) -> None:
+        """Set the messages of the commits on local not upstream from their log.
+
+        The check itself is already known from the counts, so if the log can't be
+        read the commits are just reported by count.
+
+        Args:
+            ssh_process (dict): The result of running _local_log_command().
+            log (GitLogParser): The parser the log was streamed to, if it isn't in
+                the output of ssh_process.
+
+        Returns:
+            None
+
+        """
+        if not ssh_process["success"]:
+            print(f"INFO: {self.hostname}: could not list the commits on local")
+            return
+        if log is None:
+            log = GitLogParser()
+            log.feed(ssh_process["output"])
+        log.close()
+        self.commits_local_not_on_upstream_messages = log.commits or None
+
+    @timed("check")
+    def compare_commit_counts(self, upstream_branch: str) -> None:
+        """Count the commits either side of the upstream branch in one command.
+
+        Commit messages are then only listed for the commits on local not upstream,
+        if there are any, and at most GIT_LOG_MAX_COMMITS of them. The commits on
+        upstream not on local are only counted.
 
+        Args:
+            upstream_branch (str): The upstream branch to compare against.
+
+        Returns:
+            None
+
+        """
+        ssh_process_fetch = self.fetch_origin(upstream_branch)
+        if not ssh_process_fetch["success"]:
+            self._note_failure(ssh_process_fetch)
+            self._set_commit_counts(None)
+            return
+
+        command = f"cd /d {self.repo_dir} && {self._count_command(upstream_branch)}"
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
+        counts = self._commit_counts(
+            SSHAccessUtils.run_ssh_command(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                command,
+            ),
+            command,
+        )
+        self._set_commit_counts(counts)
+        if counts is None or counts[0] == 0:
+            return
+
+        command = f"cd /d {self.repo_dir} && {self._local_log_command(upstream_branch)}"
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
+        log = GitLogParser()
+        ssh_process = SSHAccessUtils.run_ssh_command(
+            self.hostname,
+            self.settings.ssh_user,
+            self.settings.ssh_password,
+            command,
+            stdout_sink=log,
+        )
+        self._set_local_commit_messages(ssh_process, log)
+
+    def get_upstream_branch(self) -> str | bool:
+        """Get the upstream branch to compare the instrument against.
+
+        Returns:
+            str: The upstream branch, or False if it could not be determined.
+
+        """
         upstream_branch = None
-        if os.environ["UPSTREAM_BRANCH_CONFIG"] == "hostname":
+        if self.target.upstream_config == "hostname":
             upstream_branch = "origin/" + self.hostname
-        elif os.environ["UPSTREAM_BRANCH_CONFIG"] == "epics":
+        elif self.target.upstream_config == "epics":
             # used for EPICS repo to get the parent branch of the instrument branch
             upstream_branch = self.get_parent_epics_branch(self.hostname)
-        elif os.environ["UPSTREAM_BRANCH_CONFIG"] == "main":
+        elif self.target.upstream_config == "main":
             upstream_branch = "origin/main"
-        elif os.environ["UPSTREAM_BRANCH_CONFIG"] == "master":
+        elif self.target.upstream_config == "master":
             upstream_branch = "origin/master"
         else:
             # if the UPSTREAM_BRANCH_CONFIG is not set to any of the above,  set it to the value of the environment variable assuming user wants custom branch
-            upstream_branch = os.environ["UPSTREAM_BRANCH_CONFIG"]
+            upstream_branch = self.target.upstream_config
+
+        return upstream_branch
+
+    def _remembered_upstream_branch(self) -> str | None:
+        """Get the upstream branch to use without asking the instrument, if known.
+
+        Returns:
+            str: The remembered parent of an EPICS instrument branch, to be checked
+                against HEAD once used, or None.
+
+        """
+        if self.target.upstream_config != "epics":
+            return None
+        remembered = self._remembered_parent()
+        return None if remembered is None else remembered["parent"]
+
+    def _build_probe_batch(
+        self, upstream_branch: str, check_head: bool = False
+    ) -> GitProbeBatch:
+        """Build the batch of commands that makes up a batched probe.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against.
+            check_head (bool): Whether to also get HEAD, to check a remembered
+                upstream branch is still right.
+
+        Returns:
+            GitProbeBatch: The batch of commands.
+
+        """
+        batch = GitProbeBatch(self.repo_dir)
+        if check_head:
+            batch.add("head", "git rev-parse HEAD")
+        self.upstream_branch = upstream_branch
+        # Fetch latest changes from the remote, NOT PULL
+        fetch_command = f"git fetch origin {self._fetch_refspec(upstream_branch)}"
+        batch.add("fetch", fetch_command.rstrip(), merge_stderr=True)
+        if self.commit_counts_only:
+            batch.add("counts", self._count_command(upstream_branch))
+            batch.add("local_not_on_upstream", self._local_log_command(upstream_branch))
+        else:
+            batch.add(
+                "upstream_not_on_local",
+                f"git log --format=%h%x20%s HEAD..{upstream_branch}",
+            )
+            batch.add(
+                "local_not_on_upstream",
+                f"git log --format=%h%x20%s {upstream_branch}..HEAD",
+            )
+        batch.add("status", "git status --porcelain")
+        batch.add("diff", "git --no-pager diff --ignore-cr-at-eol")
+        return batch
+
+    @timed("check")
+    def check_instrument_batched(self, upstream_branch: str = None) -> None:
+        """Run all the checks on the instrument in a single SSH round trip.
+
+        An EPICS instrument is probed against its remembered parent branch, and only
+        if HEAD has moved since is the parent worked out again, and the probe run
+        again if that changed it.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against, by
+                default the remembered or configured one.
+
+        Returns:
+            None
+
+        """
+        check_head = False
+        if upstream_branch is None:
+            upstream_branch = self._remembered_upstream_branch()
+            check_head = upstream_branch is not None
+        if upstream_branch is None:
+            upstream_branch = self.get_upstream_branch()
+
+        batch = self._build_probe_batch(upstream_branch, check_head)
+        command = batch.command()
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
+
+        with JenkinsUtils.open_git_status(
+            self.hostname, self.target.artefact_dir
+        ) as diff_writer:
+            sinks = self._probe_sinks(diff_writer)
+            parser = batch.stream_parser(sinks=sinks)
+            ssh_process = SSHAccessUtils.run_ssh_command(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                command,
+                stdout_sink=parser,
+            )
+            results = parser.results(ssh_process)
+            self._apply_probe_results(batch, results, sinks)
+
+        if check_head and self._head_moved(results["head"]):
+            parent = self._run_parent_probe(self.hostname, resolve=True)
+            if parent and parent != upstream_branch:
+                self.check_instrument_batched(parent)
+
+    @staticmethod
+    def _probe_sinks(diff_writer: GitStatusWriter) -> Dict[str, object]:
+        """Get where to stream each section of a batched probe's output to.
+
+        Args:
+            diff_writer (GitStatusWriter): The writer for the git status artefact.
+
+        Returns:
+            dict: The log parsers, the status parser (which passes the status on to
+                the artefact) and the artefact writer for the diff, keyed by section.
+
+        """
+        return {
+            "upstream_not_on_local": GitLogParser(),
+            "local_not_on_upstream": GitLogParser(),
+            "status": PorcelainStatusParser(sink=diff_writer.status_sink()),
+            "diff": diff_writer,
+        }
+
+    def _apply_probe_results(
+        self,
+        batch: GitProbeBatch,
+        results: Dict[str, Dict[str, bool | str]],
+        sinks: Dict[str, object] = None,
+    ) -> None:
+        """Set the check results from the demultiplexed output of a batched probe.
+
+        Args:
+            batch (GitProbeBatch): The batch that was run.
+            results (dict): The result of each section of the batch.
+            sinks (dict): The parsers and writer from _probe_sinks() that sections
+                were streamed to, if they aren't in the results.
+
+        Returns:
+            None
+
+        """
+        sinks = sinks or {}
+        for name in batch.names:
+            if not results[name]["success"]:
+                print(
+                    f"INFO: {self.hostname}: batched {name} check failed: "
+                    f"{results[name]['output'].strip()}"
+                )
+
+        if results["fetch"]["success"] and "counts" in results:
+            counts = self._commit_counts(
+                results["counts"], self._count_command(self.upstream_branch)
+            )
+            self._set_commit_counts(counts)
+            if counts is not None and counts[0] > 0:
+                self._set_local_commit_messages(
+                    results["local_not_on_upstream"],
+                    sinks.get("local_not_on_upstream"),
+                )
+        elif results["fetch"]["success"]:
+            (
+                self.commits_upstream_not_on_local_enum,
+                self.commits_upstream_not_on_local_messages,
+                self.commits_upstream_not_on_local_total,
+            ) = self._branch_comparison_result(
+                results["upstream_not_on_local"],
+                log=sinks.get("upstream_not_on_local"),
+            )
+            (
+                self.commits_local_not_on_upstream_enum,
+                self.commits_local_not_on_upstream_messages,
+                self.commits_local_not_on_upstream_total,
+            ) = self._branch_comparison_result(
+                results["local_not_on_upstream"],
+                log=sinks.get("local_not_on_upstream"),
+            )
+        else:
+            self._note_failure(results["fetch"])
+            self._set_commits_undeterminable()
 
-        # Check if any commits on upstream that are not on the local branch
         (
-            self.commits_upstream_not_on_local_enum,
-            self.commits_upstream_not_on_local_messages,
-        ) = self.git_branch_comparer(
-            self.hostname,
-            changes_on=upstream_branch,
-            subtracted_against="HEAD",
-            prefix=None,
+            self.uncommitted_changes_enum,
+            self.uncommitted_changes_messages,
+            self.uncommitted_changes_total,
+        ) = self._uncommitted_changes_result(
+            results["status"],
+            results["diff"],
+            sinks.get("diff"),
+            sinks.get("status"),
         )
 
-        # Check if any commits on local branch that are not on the upstream
-        (
-            self.commits_local_not_on_upstream_enum,
-            self.commits_local_not_on_upstream_messages,
-        ) = self.git_branch_comparer(
+    def _set_commits_undeterminable(self) -> None:
+        """Mark both commit checks as undeterminable, e.g. when the fetch failed.
+
+        Returns:
+            None
+
+        """
+        self.commits_upstream_not_on_local_enum = CHECK.UNDETERMINABLE
+        self.commits_upstream_not_on_local_messages = None
+        self.commits_upstream_not_on_local_total = None
+        self.commits_local_not_on_upstream_enum = CHECK.UNDETERMINABLE
+        self.commits_local_not_on_upstream_messages = None
+        self.commits_local_not_on_upstream_total = None
+
+    def _remote_check_command(self, upstream_branch: str) -> str:
+        """Get the command that runs the check script in the repo on the instrument.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against.
+
+        Returns:
+            str: The command.
+
+        """
+        refspec = self._fetch_refspec(upstream_branch)
+        return f"cd /d {self.repo_dir} && " + remote_check_command(
+            self.settings.remote_python,
+            upstream_branch,
+            [refspec] if refspec else [],
+            self.settings.git_log_max_commits,
+            self.settings.git_status_max_files,
+            list_upstream=not self.commit_counts_only,
+        )
+
+    @staticmethod
+    def _remote_comparison_result(
+        comparison: Dict,
+    ) -> Tuple[CHECK, dict | None, int | None]:
+        """Work out a branch comparison check from a section of the remote report.
+
+        Args:
+            comparison (dict): The "total" commits and the listed "commits", or the
+                "error" if git log failed.
+
+        Returns:
+            CHECK: The result of the check.
+            dict: A dictionary with the commit messages and their hashes.
+            int: How many commits there are, None if undeterminable.
+
+        """
+        if "error" in comparison:
+            return CHECK.UNDETERMINABLE, None, None
+        if comparison["total"] == 0:
+            return CHECK.FALSE, None, 0
+        commits = dict(comparison["commits"])
+        return CHECK.TRUE, commits or None, comparison["total"]
+
+    def _apply_remote_report(self, ssh_process: Dict[str, bool | str]) -> Dict | None:
+        """Set the check results from the report of the check script.
+
+        Args:
+            ssh_process (dict): The result of running _remote_check_command().
+
+        Returns:
+            dict: The report, or None if the script couldn't be run, in which case
+                every check is undeterminable.
+
+        """
+        report = None
+        if ssh_process["success"]:
+            report = parse_remote_report(ssh_process["output"])
+            if report is None:
+                print(
+                    f"INFO: {self.hostname}: unexpected output from the check script "
+                    f"{ssh_process['output'].strip()[-200:]!r}"
+                )
+        if report is None:
+            self._note_failure(ssh_process)
+            self.set_all_undeterminable(self.undeterminable_reason)
+            return None
+
+        for name in ("upstream_not_on_local", "local_not_on_upstream", "status"):
+            if "error" in report.get(name, {}):
+                print(
+                    f"INFO: {self.hostname}: remote {name} check failed: "
+                    f"{report[name]['error']}"
+                )
+        if not report["fetch"]["success"]:
+            print(
+                f"INFO: {self.hostname}: remote fetch failed: "
+                f"{report['fetch']['output']}"
+            )
+            self._note_failure({"reason": COMMAND_FAILURE})
+            self._set_commits_undeterminable()
+        else:
+            upstream = self._remote_comparison_result(report["upstream_not_on_local"])
+            local = self._remote_comparison_result(report["local_not_on_upstream"])
+            if CHECK.UNDETERMINABLE in (upstream[0], local[0]):
+                self._note_failure({"reason": COMMAND_FAILURE})
+            (
+                self.commits_upstream_not_on_local_enum,
+                self.commits_upstream_not_on_local_messages,
+                self.commits_upstream_not_on_local_total,
+            ) = upstream
+            (
+                self.commits_local_not_on_upstream_enum,
+                self.commits_local_not_on_upstream_messages,
+                self.commits_local_not_on_upstream_total,
+            ) = local
+
+        status = report["status"]
+        if "error" in status:
+            self._note_failure({"reason": COMMAND_FAILURE})
+            (
+                self.uncommitted_changes_enum,
+                self.uncommitted_changes_messages,
+                self.uncommitted_changes_total,
+            ) = (CHECK.UNDETERMINABLE, [], None)
+            return report
+
+        self.status_digest = status["digest"]
+        self.uncommitted_changes_enum = CHECK.TRUE if status["total"] else CHECK.FALSE
+        self.uncommitted_changes_total = status["total"]
+        self.uncommitted_changes_messages = (
+            status["files"] if self.settings.show_uncommitted_changes_messages else []
+        )
+        return report
+
+    def _diff_changed(self, report: Dict) -> bool:
+        """Whether the git status artefact needs the status and diff pulled again.
+
+        Args:
+            report (dict): The report of the check script.
+
+        Returns:
+            bool: True unless the status and diff digests match those the artefact
+                was saved with and the artefact is still there.
+
+        """
+        if self.diff_store is None or "error" in report["diff"]:
+            return True
+        remembered = self.diff_store.get(self.hostname)
+        return (
+            remembered is None
+            or remembered["status_digest"] != report["status"]["digest"]
+            or remembered["diff_digest"] != report["diff"]["digest"]
+            or not JenkinsUtils.git_status_saved(
+                self.hostname, self.target.artefact_dir
+            )
+        )
+
+    def _remember_diff(self, report: Dict) -> None:
+        """Remember the digests the git status artefact was just saved with.
+
+        Args:
+            report (dict): The report of the check script.
+
+        Returns:
+            None
+
+        """
+        if self.diff_store is None:
+            return
+        if self.uncommitted_changes_enum == CHECK.UNDETERMINABLE or (
+            "error" in report["diff"]
+        ):
+            self.diff_store.discard(self.hostname)
+            return
+        self.diff_store.put(
             self.hostname,
-            changes_on="HEAD",
-            subtracted_against=upstream_branch,
-            prefix=None,
+            {
+                "status_digest": self.status_digest,
+                "diff_digest": report["diff"]["digest"],
+            },
         )
 
+    @timed("check")
+    def check_instrument_remote(self, upstream_branch: str = None) -> None:
+        """Run all the checks on the instrument with the check script.
+
+        The script does the git work on the instrument and sends back one line of
+        JSON, and the status and diff are only pulled for the git status artefact
+        when their digests have changed since it was saved.
+
+        Args:
+            upstream_branch (str): The upstream branch to compare against, by
+                default the remembered or configured one.
+
+        Returns:
+            None
+
+        """
+        check_head = False
+        if upstream_branch is None:
+            upstream_branch = self._remembered_upstream_branch()
+            check_head = upstream_branch is not None
+        if upstream_branch is None:
+            upstream_branch = self.get_upstream_branch()
+        self.upstream_branch = upstream_branch
+
+        command = self._remote_check_command(upstream_branch)
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
+        report = self._apply_remote_report(
+            SSHAccessUtils.run_ssh_command(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                command,
+            )
+        )
+        if report is None:
+            return
+
+        if check_head and self._head_moved(self._remote_head(report)):
+            parent = self._run_parent_probe(self.hostname, resolve=True)
+            if parent and parent != upstream_branch:
+                self.check_instrument_remote(parent)
+                return
+
+        if self.uncommitted_changes_enum != CHECK.UNDETERMINABLE and (
+            self._diff_changed(report)
+        ):
+            (
+                self.uncommitted_changes_enum,
+                self.uncommitted_changes_messages,
+                self.uncommitted_changes_total,
+            ) = self.check_for_uncommitted_changes()
+            self._remember_diff(report)
+
+    @staticmethod
+    def _remote_head(report: Dict) -> Dict[str, bool | str]:
+        """Get HEAD from the report of the check script, as git rev-parse gives it.
+
+        Args:
+            report (dict): The report.
+
+        Returns:
+            dict: The success and output of git rev-parse HEAD.
+
+        """
+        head = report.get("head")
+        return {"success": head is not None, "output": head or ""}
+
+    def check_instrument(self) -> dict:
+        """Check if there are any hotfixes or uncommitted changes on AN instrument.
+
+        Returns:
+            dict: A dictionary with the result of the checks.
+
+        """
+        # Examples of how to use the git_branch_comparer function decided to not be used in this iteration of the check
+        # Check if any hotfixes run on the instrument with the prefix "Hotfix:"
+        # hotfix_commits_enum, hotfix_commits_messages, _ = git_branch_comparer(
+        #     hostname, local_branch, upstream_branch, prefix="Hotfix:")
+
+        if self.remote_check:
+            self.check_instrument_remote()
+            return
+
+        if self.batched_probe:
+            self.check_instrument_batched()
+            return
+
+        upstream_branch = self.get_upstream_branch()
+        self.upstream_branch = upstream_branch
+
+        if self.commit_counts_only:
+            # Count the commits either way, only listing those on the local branch
+            self.compare_commit_counts(upstream_branch)
+        else:
+            # Check if any commits on upstream that are not on the local branch
+            (
+                self.commits_upstream_not_on_local_enum,
+                self.commits_upstream_not_on_local_messages,
+                self.commits_upstream_not_on_local_total,
+            ) = self.git_branch_comparer(
+                self.hostname,
+                changes_on=upstream_branch,
+                subtracted_against="HEAD",
+                prefix=None,
+            )
+
+            # Check if any commits on local branch that are not on the upstream
+            (
+                self.commits_local_not_on_upstream_enum,
+                self.commits_local_not_on_upstream_messages,
+                self.commits_local_not_on_upstream_total,
+            ) = self.git_branch_comparer(
+                self.hostname,
+                changes_on="HEAD",
+                subtracted_against=upstream_branch,
+                prefix=None,
+            )
+
         # Check if any uncommitted changes are on the instrument
-        self.uncommitted_changes_enum, self.uncommitted_changes_messages = (
-            self.check_for_uncommitted_changes()
+        (
+            self.uncommitted_changes_enum,
+            self.uncommitted_changes_messages,
+            self.uncommitted_changes_total,
+        ) = self.check_for_uncommitted_changes()
+
+    def _build_fingerprint_batch(self, upstream_branch: str) -> GitProbeBatch:
+        """Build a cheap probe of the state of the repo on the instrument.
+
+        The probe gets HEAD, the upstream branch's commit (from origin itself via
+        ls-remote, so no fetch is needed) and hashes of git status and git diff.
+
+        Args:
+            upstream_branch (str): The upstream branch the instrument is compared to.
+
+        Returns:
+            GitProbeBatch: The batch of commands.
+
+        """
+        batch = GitProbeBatch(self.repo_dir)
+        batch.add("head", "git rev-parse HEAD")
+        if str(upstream_branch).startswith("origin/"):
+            branch = upstream_branch[len("origin/") :]
+            batch.add("upstream", f"git ls-remote origin refs/heads/{branch}")
+        else:
+            batch.add("upstream", f"git rev-parse {upstream_branch}")
+        batch.add("status", "git status --porcelain | git hash-object --stdin")
+        batch.add(
+            "diff", "git --no-pager diff --ignore-cr-at-eol | git hash-object --stdin"
         )
+        return batch
+
+    @staticmethod
+    def _fingerprint_result(
+        batch: GitProbeBatch, results: Dict[str, Dict[str, bool | str]]
+    ) -> Dict[str, str] | None:
+        """Turn the output of a fingerprint probe into a fingerprint.
+
+        Args:
+            batch (GitProbeBatch): The batch that was run.
+            results (dict): The result of each section of the batch.
+
+        Returns:
+            dict: The fingerprint, or None if any part of the probe failed.
+
+        """
+        fingerprint = {}
+        for name in batch.names:
+            if not results[name]["success"]:
+                return None
+            output = results[name]["output"].split()
+            fingerprint[name] = output[0] if output else ""
+        return fingerprint
+
+    def probe_fingerprint(self, upstream_branch: str) -> Dict[str, str] | None:
+        """Get a fingerprint of the state of the repo on the instrument.
+
+        Args:
+            upstream_branch (str): The upstream branch the instrument is compared to.
+
+        Returns:
+            dict: The fingerprint, or None if the probe failed.
+
+        """
+        batch = self._build_fingerprint_batch(upstream_branch)
+        command = batch.command()
+        if self.settings.debug_mode:
+            print(f"DEBUG: Running command {command}")
+
+        results = batch.parse(
+            SSHAccessUtils.run_ssh_command(
+                self.hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                command,
+            )
+        )
+        return self._fingerprint_result(batch, results)
+
+    def result_dict(self) -> Dict[str, Dict]:
+        """Get the results of the checks in a form that can be saved as JSON.
+
+        Returns:
+            dict: The result and messages of each check.
+
+        """
+        return {
+            name: {
+                "enum": getattr(self, f"{name}_enum").name,
+                "messages": getattr(self, f"{name}_messages"),
+                "total": getattr(self, f"{name}_total"),
+            }
+            for name in CHECK_NAMES
+        }
+
+    def restore_result(self, result: Dict[str, Dict]) -> None:
+        """Set the results of the checks from a saved result_dict().
+
+        Args:
+            result (dict): The saved results.
+
+        Returns:
+            None
+
+        """
+        for name in CHECK_NAMES:
+            setattr(self, f"{name}_enum", CHECK[result[name]["enum"]])
+            setattr(self, f"{name}_messages", result[name]["messages"])
+            setattr(self, f"{name}_total", result[name].get("total"))
+
+    def is_determinable(self) -> bool:
+        """Whether every check gave a result.
+
+        Returns:
+            bool: False if any check is undeterminable or has not been run.
+
+        """
+        return self.result.is_determinable()
+
+    def _can_reuse_state(
+        self, previous: Dict | None, fingerprint: Dict[str, str] | None
+    ) -> bool:
+        """Whether the result recorded on a previous run is still valid.
+
+        Args:
+            previous (dict): The state recorded on the previous run.
+            fingerprint (dict): The fingerprint of the repo now.
+
+        Returns:
+            bool: True if nothing has changed and the git status artefact is there.
+
+        """
+        return (
+            previous is not None
+            and fingerprint is not None
+            and previous["fingerprint"] == fingerprint
+            and JenkinsUtils.git_status_saved(self.hostname, self.target.artefact_dir)
+        )
+
+    def _record_state(
+        self,
+        state_store: CheckStateStore,
+        upstream_branch: str,
+        fingerprint: Dict[str, str] | None,
+    ) -> None:
+        """Record the state and result of a full check for the next run.
+
+        Args:
+            state_store (CheckStateStore): The store to record the state in.
+            upstream_branch (str): The upstream branch the fingerprint was taken for.
+            fingerprint (dict): The fingerprint taken before the check.
+
+        Returns:
+            None
+
+        """
+        if fingerprint is None or not self.is_determinable():
+            state_store.discard(self.hostname)
+            return
+        if self.upstream_branch != upstream_branch:
+            # the check used a different upstream branch to the probe (e.g. a new
+            # epics parent), so make sure the next run checks it fully again
+            fingerprint = dict(fingerprint, upstream=None)
+        state_store.put(
+            self.hostname,
+            {
+                "upstream_branch": self.upstream_branch,
+                "fingerprint": fingerprint,
+                "status_digest": self.status_digest,
+                "result": self.result_dict(),
+            },
+        )
+
+    def check_instrument_incrementally(self, state_store: CheckStateStore) -> None:
+        """Check the instrument, reusing the last result if its repo has not changed.
+
+        Args:
+            state_store (CheckStateStore): The store of the previous run's states.
+
+        Returns:
+            None
+
+        """
+        previous = state_store.get(self.hostname)
+        if previous is not None:
+            upstream_branch = previous["upstream_branch"]
+        else:
+            upstream_branch = self.get_upstream_branch()
+        fingerprint = self.probe_fingerprint(upstream_branch)
+
+        if self._can_reuse_state(previous, fingerprint):
+            print(
+                f"INFO: {self.target.label(self.hostname)} unchanged since last run, "
+                "reusing its result"
+            )
+            self.upstream_branch = upstream_branch
+            self.status_digest = previous.get("status_digest")
+            self.restore_result(previous["result"])
+            return
+
+        self.check_instrument()
+        self._record_state(state_store, upstream_branch, fingerprint)
 
     def as_string(self) -> str:
         """Return the Instrument object as a string.
@@ -1,69 +1,272 @@
 """Contains the RepoChecker class which is used to check the status of a specified repo on an instrument."""
 
+import asyncio
+import itertools
+import json
 import os
+import sqlite3
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import requests
-from packaging.version import InvalidVersion, Version
-
+from utils.hotfix_utils.check import CHECK
+from utils.hotfix_utils.check_result import CHECK_NAMES, CheckResult, ResultSummary
+from utils.hotfix_utils.check_schedule import (
+    AsyncCheckQueue,
+    CheckQueue,
+    CheckSchedule,
+)
+from utils.hotfix_utils.check_state import CheckStateStore
 from utils.hotfix_utils.InstrumentChecker import InstrumentChecker
+from utils.hotfix_utils.repo_target import RepoTarget, repo_targets
+from utils.hotfix_utils.run_history import LOCAL, UPSTREAM, RunHistoryStore
+from utils.hotfix_utils.sharding import (
+    save_shard_results,
+    shard_of,
+    shard_results_path,
+)
 
-from ..communication_utils.channel_access import (
-    ChannelAccessUtils,
+from ..communication_utils.instrument_list import (
+    INSTLIST_CACHE_MAX_AGE,
+    InstrumentList,
+    InstrumentListProvider,
+    InstrumentListUnavailableError,
+)
+from ..communication_utils.latency_history import LatencyHistory
+from ..communication_utils.reachability import ReachabilityProbe
+from ..communication_utils.ssh_access import (
+    BUDGET_EXCEEDED,
+    COMMAND_FAILURE,
+    CONNECTION_FAILURE,
+    UNREACHABLE,
+    SSHAccessUtils,
 )
-from ..hotfix_utils.check import CHECK
+from ..jenkins_utils.console_utils import buffered_stdout
+from ..jenkins_utils.jenkins_utils import JenkinsUtils
+from ..jenkins_utils.timing_utils import timings
+from ..settings import get_settings
+
+if TYPE_CHECKING:
+    from utils.hotfix_utils.AsyncInstrumentChecker import AsyncInstrumentChecker
 
 
 class RepoChecker:
     """A class to represent a repo checker."""
 
-    _uncommitted_changes_key = "uncommitted_changes"
-    _undeterminable_at_some_point_key = "undeterminable_at_some_point"
-    _commits_on_local_not_upstream_key = "commits_on_local_not_upstream"
-    _commits_on_upstream_not_local_key = "commits_on_upstream_not_local"
-
     def __init__(self) -> None:
-        """Initialize the RepoChecker object."""
-        self.use_test_inst_list = os.environ["USE_TEST_INSTRUMENT_LIST"] == "true"
-        self.test_inst_list = os.environ["TEST_INSTRUMENT_LIST"]
-        self.debug_mode = os.environ["DEBUG_MODE"] == "true"
+        """Initialize the RepoChecker object.
 
-    # You can get the versions of insts a variety of ways, inst config, CS:VERSION:SVN:REV pv etc
-    def get_insts_on_latest_ibex_via_inst_config(self) -> list:
-        """Get a list of instruments that are on the latest version of IBEX.
+        Raises:
+            KeyError: If WORKSPACE, or the repository to check, isn't set.
+
+        """
+        self.settings = get_settings()
+        self.settings.require("workspace")
+        self.use_test_inst_list = self.settings.use_test_instrument_list
+        self.test_inst_list = self.settings.test_instrument_list
+        self.debug_mode = self.settings.debug_mode
+        self.max_workers = self.settings.check_workers
+        self.check_engine = self.settings.check_engine
+        self.max_in_flight = self.settings.async_max_in_flight
+        self.host_timeout = self.settings.host_timeout
+        self.run_timeout = self.settings.run_timeout
+        self.instrument_scope = self.settings.instrument_scope
+        self.stream_discovery = self.settings.stream_discovery
+        self.discovered_instruments = []
+        self.ineligible_instruments = []
+        self.extra_hosts = self.settings.extra_hosts
+        self.reachability_prepass = self.settings.reachability_prepass
+        self.reachability = ReachabilityProbe(self.settings.reachability_workers)
+        self.latency_history = LatencyHistory(
+            os.path.join(self.settings.workspace, "ssh_latency.json")
+        )
+        SSHAccessUtils.use_latency_history(self.latency_history)
+        self.schedule = CheckSchedule(
+            os.path.join(self.settings.workspace, "check_schedule.json"),
+            self.settings.schedule_by_history,
+        )
+        self.targets = repo_targets()
+        # keyed by target name
+        self.state_stores: Dict[str | None, CheckStateStore] = {}
+        if self.settings.incremental_check:
+            for target in self.targets:
+                self.state_stores[target.name] = CheckStateStore(
+                    os.path.join(target.artefact_dir, "check_state.json"),
+                    target.config_key(),
+                )
+        self.shard_index = self.settings.shard_index
+        self.shard_count = self.settings.shard_count
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(
+                f"SHARD_INDEX {self.shard_index} must be from 0 to SHARD_COUNT - 1 "
+                f"({self.shard_count - 1})"
+            )
+        instlist_cache_max_age = self.settings.instlist_cache_max_age
+        self.instrument_list_provider = InstrumentListProvider(
+            os.path.join(self.settings.workspace, "instrument_list.json"),
+            INSTLIST_CACHE_MAX_AGE
+            if instlist_cache_max_age is None
+            else instlist_cache_max_age,
+        )
+        self._instrument_list = None
+        # keyed by target name
+        self.run_histories: Dict[str | None, RunHistoryStore] = {}
+        if self.settings.run_history:
+            for target in self.targets:
+                self.run_histories[target.name] = RunHistoryStore(
+                    os.path.join(target.artefact_dir, "run_history.sqlite")
+                )
+        # the parent branch of each EPICS instrument branch, keyed by target name
+        self.parent_stores: Dict[str | None, CheckStateStore] = {
+            target.name: CheckStateStore(
+                os.path.join(target.artefact_dir, "epics_parents.json"),
+                ",".join(self.settings.epics_parent_branches),
+            )
+            for target in self.targets
+            if target.upstream_config == "epics"
+        }
+        # the digests of each git status artefact, keyed by target name
+        self.diff_stores: Dict[str | None, CheckStateStore] = {}
+        if self.settings.remote_check:
+            for target in self.targets:
+                self.diff_stores[target.name] = CheckStateStore(
+                    os.path.join(target.artefact_dir, "remote_check.json"),
+                    target.config_key(),
+                )
+
+    def in_shard(self, hostname: str) -> bool:
+        """Whether an instrument is checked by this shard of the run.
+
+        Args:
+            hostname (str): The hostname of the instrument.
 
         Returns:
-            list: A list of instruments that are on the latest version of IBEX.
+            bool: True if it is, always True when the run isn't sharded.
+
+        """
+        return (
+            self.shard_count == 1
+            or shard_of(hostname, self.shard_count) == self.shard_index
+        )
+
+    @staticmethod
+    def _majors_to_check(latest_major_version: int) -> List[int]:
+        """Get the IBEX major versions to check given the latest one in use.
+
+        Args:
+            latest_major_version (int): The latest major version on any instrument.
+
+        Returns:
+            list: The major versions whose instruments should be checked.
 
         """
-        instrument_list = ChannelAccessUtils().get_inst_list()
-        result_list = []
-        for instrument in instrument_list:
-            if not instrument["seci"]:
-                version_string = requests.get(
-                    "https://control-svcs.isis.cclrc.ac.uk/git/?p=instconfigs/inst.git;a=blob_plain;f=configurations/config_version.txt;hb=refs/heads/"
-                    + instrument["hostName"]
-                ).text
+        second_latest_major_version = latest_major_version - 1
+        return [latest_major_version, second_latest_major_version, 15, 14]
+
+    def get_instrument_list(self) -> InstrumentList:
+        """Get the instrument list, reading CS:INSTLIST the first time it is needed.
+
+        Returns:
+            InstrumentList: The instrument list, live or from the last good copy.
+
+        Raises:
+            InstrumentListUnavailableError: If there is no usable instrument list.
+
+        """
+        if self._instrument_list is None:
+            with timings.measure(None, "instrument discovery", "CS:INSTLIST"):
+                self._instrument_list = self.instrument_list_provider.get()
+        return self._instrument_list
+
+    # You can get the versions of insts a variety of ways, inst config, CS:VERSION:SVN:REV pv etc
+    def iter_insts_on_latest_ibex_via_inst_config(self) -> Iterator[str]:
+        """Yield instruments on the latest versions of IBEX as soon as they qualify.
+
+        Which versions qualify depends on the latest version on any instrument, which
+        isn't known until every version has been looked up. Until then an instrument
+        qualifies early if it is on one of the versions that would be checked given
+        the latest major version seen on the previous run (from the version cache).
+        Once every version is known the remaining instruments are yielded under the
+        real rule, and any instrument that was yielded early but turns out not to
+        qualify is recorded in self.ineligible_instruments so its result can be
+        dropped. self.discovered_instruments is then set to every qualifying
+        instrument in instrument list order.
+
+        Yields:
+            str: The hostname of an instrument on the latest versions of IBEX.
+
+        """
+        # requests and packaging are only needed to look up versions, so they
+        # aren't loaded for runs on a test instrument list
+        from packaging.version import InvalidVersion, Version
+
+        from ..communication_utils.config_version_access import (
+            HTTP_TIMEOUT,
+            ConfigVersionAccessUtils,
+        )
+
+        instrument_list = self.get_instrument_list()
+        names = {
+            hostname: instrument_list.name(hostname)
+            for hostname in instrument_list.hostnames(seci=False)
+        }
+        http_timeout = self.settings.http_timeout
+        version_access = ConfigVersionAccessUtils(
+            os.path.join(self.settings.workspace, "config_version_cache.json"),
+            ttl=self.settings.version_cache_ttl,
+            timeout=HTTP_TIMEOUT if http_timeout is None else http_timeout,
+            workers=self.settings.version_lookup_workers,
+        )
+
+        early_majors = []
+        if self.stream_discovery:
+            previous_versions = []
+            for version_string in version_access.cached_versions().values():
                 try:
-                    version = Version(version_string)
-
-                    if self.debug_mode:
-                        print(
-                            f"DEBUG: Found instrument {instrument['name']} on IBEX version {version}"
-                        )
-                    result_list.append(
-                        {
-                            "hostname": instrument["hostName"],
-                            "version": version,
-                        }
-                    )
-                except InvalidVersion as e:
-                    print(
-                        f"Could not parse {instrument['name']}'s Version({version_string}): {str(e)}"
-                    )
+                    previous_versions.append(Version(version_string))
+                except InvalidVersion:
+                    pass
+            if previous_versions:
+                early_majors = self._majors_to_check(max(previous_versions).major)
+
+        result_list = {}
+        yielded = []
+        discovery_start = time.perf_counter()
+        for hostname, version_string in version_access.iter_versions(list(names)):
+            if version_string is None:
+                continue
+            try:
+                version = Version(version_string)
+            except InvalidVersion as e:
+                print(
+                    f"Could not parse {names[hostname]}'s Version({version_string}): {str(e)}"
+                )
+                continue
+
+            if self.debug_mode:
+                print(
+                    f"DEBUG: Found instrument {names[hostname]} on IBEX version {version}"
+                )
+            result_list[hostname] = version
+            if version.major in early_majors:
+                yielded.append(hostname)
+                yield hostname
+
+        timings.record(
+            None,
+            "instrument discovery",
+            "version lookups",
+            time.perf_counter() - discovery_start,
+        )
+
+        if len(result_list) == 0:
+            print("INFO: No instrument versions found, no instruments to check")
+            self.discovered_instruments = []
+            return
 
         # Get the latest versions of IBEX
-        versions = sorted(set([inst["version"] for inst in result_list]))
+        versions = sorted(set(result_list.values()))
 
         latest_major_version = versions[-1].major
         second_latest_major_version = latest_major_version - 1
@@ -71,14 +274,465 @@ class RepoChecker:
             f"INFO: checking versions {latest_major_version}.x.x and {second_latest_major_version}.x.x"
         )
 
-        # filter out the instruments that are not on the latest version
-        insts_on_latest_ibex = [
-            inst["hostname"]
-            for inst in result_list
-            if (inst["version"].major in [latest_major_version, second_latest_major_version, 15, 14])
+        # filter out the instruments that are not on the latest version, in instrument
+        # list order
+        majors_to_check = self._majors_to_check(latest_major_version)
+        self.discovered_instruments = [
+            hostname
+            for hostname in names
+            if hostname in result_list
+            and result_list[hostname].major in majors_to_check
+        ]
+        for hostname in yielded:
+            if hostname not in self.discovered_instruments:
+                print(
+                    f"INFO: {hostname} was checked early but is not on a checked "
+                    "version of IBEX, leaving it out of the results"
+                )
+                self.ineligible_instruments.append(hostname)
+        for hostname in self.discovered_instruments:
+            if hostname not in yielded:
+                yield hostname
+
+    def get_insts_on_latest_ibex_via_inst_config(self) -> list:
+        """Get a list of instruments that are on the latest version of IBEX.
+
+        Returns:
+            list: A list of instruments that are on the latest version of IBEX.
+
+        """
+        for _ in self.iter_insts_on_latest_ibex_via_inst_config():
+            pass
+        return self.discovered_instruments
+
+    def _forget_ineligible_instruments(self) -> None:
+        """Remove what checking instruments that turned out not to qualify left behind.
+
+        An instrument checked early that isn't on a checked version of IBEX is left
+        out of the results, so its git status artefacts and timings are removed too,
+        keeping it out of the archived artefacts, the latency history and the check
+        schedule.
+
+        Returns:
+            None
+
+        """
+        ineligible = [
+            hostname
+            for hostname in self.ineligible_instruments
+            if hostname not in self.extra_hosts
+        ]
+        for hostname in ineligible:
+            for target in self.targets:
+                JenkinsUtils.remove_git_status(hostname, target.artefact_dir)
+        timings.discard(ineligible)
+
+    def _iter_reachable(
+        self, instruments: Iterable[str], unreachable: List[str]
+    ) -> Iterator[str]:
+        """Probe instruments in parallel, passing on only those that can be reached.
+
+        Args:
+            instruments (iterable): The hostnames of the instruments.
+            unreachable (list): Unreachable hostnames are appended to this.
+
+        Yields:
+            str: The hostname of a reachable instrument.
+
+        """
+        for hostname, reachable in self.reachability.iter_probed(instruments):
+            if reachable:
+                yield hostname
+            else:
+                print(f"INFO: {hostname} is unreachable, skipping its checks")
+                unreachable.append(hostname)
+
+    @staticmethod
+    def _undeterminable_reason(
+        instrument: InstrumentChecker, error: Optional[Exception]
+    ) -> str:
+        """Get why an instrument ended up undeterminable.
+
+        Args:
+            instrument (InstrumentChecker): The checked instrument.
+            error (Exception): The error raised while checking it, if any.
+
+        Returns:
+            str: The reason, e.g. "unreachable" or "auth failure".
+
+        """
+        if instrument.undeterminable_reason is not None:
+            return instrument.undeterminable_reason
+        if isinstance(error, TimeoutError):
+            return "timed out"
+        if error is not None:
+            return CONNECTION_FAILURE
+        return COMMAND_FAILURE
+
+    @staticmethod
+    def _history_entry(result: CheckResult, seconds: Optional[float]) -> Dict:
+        """Get an instrument's result in the form kept in the run history.
+
+        Args:
+            result (CheckResult): The instrument's result.
+            seconds (float): How long its check took.
+
+        Returns:
+            dict: The entry for RunHistoryStore.record_run.
+
+        """
+        return {
+            "host": result.hostname,
+            "upstream_branch": result.upstream_branch or None,
+            "checks": {
+                name: check.name if check is not None else None
+                for name, check in (
+                    (name, getattr(result, name)) for name in CHECK_NAMES
+                )
+            },
+            "reason": result.reason if result.is_undeterminable() else None,
+            "seconds": seconds,
+            "status_digest": result.status_digest,
+            "commits": {
+                LOCAL: result.commits_local_not_on_upstream_messages,
+                UPSTREAM: result.commits_upstream_not_on_local_messages,
+            },
+            # only a full list can say a commit appeared or went since the last run
+            "complete": {
+                direction: check in (CHECK.TRUE, CHECK.FALSE)
+                and total is not None
+                and len(messages or {}) == total
+                for direction, check, messages, total in (
+                    (
+                        LOCAL,
+                        result.commits_local_not_on_upstream,
+                        result.commits_local_not_on_upstream_messages,
+                        result.commits_local_not_on_upstream_total,
+                    ),
+                    (
+                        UPSTREAM,
+                        result.commits_upstream_not_on_local,
+                        result.commits_upstream_not_on_local_messages,
+                        result.commits_upstream_not_on_local_total,
+                    ),
+                )
+            },
+        }
+
+    def _record_history(self, history_entries: List[Dict], target: RepoTarget) -> None:
+        """Add a run to the run history and print what changed since the last one.
+
+        Args:
+            history_entries (list): The history entry of each instrument.
+            target (RepoTarget): The repository the run checked.
+
+        Returns:
+            None
+
+        """
+        run_history = self.run_histories[target.name]
+        try:
+            run_id = run_history.record_run(history_entries, target.config_key())
+            if len(run_history.runs(2)) < 2:
+                print("INFO: First run in the run history, nothing to compare with")
+                return
+            changes = run_history.changes_since_previous_run(run_id)
+        except sqlite3.Error as e:
+            print(f"INFO: Could not update the run history ({str(e)})")
+            return
+        for line in RunHistoryStore.change_lines(changes):
+            print(line)
+
+    def _check_target(
+        self, hostname: str, target: RepoTarget
+    ) -> Tuple[InstrumentChecker, Optional[Exception]]:
+        """Run the checks of one repository on an instrument, logging any error.
+
+        Args:
+            hostname (str): The hostname of the instrument to check.
+            target (RepoTarget): The repository to check.
+
+        Returns:
+            InstrumentChecker: The instrument with its check results populated.
+            Exception: The error raised while checking, or None if the checks ran.
+
+        """
+        instrument = InstrumentChecker(
+            hostname,
+            target,
+            self.parent_stores.get(target.name),
+            self.diff_stores.get(target.name),
+        )
+        try:
+            state_store = self.state_stores.get(target.name)
+            if state_store is not None:
+                instrument.check_instrument_incrementally(state_store)
+            else:
+                instrument.check_instrument()
+            if self.debug_mode:
+                print(instrument.as_string())
+            return instrument, None
+        except Exception as e:
+            print(f"ERROR: Could not connect to {target.label(hostname)} ({str(e)})")
+            return instrument, e
+
+    def _check_one_instrument(
+        self, hostname: str
+    ) -> List[Tuple[InstrumentChecker, Optional[Exception]]]:
+        """Run the checks of every repository on a single instrument.
+
+        The repositories are checked one after another over the instrument's pooled
+        SSH session, which is closed once they are all done.
+
+        Args:
+            hostname (str): The hostname of the instrument to check.
+
+        Returns:
+            list: The (instrument, error) pair of each target, in target order.
+
+        """
+        try:
+            print(f"INFO: Checking {hostname}")
+            with timings.measure(hostname, "check", "total"):
+                return [self._check_target(hostname, target) for target in self.targets]
+        finally:
+            SSHAccessUtils.close_sessions(hostname)
+
+    def _run_checks(
+        self, instruments: Iterable[str], deadline: float = None
+    ) -> Dict[str, List[Tuple[InstrumentChecker, Optional[Exception]]]]:
+        """Check every instrument, in parallel if more than one worker is configured.
+
+        Instruments are checked as soon as instruments yields them, so checks can
+        start while discovery is still going, in the order the check schedule
+        gives. No more are started once the deadline has passed, and the commands
+        of those still running are stopped, so they finish as undeterminable with
+        BUDGET_EXCEEDED rather than holding up the run. Each worker's console
+        output is buffered and printed as one block when that instrument finishes,
+        so the log lines for a host stay together.
+
+        Args:
+            instruments (iterable): The hostnames of the instruments to check.
+            deadline (float): The time.monotonic() the run's budget runs out at.
+
+        Returns:
+            dict: The (instrument, error) pair of each target keyed by hostname.
+
+        """
+        queue = CheckQueue(self.schedule, deadline)
+        results = {}
+        if self.max_workers > 1:
+            print(f"INFO: Checking instruments with {self.max_workers} workers")
+        with buffered_stdout() as console:
+
+            def check_buffered(
+                hostname: str,
+            ) -> List[Tuple[InstrumentChecker, Optional[Exception]]]:
+                if self.max_workers <= 1:
+                    return self._check_one_instrument(hostname)
+                with console.capture() as buffer:
+                    result = self._check_one_instrument(hostname)
+                console.emit(buffer.getvalue())
+                return result
+
+            def work() -> None:
+                hostname = queue.get()
+                while hostname is not None:
+                    results[hostname] = check_buffered(hostname)
+                    hostname = queue.get()
+
+            SSHAccessUtils.use_deadline(deadline)
+            try:
+                with ThreadPoolExecutor(
+                    max_workers=max(1, self.max_workers)
+                ) as executor:
+                    workers = [
+                        executor.submit(work) for _ in range(max(1, self.max_workers))
+                    ]
+                    queue.feed(instruments)
+                    for worker in workers:
+                        worker.result()
+            finally:
+                SSHAccessUtils.use_deadline(None)
+
+        for hostname in queue.over_budget:
+            results[hostname] = self._over_budget(hostname)
+        return results
+
+    def _over_budget(
+        self, hostname: str
+    ) -> List[Tuple[InstrumentChecker, Optional[Exception]]]:
+        """Get the results of an instrument not checked before the budget was spent.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            list: The (instrument, error) pair of each target, all undeterminable.
+
+        """
+        print(
+            f"ERROR: Run budget of {self.run_timeout}s spent before {hostname} "
+            f"was checked"
+        )
+        results = []
+        for target in self.targets:
+            instrument = InstrumentChecker(hostname, target)
+            instrument.set_all_undeterminable(BUDGET_EXCEEDED)
+            results.append((instrument, None))
+        return results
+
+    async def _check_targets_async(
+        self, hostname: str, instruments: List["AsyncInstrumentChecker"]
+    ) -> None:
+        """Check every repository on an instrument over one SSH connection.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            instruments (list): The instrument checker of each target.
+
+        Returns:
+            None
+
+        """
+        import asyncssh
+
+        from ..communication_utils.async_ssh_access import AsyncSSHAccessUtils
+
+        try:
+            connection = await AsyncSSHAccessUtils.connect(
+                hostname,
+                self.settings.ssh_user,
+                self.settings.ssh_password,
+                timeout=self.host_timeout,
+            )
+        except (OSError, asyncssh.Error) as e:
+            print(f"ERROR: Could not connect to {hostname} ({str(e)})")
+            for instrument in instruments:
+                instrument.set_all_undeterminable(AsyncSSHAccessUtils.failure_reason(e))
+            return
+
+        try:
+            for instrument in instruments:
+                await instrument.check_instrument_async(
+                    state_store=self.state_stores.get(instrument.target.name),
+                    connection=connection,
+                )
+                if self.debug_mode:
+                    print(instrument.as_string())
+        finally:
+            connection.close()
+
+    async def _check_one_instrument_async(
+        self, hostname: str
+    ) -> List[Tuple["AsyncInstrumentChecker", Optional[Exception]]]:
+        """Run the checks of every repository on a single instrument with asyncio.
+
+        Args:
+            hostname (str): The hostname of the instrument to check.
+
+        Returns:
+            list: The (instrument, error) pair of each target, in target order.
+
+        """
+        from utils.hotfix_utils.AsyncInstrumentChecker import AsyncInstrumentChecker
+
+        instruments = [
+            AsyncInstrumentChecker(
+                hostname,
+                target,
+                self.parent_stores.get(target.name),
+                self.diff_stores.get(target.name),
+            )
+            for target in self.targets
         ]
+        try:
+            print(f"INFO: Checking {hostname}")
+            with timings.measure(hostname, "check", "total"):
+                await asyncio.wait_for(
+                    self._check_targets_async(hostname, instruments), self.host_timeout
+                )
+            return [(instrument, None) for instrument in instruments]
+        except Exception as e:
+            print(
+                f"ERROR: Could not connect to {hostname} ({str(e) or type(e).__name__})"
+            )
+            return [(instrument, e) for instrument in instruments]
+
+    async def _run_checks_async(
+        self, instruments: Iterable[str], deadline: float = None
+    ) -> Dict[str, List[Tuple[InstrumentChecker, Optional[Exception]]]]:
+        """Check every instrument concurrently with the async engine.
 
-        return insts_on_latest_ibex
+        Up to ASYNC_MAX_IN_FLIGHT instruments are checked at once, starting as soon
+        as instruments yields them, in the order the check schedule gives. Each one
+        is given HOST_TIMEOUT seconds, and any still running when the deadline
+        passes are cancelled and reported as undeterminable.
+
+        Args:
+            instruments (iterable): The hostnames of the instruments to check.
+            deadline (float): The time.monotonic() the run's budget runs out at.
+
+        Returns:
+            dict: The (instrument, error) pair of each target keyed by hostname.
+
+        """
+        print(
+            f"INFO: Checking instruments with the async engine, "
+            f"{self.max_in_flight} at a time"
+        )
+        queue = AsyncCheckQueue(self.schedule, deadline)
+        results = {}
+        with buffered_stdout() as console:
+
+            async def work() -> None:
+                hostname = await queue.get()
+                while hostname is not None:
+                    with console.capture() as buffer:
+                        result = await self._check_one_instrument_async(hostname)
+                    console.emit(buffer.getvalue())
+                    results[hostname] = result
+                    hostname = await queue.get()
+
+            # discovery blocks, so pull hostnames from it off the event loop
+            async def feed() -> None:
+                iterator = iter(instruments)
+                try:
+                    hostname = await asyncio.to_thread(next, iterator, None)
+                    while hostname is not None:
+                        await queue.put(hostname)
+                        hostname = await asyncio.to_thread(next, iterator, None)
+                finally:
+                    await queue.close()
+
+            feeder = asyncio.create_task(feed())
+            workers = [
+                asyncio.create_task(work()) for _ in range(max(1, self.max_in_flight))
+            ]
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            _, pending = await asyncio.wait(workers, timeout=timeout)
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            # hosts found after the deadline are still reported, as over budget
+            await feeder
+            for worker in workers:
+                if not worker.cancelled() and worker.exception() is not None:
+                    raise worker.exception()
+
+        for hostname in queue.started + queue.over_budget:
+            if hostname not in results:
+                results[hostname] = self._over_budget(hostname)
+        return results
+
+    def get_all_insts(self) -> list:
+        """Get every instrument in the instrument list, whatever it is running.
+
+        Returns:
+            list: The hostnames of all the instruments.
+
+        """
+        return self.get_instrument_list().hostnames()
 
     def check_instruments(self) -> None:
         """Run checks on all instruments to find hotfix/changes and log the results.
@@ -87,89 +741,211 @@ class RepoChecker:
             None
 
         """
+        # the budget covers discovery as well as the checks
+        deadline = (
+            None if self.run_timeout is None else time.monotonic() + self.run_timeout
+        )
+        if not self.use_test_inst_list:
+            try:
+                source_list = self.get_instrument_list()
+            except InstrumentListUnavailableError as e:
+                print(f"ERROR: Could not get the instrument list: {str(e)}")
+                sys.exit(1)
+            print(
+                f"INFO: Instrument list has {len(source_list.instruments)} "
+                f"instruments (source: {source_list.source})"
+            )
+
         if self.use_test_inst_list:
-            instrument_list = self.test_inst_list.split(",")
-            instrument_list = [instrument.strip() for instrument in instrument_list]
-            if "" in instrument_list:
-                instrument_list.remove("")
+            instrument_list = list(self.test_inst_list)
+            instruments = instrument_list
+        elif self.instrument_scope == "all":
+            print("INFO: Getting list of all instruments")
+            instrument_list = self.get_all_insts()
+            instrument_list += [
+                host for host in self.extra_hosts if host not in instrument_list
+            ]
+            instruments = instrument_list
         else:
             print("INFO: Getting list of instruments on the 2 latest versions of IBEX")
-            instrument_list = self.get_insts_on_latest_ibex_via_inst_config()
+            # checks start while versions are still being looked up, the final list
+            # is only known once discovery has finished
+            instrument_list = None
+            instruments = itertools.chain(
+                self.iter_insts_on_latest_ibex_via_inst_config(), self.extra_hosts
+            )
 
-        instrument_status_lists = {
-            self._uncommitted_changes_key: [],
-            self._undeterminable_at_some_point_key: [],
-            self._commits_on_local_not_upstream_key: [],
-            self._commits_on_upstream_not_local_key: [],
-        }
+        if self.shard_count > 1:
+            print(f"INFO: Checking shard {self.shard_index} of {self.shard_count}")
+            instruments = (host for host in instruments if self.in_shard(host))
 
-        def update_instrument_status_lists(instrument, status_list_key, messages=None):
-            if messages:
-                instrument_status_lists[status_list_key].append({instrument.hostname: messages})
+        # only the blobs this run stores first are archived with the build
+        for target in self.targets:
+            git_status_store = JenkinsUtils.git_status_store(target.artefact_dir)
+            if git_status_store is not None:
+                git_status_store.start_run()
+
+        unreachable = []
+        if self.reachability_prepass:
+            instruments = self._iter_reachable(instruments, unreachable)
+
+        try:
+            if self.check_engine == "async":
+                results = asyncio.run(self._run_checks_async(instruments, deadline))
             else:
-                instrument_status_lists[status_list_key].append(instrument.hostname)
+                results = self._run_checks(instruments, deadline)
+        finally:
+            SSHAccessUtils.close_sessions()
+            for state_store in self.state_stores.values():
+                state_store.save()
+            for parent_store in self.parent_stores.values():
+                parent_store.save()
+            for diff_store in self.diff_stores.values():
+                diff_store.save()
+            # before pruning, so the blobs only they used are removed
+            self._forget_ineligible_instruments()
+            for target in self.targets:
+                git_status_store = JenkinsUtils.git_status_store(target.artefact_dir)
+                if git_status_store is not None and os.path.isdir(
+                    git_status_store.blobs_dir
+                ):
+                    pruned = git_status_store.prune()
+                    if pruned:
+                        print(f"INFO: Removed {pruned} unused git status blobs")
 
-        for hostname in instrument_list:
-            instrument = InstrumentChecker(hostname)
-            try:
-                print(f"INFO: Checking {instrument.hostname}")
-                instrument.check_instrument()
-                if os.environ["DEBUG_MODE"] == "true":
-                    print(instrument.as_string())
+        for hostname in unreachable:
+            results[hostname] = []
+            for target in self.targets:
+                instrument = InstrumentChecker(hostname, target)
+                instrument.set_all_undeterminable(UNREACHABLE)
+                results[hostname].append((instrument, None))
 
-                if instrument.commits_local_not_on_upstream_enum == CHECK.TRUE:
-                    update_instrument_status_lists(
-                        instrument,
-                        self._commits_on_local_not_upstream_key,
-                        instrument.commits_local_not_on_upstream_messages,
-                    )
+        if instrument_list is None:
+            discovered = self.discovered_instruments
+            instrument_list = discovered + [
+                host for host in self.extra_hosts if host not in discovered
+            ]
 
-                if instrument.uncommitted_changes_enum == CHECK.TRUE:
-                    update_instrument_status_lists(
-                        instrument,
-                        self._uncommitted_changes_key,
-                        instrument.uncommitted_changes_messages,
+        summaries = [ResultSummary() for _ in self.targets]
+        failed = set()
+        order = [hostname for hostname in instrument_list if self.in_shard(hostname)]
+        for hostname in order:
+            for summary, (instrument, error) in zip(summaries, results[hostname]):
+                if error is not None:
+                    instrument.set_all_undeterminable(
+                        self._undeterminable_reason(instrument, error)
                     )
-
-                if instrument.commits_upstream_not_on_local_enum == CHECK.TRUE:
-                    update_instrument_status_lists(
-                        instrument,
-                        self._commits_on_upstream_not_local_key,
-                        instrument.commits_upstream_not_on_local_messages,
+                elif instrument.result.is_undeterminable():
+                    instrument.undeterminable_reason = self._undeterminable_reason(
+                        instrument, None
                     )
-
+                summary.add(instrument.result)
                 if (
-                    instrument.commits_local_not_on_upstream_enum == CHECK.UNDETERMINABLE
-                    or instrument.uncommitted_changes_enum == CHECK.UNDETERMINABLE
-                    or instrument.commits_upstream_not_on_local_enum == CHECK.UNDETERMINABLE
+                    instrument.result.is_undeterminable()
+                    and instrument.undeterminable_reason != BUDGET_EXCEEDED
                 ):
-                    update_instrument_status_lists(
-                        instrument, self._undeterminable_at_some_point_key
-                    )
+                    failed.add(hostname)
 
-            except Exception as e:
-                print(f"ERROR: Could not connect to {instrument.hostname} ({str(e)})")
-                update_instrument_status_lists(instrument, self._undeterminable_at_some_point_key)
+        seconds = {
+            hostname: host_summary["total"]
+            for hostname, host_summary in timings.host_summaries().items()
+            if hostname in results
+        }
+        if self.shard_count > 1:
+            for target, summary in zip(self.targets, summaries):
+                path = shard_results_path(
+                    target.artefact_dir, self.shard_index, self.shard_count
+                )
+                save_shard_results(
+                    path,
+                    summary,
+                    self.shard_index,
+                    self.shard_count,
+                    instrument_list,
+                    seconds,
+                )
+                print(
+                    f"INFO: Checked {len(order)} instruments in shard "
+                    f"{self.shard_index} of {self.shard_count}, results saved to "
+                    f"{path} for merging"
+                )
+            exit_code = 0
+        else:
+            exit_code = self.report_all_results(summaries, order, seconds)
 
-        keys_and_prefixes = [
-            (self._uncommitted_changes_key, "Uncommitted changes"),
-            (self._commits_on_local_not_upstream_key, "Commits on local not upstream"),
-            (self._commits_on_upstream_not_local_key, "Commits on upstream not on local"),
-            (self._undeterminable_at_some_point_key, "Undeterminable at some point"),
-        ]
+        for line in timings.summary_lines():
+            print(line)
+        timings.save(self.settings.workspace)
+        self.latency_history.update(timings.records())
+        self.latency_history.save()
+        self.schedule.update(seconds, failed)
+        self.schedule.save()
 
-        print("INFO: Summary of results")
-        for key, prefix in keys_and_prefixes:
-            status_list = instrument_status_lists[key]
-            if len(status_list) > 0:
-                print(f"ERROR: {prefix}: {status_list}".replace("'", '"'))
-            else:
-                print(f"{prefix}: {status_list}".replace("'", '"'))
+        # If no instruments have uncommitted changes, local branch matches upstream
+        # branch, and no undeterminable results then exit with ok status
+        sys.exit(exit_code)
 
-        for key in instrument_status_lists:
-            if len(instrument_status_lists[key]) > 0:
-                sys.exit(1)
+    def report_results(
+        self,
+        summary: ResultSummary,
+        order: List[str],
+        seconds: Dict[str, float],
+        target: RepoTarget = None,
+    ) -> int:
+        """Print and save the summary of a repository, and add it to its run history.
+
+        Args:
+            summary (ResultSummary): The results of every instrument in the run.
+            order (list): The hostnames of the instruments, in instrument list order.
+            seconds (dict): How long each instrument's check took, keyed by hostname.
+            target (RepoTarget): The repository the results are for, by default the
+                first target of the run.
 
-        # If no instruments have uncommitted changes, local branch matches upstream branch, and no undeterminable results then
-        # exit with ok status
-        sys.exit(0)
+        Returns:
+            int: The exit code for the repository, 1 if anything needs attention.
+
+        """
+        target = self.targets[0] if target is None else target
+        if target.name is None:
+            print("INFO: Summary of results")
+        else:
+            print(f"INFO: Summary of results for {target.name} ({target.repo_dir})")
+        for line in summary.summary_lines(order):
+            print(line)
+        summary.save(os.path.join(target.artefact_dir, "results.json"), order)
+
+        if target.name in self.run_histories:
+            self._record_history(
+                [
+                    self._history_entry(result, seconds.get(result.hostname))
+                    for result in summary.results(order)
+                ],
+                target,
+            )
+        return 1 if summary.has_findings(order) else 0
+
+    def report_all_results(
+        self,
+        summaries: List[ResultSummary],
+        order: List[str],
+        seconds: Dict[str, float],
+    ) -> int:
+        """Report the results of every repository in the run.
+
+        Args:
+            summaries (list): The results of each target, in target order.
+            order (list): The hostnames of the instruments, in instrument list order.
+            seconds (dict): How long each instrument's check took, keyed by hostname.
+
+        Returns:
+            int: The exit code of the run, 1 if anything in any repository needs
+                attention.
+
+        """
+        exit_codes = {
+            target.name: self.report_results(summary, order, seconds, target)
+            for target, summary in zip(self.targets, summaries)
+        }
+        if len(self.targets) > 1:
+            print(f"INFO: Exit code of each repository: {json.dumps(exit_codes)}")
+        return max(exit_codes.values())
@@ -0,0 +1,221 @@
+"""A module for running several git commands on an instrument in one SSH round trip."""
+
+import codecs
+from typing import BinaryIO, Dict, List, Tuple
+
+SECTION_BEGIN = "#HSC-BEGIN"
+SECTION_END = "#HSC-END"
+
+
+class GitProbeBatch:
+    """Builds a single composite cmd.exe command out of several named commands.
+
+    Each command's stdout is wrapped in begin/end marker lines, with the end marker
+    carrying whether the command succeeded, so one SSH exec can stand in for several
+    and parse() can split the output back into per-command results. Results have
+    the same shape as SSHAccessUtils.run_ssh_command results.
+
+    Success is judged on exit code rather than on stderr being empty. stderr is
+    dropped unless a command asks for it to be merged into its output, so warnings
+    from e.g. git diff don't end up in the porcelain status.
+    """
+
+    def __init__(self, repo_dir: str) -> None:
+        """Initialize the GitProbeBatch object.
+
+        Args:
+            repo_dir (str): The directory on the instrument to run the commands in.
+
+        """
+        self._repo_dir = repo_dir
+        self._steps: List[str] = []
+        self._names: List[str] = []
+
+    @property
+    def names(self) -> List[str]:
+        """Get the names of the sections in the batch, in the order they run.
+
+        Returns:
+            list: The section names.
+
+        """
+        return list(self._names)
+
+    def add(self, name: str, command: str, merge_stderr: bool = False) -> None:
+        """Add a command whose output will be reported as its own section.
+
+        Args:
+            name (str): The name of the section, must not contain spaces.
+            command (str): The command to run, must not contain double quotes. Any
+                % in it is passed through literally.
+            merge_stderr (bool): Whether to keep stderr in the section output.
+
+        Returns:
+            None
+
+        """
+        redirect = "2>&1" if merge_stderr else "2>nul"
+        # escape % so e.g. the %h%x20%s of a git log format can't be expanded as
+        # a variable, by either the shell sshd starts or the cmd /c it runs
+        command = command.replace("%", "^%")
+        self._steps.append(
+            f"(echo {SECTION_BEGIN} {name}) & "
+            f"(({command}) {redirect} && (echo {SECTION_END} {name} 0) "
+            f"|| (echo {SECTION_END} {name} 1))"
+        )
+        self._names.append(name)
+
+    def command(self) -> str:
+        """Get the composite command to run over SSH.
+
+        Returns:
+            str: The command.
+
+        """
+        steps = " & ".join(self._steps)
+        return f'cmd /s /c "cd /d {self._repo_dir} && ({steps})" 2>&1'
+
+    def stream_parser(self, sinks: Dict[str, BinaryIO] = None) -> "ProbeOutputParser":
+        """Get a parser to write the output of the composite command to as it arrives.
+
+        Args:
+            sinks (dict): Binary files keyed by section name. The output of those
+                sections is written to them rather than kept in memory.
+
+        Returns:
+            ProbeOutputParser: The parser.
+
+        """
+        return ProbeOutputParser(self._names, sinks)
+
+    def parse(
+        self, ssh_process: Dict[str, bool | str]
+    ) -> Dict[str, Dict[str, bool | str]]:
+        """Split the output of the composite command back into per-section results.
+
+        A section that has no end marker (e.g. the connection dropped part way
+        through) or that never started is reported as failed.
+
+        Args:
+            ssh_process (dict): The result of running command() over SSH.
+
+        Returns:
+            dict: The result of each section keyed by name.
+
+        """
+        parser = self.stream_parser()
+        if ssh_process["success"]:
+            parser.feed(ssh_process["output"])
+        return parser.results(ssh_process)
+
+
+class ProbeOutputParser:
+    """Splits the output of a GitProbeBatch into sections as it arrives.
+
+    Output is handled a line at a time, so sections written to a sink (e.g. a large
+    git diff going straight to disk) never have to be held in memory.
+    """
+
+    def __init__(self, names: List[str], sinks: Dict[str, BinaryIO] = None) -> None:
+        """Initialize the ProbeOutputParser object.
+
+        Args:
+            names (list): The names of the sections in the batch.
+            sinks (dict): Binary files to write the output of sections to, keyed
+                by section name.
+
+        """
+        self._names = names
+        self._sinks = sinks or {}
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._partial_line = ""
+        self._current_name = None
+        self._current_lines: List[str] = []
+        self._sections: Dict[str, Dict[str, bool | str]] = {}
+
+    def write(self, data: bytes) -> int:
+        """Parse a chunk of the raw output.
+
+        Args:
+            data (bytes): The chunk.
+
+        Returns:
+            int: The number of bytes handled.
+
+        """
+        self.feed(self._decoder.decode(data))
+        return len(data)
+
+    def feed(self, text: str) -> None:
+        """Parse a chunk of the decoded output.
+
+        Args:
+            text (str): The chunk.
+
+        Returns:
+            None
+
+        """
+        lines = (self._partial_line + text).split("\n")
+        self._partial_line = lines.pop()
+        for line in lines:
+            self._parse_line(line.rstrip("\r"))
+
+    def _parse_line(self, line: str) -> None:
+        marker, name, return_code = _split_marker(line)
+        if marker == SECTION_BEGIN:
+            self._current_name, self._current_lines = name, []
+        elif marker == SECTION_END and name == self._current_name:
+            output = "\n".join(self._current_lines)
+            if self._current_lines:
+                output += "\n"
+            self._sections[name] = {"success": return_code == "0", "output": output}
+            self._current_name = None
+        elif self._current_name in self._sinks:
+            self._sinks[self._current_name].write((line + "\n").encode("utf-8"))
+        elif self._current_name is not None:
+            self._current_lines.append(line)
+
+    def results(
+        self, ssh_process: Dict[str, bool | str]
+    ) -> Dict[str, Dict[str, bool | str]]:
+        """Get the result of each section once the command has finished.
+
+        A section that has no end marker (e.g. the connection dropped part way
+        through) or that never started is reported as failed.
+
+        Args:
+            ssh_process (dict): The result of running the command over SSH.
+
+        Returns:
+            dict: The result of each section keyed by name.
+
+        """
+        remaining = self._partial_line + self._decoder.decode(b"", final=True)
+        self._partial_line = ""
+        if remaining:
+            self._parse_line(remaining.rstrip("\r"))
+        results = dict(self._sections) if ssh_process["success"] else {}
+        for name in self._names:
+            if name not in results:
+                if ssh_process["success"]:
+                    results[name] = {
+                        "success": False,
+                        "output": "missing from batched output",
+                    }
+                else:
+                    results[name] = {
+                        "success": False,
+                        "output": ssh_process["output"],
+                        "reason": ssh_process.get("reason"),
+                    }
+        return results
+
+
+def _split_marker(line: str) -> Tuple[str | None, str | None, str | None]:
+    parts = line.strip().split(" ")
+    if parts[0] == SECTION_BEGIN and len(parts) == 2:
+        return parts[0], parts[1], None
+    if parts[0] == SECTION_END and len(parts) == 3:
+        return parts[0], parts[1], parts[2]
+    return None, None, None
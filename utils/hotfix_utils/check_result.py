@@ -0,0 +1,367 @@
+"""A module for the results of checking instruments and summarising them."""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List
+
+from .check import CHECK
+
+# The checks run on each instrument, each is a CHECK plus messages in a CheckResult
+CHECK_NAMES = (
+    "commits_upstream_not_on_local",
+    "commits_local_not_on_upstream",
+    "uncommitted_changes",
+)
+
+
+class CheckResult:
+    """The result of checking one instrument's repo.
+
+    Each check is a CHECK (None until it has run) with its messages: a dict of commit
+    hashes to subjects for the commit checks, a list of changed files for the
+    uncommitted changes check. The messages are capped, and each check's total is
+    how many commits or files it found in all.
+    """
+
+    __slots__ = (
+        "hostname",
+        "commits_upstream_not_on_local",
+        "commits_upstream_not_on_local_messages",
+        "commits_local_not_on_upstream",
+        "commits_local_not_on_upstream_messages",
+        "uncommitted_changes",
+        "uncommitted_changes_messages",
+        "commits_upstream_not_on_local_total",
+        "commits_local_not_on_upstream_total",
+        "uncommitted_changes_total",
+        "upstream_branch",
+        "reason",
+        "status_digest",
+    )
+
+    def __init__(self, hostname: str) -> None:
+        """Initialize the CheckResult object.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        """
+        self.hostname: str = hostname
+        self.commits_upstream_not_on_local: CHECK | None = None
+        self.commits_upstream_not_on_local_messages: Dict[str, str] | None = None
+        self.commits_local_not_on_upstream: CHECK | None = None
+        self.commits_local_not_on_upstream_messages: Dict[str, str] | None = None
+        self.uncommitted_changes: CHECK | None = None
+        self.uncommitted_changes_messages: List[str] | None = None
+        self.commits_upstream_not_on_local_total: int | None = None
+        self.commits_local_not_on_upstream_total: int | None = None
+        self.uncommitted_changes_total: int | None = None
+        # the upstream branch the instrument was compared to
+        self.upstream_branch: str | None = None
+        # why a check was undeterminable, e.g. "unreachable"
+        self.reason: str | None = None
+        # a digest of git status, to tell whether uncommitted changes have changed
+        self.status_digest: str | None = None
+
+    def is_determinable(self) -> bool:
+        """Whether every check gave a result.
+
+        Returns:
+            bool: False if any check is undeterminable or has not been run.
+
+        """
+        return all(
+            getattr(self, name) in (CHECK.TRUE, CHECK.FALSE) for name in CHECK_NAMES
+        )
+
+    def is_undeterminable(self) -> bool:
+        """Whether any check was undeterminable.
+
+        Returns:
+            bool: True if any check ran but couldn't give a result.
+
+        """
+        return any(getattr(self, name) == CHECK.UNDETERMINABLE for name in CHECK_NAMES)
+
+    def to_dict(self) -> Dict:
+        """Get the result in a form that can be saved as JSON.
+
+        Returns:
+            dict: Every field, with checks as CHECK names.
+
+        """
+        result = {name: getattr(self, name) for name in self.__slots__}
+        for name in CHECK_NAMES:
+            if result[name] is not None:
+                result[name] = result[name].name
+        return result
+
+    @classmethod
+    def from_dict(cls, saved: Dict) -> "CheckResult":
+        """Make a result from one saved with to_dict.
+
+        Args:
+            saved (dict): The saved result.
+
+        Returns:
+            CheckResult: The result.
+
+        """
+        result = cls(saved["hostname"])
+        for name in cls.__slots__[1:]:
+            setattr(result, name, saved.get(name))
+        for name in CHECK_NAMES:
+            if saved.get(name) is not None:
+                setattr(result, name, CHECK[saved[name]])
+        return result
+
+
+class ResultSummary:
+    """The results of a run grouped into the lists reported at the end of it.
+
+    Results can be added in any order, from any thread, and summaries from other
+    runs or shards merged in. The lists are built in instrument list order when they
+    are asked for, and are JSON encoded when printed or saved.
+    """
+
+    __slots__ = ("_lock", "_results")
+
+    # (key, heading) of each list, in the order they are reported
+    LISTS = (
+        ("uncommitted_changes", "Uncommitted changes"),
+        ("commits_on_local_not_upstream", "Commits on local not upstream"),
+        ("commits_on_upstream_not_local", "Commits on upstream not on local"),
+        ("undeterminable_at_some_point", "Undeterminable at some point"),
+    )
+
+    def __init__(self, results: Iterable[CheckResult] = ()) -> None:
+        """Initialize the ResultSummary object.
+
+        Args:
+            results (iterable): Results to start with.
+
+        """
+        self._lock = threading.Lock()
+        self._results: Dict[str, CheckResult] = {}
+        for result in results:
+            self.add(result)
+
+    def add(self, result: CheckResult) -> None:
+        """Add the result of an instrument, replacing any earlier one for it.
+
+        Args:
+            result (CheckResult): The result.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._results[result.hostname] = result
+
+    def merge(self, other: "ResultSummary") -> None:
+        """Add every result from another summary.
+
+        Args:
+            other (ResultSummary): The summary to merge in.
+
+        Returns:
+            None
+
+        """
+        for result in other.results():
+            self.add(result)
+
+    def results(self, order: Iterable[str] = None) -> List[CheckResult]:
+        """Get the results.
+
+        Args:
+            order (iterable): The hostnames to get the results of, in order. By
+                default every result, in the order they were added.
+
+        Returns:
+            list: The results.
+
+        """
+        with self._lock:
+            if order is None:
+                return list(self._results.values())
+            return [self._results[host] for host in order if host in self._results]
+
+    @staticmethod
+    def _entry(hostname: str, messages: object) -> str | Dict:
+        """Get an entry of a summary list.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            messages (object): Details to list with it, if any.
+
+        Returns:
+            str | dict: {hostname: messages}, or just the hostname if no messages.
+
+        """
+        return {hostname: messages} if messages else hostname
+
+    @staticmethod
+    def _commits_entry(
+        hostname: str, messages: object, total: int | None
+    ) -> str | Dict:
+        """Get an entry of a commits summary list.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            messages (object): The listed commits, if any.
+            total (int): How many commits there are.
+
+        Returns:
+            str | dict: {hostname: messages}, or {hostname: "N commits"} if the
+                commits were counted but not listed.
+
+        """
+        if not messages and total:
+            messages = f"{total} commit{'' if total == 1 else 's'}"
+        return ResultSummary._entry(hostname, messages)
+
+    def lists(self, order: Iterable[str] = None) -> Dict[str, List]:
+        """Get the summary lists.
+
+        Args:
+            order (iterable): The hostnames to include, in order. By default every
+                result, in the order they were added.
+
+        Returns:
+            dict: Each list keyed as in LISTS.
+
+        """
+        lists = {key: [] for key, _ in self.LISTS}
+        for result in self.results(order):
+            host = result.hostname
+            if result.commits_local_not_on_upstream == CHECK.TRUE:
+                lists["commits_on_local_not_upstream"].append(
+                    self._commits_entry(
+                        host,
+                        result.commits_local_not_on_upstream_messages,
+                        result.commits_local_not_on_upstream_total,
+                    )
+                )
+            if result.uncommitted_changes == CHECK.TRUE:
+                lists["uncommitted_changes"].append(
+                    self._entry(host, result.uncommitted_changes_messages)
+                )
+            if result.commits_upstream_not_on_local == CHECK.TRUE:
+                lists["commits_on_upstream_not_local"].append(
+                    self._commits_entry(
+                        host,
+                        result.commits_upstream_not_on_local_messages,
+                        result.commits_upstream_not_on_local_total,
+                    )
+                )
+            if result.is_undeterminable():
+                lists["undeterminable_at_some_point"].append(
+                    self._entry(host, result.reason)
+                )
+        return lists
+
+    def has_findings(self, order: Iterable[str] = None) -> bool:
+        """Whether anything needs attention, i.e. any summary list isn't empty.
+
+        Args:
+            order (iterable): The hostnames to include.
+
+        Returns:
+            bool: True if the run should fail.
+
+        """
+        return any(self.lists(order).values())
+
+    def truncation_lines(self, order: Iterable[str] = None) -> List[str]:
+        """Get console lines noting checks that found more than they list.
+
+        Args:
+            order (iterable): The hostnames to include, in order.
+
+        Returns:
+            list: A line for each check whose messages were capped.
+
+        """
+        lines = []
+        for result in self.results(order):
+            for name, found in (
+                ("commits_upstream_not_on_local", "commits on upstream not on local"),
+                ("commits_local_not_on_upstream", "commits on local not upstream"),
+                ("uncommitted_changes", "uncommitted changes"),
+            ):
+                messages = getattr(result, f"{name}_messages")
+                total = getattr(result, f"{name}_total")
+                if messages and total is not None and total > len(messages):
+                    lines.append(
+                        f"INFO: {result.hostname} has {total} {found}, "
+                        f"only the first {len(messages)} are listed"
+                    )
+        return lines
+
+    def summary_lines(self, order: Iterable[str] = None) -> List[str]:
+        """Get the console lines reporting the summary lists.
+
+        Non-empty lists are prefixed with ERROR: so the Jenkins log parser flags them,
+        and followed by any notes from truncation_lines().
+
+        Args:
+            order (iterable): The hostnames to include, in order.
+
+        Returns:
+            list: The lines.
+
+        """
+        lists = self.lists(order)
+        lines = []
+        for key, heading in self.LISTS:
+            line = f"{heading}: {json.dumps(lists[key])}"
+            lines.append(f"ERROR: {line}" if lists[key] else line)
+        return lines + self.truncation_lines(order)
+
+    def to_dict(self, order: Iterable[str] = None) -> Dict:
+        """Get the summary in a form that can be saved as JSON.
+
+        Args:
+            order (iterable): The hostnames to include, in order.
+
+        Returns:
+            dict: The summary lists and every result.
+
+        """
+        return {
+            "summary": self.lists(order),
+            "results": [result.to_dict() for result in self.results(order)],
+        }
+
+    @classmethod
+    def from_dict(cls, saved: Dict) -> "ResultSummary":
+        """Make a summary from one saved with to_dict.
+
+        Args:
+            saved (dict): The saved summary.
+
+        Returns:
+            ResultSummary: The summary.
+
+        """
+        return cls(CheckResult.from_dict(result) for result in saved["results"])
+
+    def save(self, path: str, order: Iterable[str] = None) -> None:
+        """Save the summary as JSON.
+
+        Args:
+            path (str): The file to save it to.
+            order (iterable): The hostnames to include, in order.
+
+        Returns:
+            None
+
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(order), file, indent=1)
@@ -0,0 +1,305 @@
+"""Module decides the order instruments are checked in, from how previous runs went."""
+
+import asyncio
+import heapq
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+# Weight given to the latest run when updating a host's usual check duration
+SMOOTHING = 0.3
+
+
+class CheckSchedule:
+    """How long each host's check usually takes and whether it has been failing.
+
+    Hosts are checked longest first, so the slowest ones start while there are
+    still plenty of short ones to fill the other workers, rather than one starting
+    last and deciding when the run ends. Hosts with no history are treated as the
+    slowest, as nothing is known about them. Hosts whose last check failed go after
+    all the others, so a host that is down and waiting out its timeouts holds up
+    no one, and is the one left unchecked if the run's budget is spent. With no
+    history at all, hosts are checked in the order they are found.
+    """
+
+    def __init__(self, path: str = None, use_history: bool = True) -> None:
+        """Initialize the CheckSchedule object.
+
+        Args:
+            path (str): The JSON file to keep the history in, or None to keep none.
+            use_history (bool): Whether to order hosts by their history, or check
+                them in the order they are found.
+
+        """
+        self._path = path
+        self._use_history = use_history
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict] = {}
+        if path is not None:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    self._hosts = json.load(file)
+            except (OSError, ValueError):
+                self._hosts = {}
+        known = [host["seconds"] for host in self._hosts.values() if "seconds" in host]
+        self._unknown_seconds = max(known, default=0.0)
+
+    def known_seconds(self, hostname: str) -> float | None:
+        """Get how long a host's check usually takes.
+
+        Args:
+            hostname (str): The hostname.
+
+        Returns:
+            float: The seconds, None if the host has no history.
+
+        """
+        with self._lock:
+            return self._hosts.get(hostname, {}).get("seconds")
+
+    def priority(self, hostname: str) -> Tuple[int, float]:
+        """Get the priority of a host, lower is checked sooner.
+
+        Args:
+            hostname (str): The hostname.
+
+        Returns:
+            tuple: Whether its last check failed and its negated usual duration.
+
+        """
+        if not self._use_history:
+            return 0, 0.0
+        with self._lock:
+            host = self._hosts.get(hostname, {})
+        failing = 1 if host.get("failures", 0) > 0 else 0
+        return failing, -host.get("seconds", self._unknown_seconds)
+
+    def update(self, seconds: Dict[str, float], failed: Iterable[str]) -> None:
+        """Fold a run's check durations and failures into the history.
+
+        Args:
+            seconds (dict): How long each checked host took, keyed by hostname.
+            failed (iterable): The hostnames of hosts whose checks failed.
+
+        Returns:
+            None
+
+        """
+        failed = set(failed)
+        with self._lock:
+            for hostname, duration in seconds.items():
+                host = self._hosts.setdefault(hostname, {"seconds": duration})
+                previous = host.get("seconds", duration)
+                host["seconds"] = round(
+                    SMOOTHING * duration + (1 - SMOOTHING) * previous, 6
+                )
+            for hostname in set(seconds) | failed:
+                host = self._hosts.setdefault(hostname, {})
+                if hostname in failed:
+                    host["failures"] = host.get("failures", 0) + 1
+                else:
+                    host["failures"] = 0
+
+    def save(self) -> None:
+        """Write the history to disk, if it has a path.
+
+        Returns:
+            None
+
+        """
+        if self._path is None:
+            return
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary_path = self._path + ".tmp"
+        with self._lock, open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self._hosts, file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self._path)
+
+
+class _ScheduledHosts:
+    """The hosts waiting to be checked, highest priority first.
+
+    Hosts can be added while others are being checked, e.g. as discovery finds
+    them. Once the deadline has passed no more are handed out, and a host isn't
+    handed out if its usual duration won't fit in what is left of the budget, they
+    are kept in over_budget instead.
+    """
+
+    def __init__(self, schedule: CheckSchedule, deadline: float = None) -> None:
+        """Initialize the _ScheduledHosts object.
+
+        Args:
+            schedule (CheckSchedule): The history to order hosts by.
+            deadline (float): The time.monotonic() the budget runs out at, if any.
+
+        """
+        self.schedule = schedule
+        self.deadline = deadline
+        self.started: List[str] = []
+        self.over_budget: List[str] = []
+        self._heap: List[Tuple] = []
+        self._seen = set()
+        self._closed = False
+
+    def _remaining(self) -> float | None:
+        """Get the seconds left of the budget.
+
+        Returns:
+            float: The seconds, None if there is no budget.
+
+        """
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def _push(self, hostname: str) -> None:
+        """Add a host, unless it has been added already.
+
+        Args:
+            hostname (str): The hostname.
+
+        Returns:
+            None
+
+        """
+        if hostname in self._seen:
+            return
+        self._seen.add(hostname)
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            self.over_budget.append(hostname)
+            return
+        priority = self.schedule.priority(hostname)
+        heapq.heappush(self._heap, (*priority, len(self._seen), hostname))
+
+    def _pop(self) -> Tuple[str | None, bool]:
+        """Take the next host to check.
+
+        Returns:
+            str: The hostname, None if there isn't one to check now.
+            bool: True if there never will be, as the hosts have all been added and
+                handed out or the budget is spent.
+
+        """
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            while self._heap:
+                self.over_budget.append(heapq.heappop(self._heap)[-1])
+            return None, True
+        while self._heap:
+            hostname = heapq.heappop(self._heap)[-1]
+            expected = self.schedule.known_seconds(hostname)
+            if remaining is not None and expected is not None and expected > remaining:
+                self.over_budget.append(hostname)
+                continue
+            self.started.append(hostname)
+            return hostname, False
+        return None, self._closed
+
+
+class CheckQueue(_ScheduledHosts):
+    """The hosts waiting to be checked, shared by worker threads."""
+
+    def __init__(self, schedule: CheckSchedule, deadline: float = None) -> None:
+        """Initialize the CheckQueue object.
+
+        Args:
+            schedule (CheckSchedule): The history to order hosts by.
+            deadline (float): The time.monotonic() the budget runs out at, if any.
+
+        """
+        super().__init__(schedule, deadline)
+        self._condition = threading.Condition()
+
+    def feed(self, instruments: Iterable[str]) -> None:
+        """Add every host instruments yields, then close the queue.
+
+        Args:
+            instruments (iterable): The hostnames.
+
+        Returns:
+            None
+
+        """
+        try:
+            for hostname in instruments:
+                with self._condition:
+                    self._push(hostname)
+                    self._condition.notify()
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+
+    def get(self) -> str | None:
+        """Wait for the next host to check.
+
+        Returns:
+            str: The hostname, None once there are no more to check.
+
+        """
+        with self._condition:
+            while True:
+                hostname, finished = self._pop()
+                if hostname is not None or finished:
+                    return hostname
+                self._condition.wait(self._remaining())
+
+
+class AsyncCheckQueue(_ScheduledHosts):
+    """The hosts waiting to be checked, shared by worker tasks on an event loop."""
+
+    def __init__(self, schedule: CheckSchedule, deadline: float = None) -> None:
+        """Initialize the AsyncCheckQueue object.
+
+        Args:
+            schedule (CheckSchedule): The history to order hosts by.
+            deadline (float): The time.monotonic() the budget runs out at, if any.
+
+        """
+        super().__init__(schedule, deadline)
+        self._condition = asyncio.Condition()
+
+    async def put(self, hostname: str) -> None:
+        """Add a host.
+
+        Args:
+            hostname (str): The hostname.
+
+        Returns:
+            None
+
+        """
+        async with self._condition:
+            self._push(hostname)
+            self._condition.notify()
+
+    async def close(self) -> None:
+        """Mark every host as added.
+
+        Returns:
+            None
+
+        """
+        async with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    async def get(self) -> str | None:
+        """Wait for the next host to check.
+
+        Returns:
+            str: The hostname, None once there are no more to check.
+
+        """
+        async with self._condition:
+            while True:
+                hostname, finished = self._pop()
+                if hostname is not None or finished:
+                    return hostname
+                try:
+                    await asyncio.wait_for(self._condition.wait(), self._remaining())
+                except asyncio.TimeoutError:
+                    pass
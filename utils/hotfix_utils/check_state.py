@@ -0,0 +1,90 @@
+"""A module for remembering each instrument's repo state between runs."""
+
+import json
+import os
+import threading
+from typing import Dict
+
+
+class CheckStateStore:
+    """A small JSON store of the last known repo state and check result per host.
+
+    Entries are only valid for the configuration they were recorded under (repo
+    directory, upstream branch setting etc.), so changing the configuration makes
+    every instrument get a full check again.
+    """
+
+    def __init__(self, path: str, config_key: str) -> None:
+        """Initialize the CheckStateStore object.
+
+        Args:
+            path (str): The JSON file to keep the state in.
+            config_key (str): A string identifying the current check configuration.
+
+        """
+        self._path = path
+        self._config_key = config_key
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as file:
+                self._entries = json.load(file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, hostname: str) -> Dict | None:
+        """Get the state recorded for a host under the current configuration.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            dict: The recorded state, or None if there isn't one.
+
+        """
+        with self._lock:
+            entry = self._entries.get(hostname)
+        if entry is None or entry.get("config") != self._config_key:
+            return None
+        return entry
+
+    def put(self, hostname: str, entry: Dict) -> None:
+        """Record the state of a host.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            entry (dict): The state to record.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._entries[hostname] = dict(entry, config=self._config_key)
+
+    def discard(self, hostname: str) -> None:
+        """Forget the state of a host, so it gets a full check next time.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._entries.pop(hostname, None)
+
+    def save(self) -> None:
+        """Write the store to disk.
+
+        Returns:
+            None
+
+        """
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary_path = self._path + ".tmp"
+        with self._lock, open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self._entries, file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self._path)
@@ -0,0 +1,171 @@
+"""A module for parsing git log and git status output a line at a time."""
+
+import codecs
+import hashlib
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Dict, List
+
+from ..settings import get_settings
+
+# Characters of a commit subject kept
+MAX_SUBJECT_LENGTH = 200
+
+
+class LineParser(ABC):
+    """Parses command output a line at a time as it arrives.
+
+    A parser can be the stdout_sink of an SSH command or a sink of a batched probe
+    section, so the output is parsed as it arrives rather than held in memory whole.
+    Call close() once the output has finished to parse a last line with no line
+    ending.
+    """
+
+    def __init__(self, sink: BinaryIO = None) -> None:
+        """Initialize the LineParser object.
+
+        Args:
+            sink (BinaryIO): If given, the raw output is also written to this.
+
+        """
+        self._sink = sink
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._partial_line = ""
+
+    def write(self, data: bytes) -> int:
+        """Parse a chunk of the raw output.
+
+        Args:
+            data (bytes): The chunk.
+
+        Returns:
+            int: The number of bytes handled.
+
+        """
+        if self._sink is not None:
+            self._sink.write(data)
+        self.feed(self._decoder.decode(data))
+        return len(data)
+
+    def feed(self, text: str) -> None:
+        """Parse a chunk of the decoded output.
+
+        Args:
+            text (str): The chunk.
+
+        Returns:
+            None
+
+        """
+        lines = (self._partial_line + text).split("\n")
+        self._partial_line = lines.pop()
+        for line in lines:
+            self._parse_line(line.rstrip("\r"))
+
+    def close(self) -> None:
+        """Parse whatever is left once the output has finished.
+
+        Returns:
+            None
+
+        """
+        remaining = self._partial_line + self._decoder.decode(b"", final=True)
+        self._partial_line = ""
+        if remaining:
+            self._parse_line(remaining.rstrip("\r"))
+
+    @abstractmethod
+    def _parse_line(self, line: str) -> None:
+        """Parse one complete line of output, without its line ending."""
+
+
+class GitLogParser(LineParser):
+    """Parses the output of git log --format="%h %s".
+
+    Every commit is counted, but only the first max_commits are kept, with their
+    subjects cut to MAX_SUBJECT_LENGTH characters. A line with no subject is kept
+    with an empty one.
+    """
+
+    def __init__(
+        self,
+        prefix: str = None,
+        max_commits: int = None,
+        sink: BinaryIO = None,
+    ) -> None:
+        """Initialize the GitLogParser object.
+
+        Args:
+            prefix (str): If given, only commits whose subject starts with this are
+                counted.
+            max_commits (int): The most commits to keep (0 for no limit), by default
+                GIT_LOG_MAX_COMMITS.
+            sink (BinaryIO): If given, the raw output is also written to this.
+
+        """
+        super().__init__(sink)
+        self._prefix = prefix
+        if max_commits is None:
+            max_commits = get_settings().git_log_max_commits
+        self._max_commits = max_commits
+        self.commits: Dict[str, str] = {}
+        self.total = 0
+
+    def _parse_line(self, line: str) -> None:
+        commit_hash, _, subject = line.strip().partition(" ")
+        if commit_hash == "":
+            return
+        if self._prefix is not None and not subject.startswith(self._prefix):
+            return
+        self.total += 1
+        if not self._max_commits or len(self.commits) < self._max_commits:
+            self.commits[commit_hash] = subject[:MAX_SUBJECT_LENGTH]
+
+
+class PorcelainStatusParser(LineParser):
+    """Parses the output of git status --porcelain.
+
+    Every changed file is counted, but only the first max_files lines are kept. A
+    digest of the status is worked out as it arrives, to tell whether it has
+    changed between runs.
+    """
+
+    def __init__(self, max_files: int = None, sink: BinaryIO = None) -> None:
+        """Initialize the PorcelainStatusParser object.
+
+        Args:
+            max_files (int): The most status lines to keep (0 for no limit), by
+                default GIT_STATUS_MAX_FILES.
+            sink (BinaryIO): If given, the raw output is also written to this, e.g.
+                to save it in the git status artefact.
+
+        """
+        super().__init__(sink)
+        if max_files is None:
+            max_files = get_settings().git_status_max_files
+        self._max_files = max_files
+        self._digest = hashlib.sha1()
+        self.files: List[str] = []
+        self.total = 0
+
+    def _parse_line(self, line: str) -> None:
+        line = line.rstrip()
+        if line == "":
+            return
+        # the digest is of the whole status stripped of surrounding whitespace, so
+        # it matches the digests recorded before the status was streamed
+        if self.total == 0:
+            self._digest.update(line.lstrip().encode("utf-8"))
+        else:
+            self._digest.update(("\n" + line).encode("utf-8"))
+        self.total += 1
+        if not self._max_files or len(self.files) < self._max_files:
+            self.files.append(line)
+
+    def hexdigest(self) -> str:
+        """Get the digest of the status parsed so far.
+
+        Returns:
+            str: The SHA-1 of the status, as hex.
+
+        """
+        return self._digest.hexdigest()
@@ -0,0 +1,147 @@
+"""A module for running the git checks on an instrument with a script run there."""
+
+import base64
+import json
+import zlib
+from typing import Dict, List
+
+# Run by the instrument's own Python, so it only uses the standard library. It takes
+# its arguments as base64 encoded JSON, runs git in the current directory and
+# prints a single line of JSON. The status digest is worked out the same way as
+# PorcelainStatusParser's, so it can be compared with the digests of other runs.
+REMOTE_CHECK_SCRIPT = r"""
+import base64, hashlib, json, subprocess, sys
+
+def git(*args):
+    process = subprocess.run(
+        ("git",) + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    return process.returncode, process.stdout, process.stderr
+
+def text(data):
+    return data.decode("utf-8", "replace")
+
+def log(revisions, max_commits, listed):
+    code, out, err = git("log", "--format=%h %s", revisions)
+    if code:
+        return {"error": text(err).strip()[-500:]}
+    commits, total = [], 0
+    for line in text(out).splitlines():
+        commit_hash, _, subject = line.strip().partition(" ")
+        if commit_hash:
+            total += 1
+            if listed and (not max_commits or len(commits) < max_commits):
+                commits.append([commit_hash, subject[:200]])
+    return {"total": total, "commits": commits}
+
+args = json.loads(base64.b64decode(sys.argv[1]))
+report = {}
+code, out, err = git("rev-parse", "HEAD")
+report["head"] = text(out).strip() if code == 0 else None
+
+code, out, err = git("fetch", "origin", *args["refspec"])
+report["fetch"] = {"success": code == 0}
+if code:
+    report["fetch"]["output"] = text(out + err).strip()[-500:]
+else:
+    upstream = args["upstream"]
+    report["upstream_not_on_local"] = log(
+        "HEAD.." + upstream, args["max_commits"], args["list_upstream"]
+    )
+    report["local_not_on_upstream"] = log(
+        upstream + "..HEAD", args["max_commits"], True
+    )
+
+code, out, err = git("status", "--porcelain")
+if code:
+    report["status"] = {"error": text(err).strip()[-500:]}
+else:
+    lines = [line.rstrip() for line in text(out).split("\n")]
+    lines = [line for line in lines if line]
+    digest = "\n".join([line.lstrip() for line in lines[:1]] + lines[1:])
+    max_files = args["max_files"]
+    report["status"] = {
+        "total": len(lines),
+        "files": lines[:max_files] if max_files else lines,
+        "digest": hashlib.sha1(digest.encode("utf-8")).hexdigest(),
+    }
+
+code, out, err = git("--no-pager", "diff", "--ignore-cr-at-eol")
+if code:
+    report["diff"] = {"error": text(err).strip()[-500:]}
+else:
+    report["diff"] = {"digest": hashlib.sha1(out).hexdigest(), "bytes": len(out)}
+
+print(json.dumps(report, separators=(",", ":")))
+"""
+
+# The script compressed and encoded once, it is sent with every check
+_ENCODED_SCRIPT = base64.b64encode(
+    zlib.compress(REMOTE_CHECK_SCRIPT.encode("utf-8"), 9)
+).decode("ascii")
+
+
+def remote_check_command(
+    python: str,
+    upstream_branch: str,
+    refspec: List[str],
+    max_commits: int,
+    max_files: int,
+    list_upstream: bool = True,
+) -> str:
+    """Get the command that runs the check script on an instrument.
+
+    The script is sent compressed on the command line, so there is nothing to
+    install on the instruments or keep in step with the checker.
+
+    Args:
+        python (str): The Python interpreter on the instrument.
+        upstream_branch (str): The upstream branch to compare against.
+        refspec (list): What to fetch from origin, empty for all of it.
+        max_commits (int): The most commits to list per comparison (0 for no limit).
+        max_files (int): The most changed files to list (0 for no limit).
+        list_upstream (bool): Whether to list the commits on upstream not on
+            local, or only count them.
+
+    Returns:
+        str: The command, to be run in the repository.
+
+    """
+    arguments = base64.b64encode(
+        json.dumps(
+            {
+                "upstream": upstream_branch,
+                "refspec": refspec,
+                "max_commits": max_commits,
+                "max_files": max_files,
+                "list_upstream": list_upstream,
+            }
+        ).encode("utf-8")
+    ).decode("ascii")
+    loader = (
+        "import base64,zlib;"
+        f"exec(zlib.decompress(base64.b64decode('{_ENCODED_SCRIPT}')))"
+    )
+    return f'"{python}" -c "{loader}" {arguments}'
+
+
+def parse_remote_report(output: str) -> Dict | None:
+    """Get the report printed by the check script.
+
+    Args:
+        output (str): The output of the script.
+
+    Returns:
+        dict: The report, or None if the output isn't one.
+
+    """
+    lines = output.strip().splitlines()
+    if not lines:
+        return None
+    try:
+        report = json.loads(lines[-1])
+    except ValueError:
+        return None
+    if not isinstance(report, dict) or not {"fetch", "status", "diff"} <= set(report):
+        return None
+    return report
@@ -0,0 +1,140 @@
+"""A module for the repositories checked on each instrument."""
+
+import os
+from typing import List
+
+from ..settings import get_settings
+
+
+class RepoTarget:
+    """A repository to check on each instrument and how to pick its upstream branch.
+
+    An unnamed target is the single REPO_DIR/UPSTREAM_BRANCH_CONFIG repository of a
+    run, and keeps its artefacts at the top of the workspace. Named targets each get
+    their own directory in the workspace for their git_status artefacts, results,
+    check state and run history.
+    """
+
+    __slots__ = ("name", "repo_dir", "upstream_config", "artefact_dir")
+
+    def __init__(
+        self,
+        repo_dir: str,
+        upstream_config: str,
+        artefact_dir: str,
+        name: str | None = None,
+    ) -> None:
+        """Initialize the RepoTarget object.
+
+        Args:
+            repo_dir (str): The directory of the repository on the instruments.
+            upstream_config (str): How to pick the upstream branch, as in
+                UPSTREAM_BRANCH_CONFIG (hostname, epics, main, master or a branch).
+            artefact_dir (str): The directory to save the target's artefacts in.
+            name (str): The name of the target, None for the only target of a run.
+
+        """
+        self.name = name
+        self.repo_dir = repo_dir
+        self.upstream_config = upstream_config
+        self.artefact_dir = artefact_dir
+
+    def config_key(self) -> str:
+        """Get a string identifying the settings that affect the target's results.
+
+        Returns:
+            str: The repo directory, upstream branch and messages settings.
+
+        """
+        return "|".join(
+            [
+                self.repo_dir,
+                self.upstream_config,
+                str(get_settings().show_uncommitted_changes_messages).lower(),
+            ]
+        )
+
+    def label(self, hostname: str) -> str:
+        """Get how to refer to an instrument's copy of the repository in the logs.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            str: e.g. "NDXALF" or "NDXALF (epics)".
+
+        """
+        return hostname if self.name is None else f"{hostname} ({self.name})"
+
+
+def default_target() -> RepoTarget:
+    """Get the single target given by REPO_DIR and UPSTREAM_BRANCH_CONFIG.
+
+    Returns:
+        RepoTarget: The target.
+
+    Raises:
+        KeyError: If REPO_DIR, UPSTREAM_BRANCH_CONFIG or WORKSPACE isn't set.
+
+    """
+    settings = get_settings()
+    settings.require("repo_dir", "upstream_branch_config", "workspace")
+    return RepoTarget(
+        settings.repo_dir, settings.upstream_branch_config, settings.workspace
+    )
+
+
+def parse_repo_targets(spec: str, workspace: str) -> List[RepoTarget]:
+    """Parse a list of targets, as given in REPO_TARGETS.
+
+    Targets are separated by semicolons or new lines, and each is the repo directory
+    and upstream branch config separated by |, optionally followed by | and a name.
+    The name defaults to the last part of the repo directory, lowercased, so a
+    target for the EPICS directory is named "epics".
+
+    Args:
+        spec (str): The targets.
+        workspace (str): The workspace, each target gets a directory in it.
+
+    Returns:
+        list: The targets.
+
+    Raises:
+        ValueError: If a target is malformed or two targets have the same name.
+
+    """
+    targets = []
+    for entry in spec.replace("\n", ";").split(";"):
+        if entry.strip() == "":
+            continue
+        fields = [field.strip() for field in entry.split("|")]
+        if len(fields) not in (2, 3) or "" in fields:
+            raise ValueError(
+                f"REPO_TARGETS entry {entry!r} should be repo_dir|upstream[|name]"
+            )
+        repo_dir, upstream_config = fields[:2]
+        if len(fields) == 3:
+            name = fields[2]
+        else:
+            name = repo_dir.rstrip("\\/").replace("\\", "/").rsplit("/", 1)[-1]
+            name = name.lower()
+        if any(target.name == name for target in targets):
+            raise ValueError(f"REPO_TARGETS has more than one target named {name!r}")
+        targets.append(
+            RepoTarget(repo_dir, upstream_config, os.path.join(workspace, name), name)
+        )
+    return targets
+
+
+def repo_targets() -> List[RepoTarget]:
+    """Get the targets of the run, from REPO_TARGETS or else REPO_DIR.
+
+    Returns:
+        list: The targets.
+
+    """
+    settings = get_settings()
+    if settings.repo_targets.strip() == "":
+        return [default_target()]
+    settings.require("workspace")
+    return parse_repo_targets(settings.repo_targets, settings.workspace)
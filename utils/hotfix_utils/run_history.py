@@ -0,0 +1,376 @@
+"""A module for keeping the results of every run, to see how instruments drift."""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+from .check import CHECK
+
+# The direction of a commit relative to the upstream branch, as stored in the history
+LOCAL = "local"
+UPSTREAM = "upstream"
+
+_CHECK_COLUMNS = (
+    "commits_upstream_not_on_local",
+    "commits_local_not_on_upstream",
+    "uncommitted_changes",
+)
+
+# Whether each direction's commits were all listed, to compare with the run before
+_COMPLETE_COLUMNS = {LOCAL: "local_complete", UPSTREAM: "upstream_complete"}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS host_results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    host TEXT NOT NULL,
+    upstream_branch TEXT,
+    {", ".join(f"{column} TEXT" for column in _CHECK_COLUMNS)},
+    undeterminable INTEGER NOT NULL,
+    reason TEXT,
+    seconds REAL,
+    status_digest TEXT,
+    local_complete INTEGER,
+    upstream_complete INTEGER,
+    PRIMARY KEY (host, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS host_results_run ON host_results (run_id, undeterminable);
+CREATE TABLE IF NOT EXISTS host_commits (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    host TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    subject TEXT,
+    PRIMARY KEY (host, hash, direction, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS host_commits_run ON host_commits (run_id, host);
+"""
+
+
+class RunHistoryStore:
+    """An append-only SQLite history of every host's check results, run by run.
+
+    Each run adds one row per host with its check results, why it was undeterminable,
+    how long it took and a digest of its git status, plus one row per commit found
+    on the host but not upstream or upstream but not on the host. Nothing is ever
+    updated or deleted, so questions like when a hotfix first appeared on a host, or
+    which hosts have been undeterminable for several runs, and what changed since
+    the last run, are answered from the indexes without reading any artefacts.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the RunHistoryStore object.
+
+        Args:
+            path (str): The SQLite database file to keep the history in.
+
+        """
+        self._path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database, creating it and its tables if needed.
+
+        Returns:
+            sqlite3.Connection: The connection, close it when done.
+
+        """
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        connection = sqlite3.connect(self._path)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(_SCHEMA)
+        # a history started before the completeness of commit lists was recorded
+        columns = {
+            row["name"] for row in connection.execute("PRAGMA table_info(host_results)")
+        }
+        for column in _COMPLETE_COLUMNS.values():
+            if column not in columns:
+                connection.execute(
+                    f"ALTER TABLE host_results ADD COLUMN {column} INTEGER"
+                )
+        return connection
+
+    def record_run(self, results: Iterable[Dict], config: str = None) -> int:
+        """Append the results of a run to the history.
+
+        Args:
+            results (iterable): A dict per host with "host", "upstream_branch", a
+                "checks" dict of CHECK names keyed by check, "reason", "seconds",
+                "status_digest", a "commits" dict of {hash: subject} dicts keyed
+                by LOCAL or UPSTREAM and a "complete" dict of whether each of those
+                lists every commit, keyed the same way.
+            config (str): A string identifying the configuration the run used.
+
+        Returns:
+            int: The id of the new run.
+
+        """
+        with closing(self._connect()) as connection, connection:
+            run_id = connection.execute(
+                "INSERT INTO runs (started, config) VALUES (?, ?)",
+                (datetime.now(timezone.utc).isoformat(timespec="seconds"), config),
+            ).lastrowid
+            for result in results:
+                checks = [result["checks"].get(column) for column in _CHECK_COLUMNS]
+                connection.execute(
+                    f"INSERT INTO host_results (run_id, host, upstream_branch, "
+                    f"{', '.join(_CHECK_COLUMNS)}, undeterminable, reason, seconds, "
+                    f"status_digest, {', '.join(_COMPLETE_COLUMNS.values())}) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        result["host"],
+                        result.get("upstream_branch"),
+                        *checks,
+                        int(CHECK.UNDETERMINABLE.name in checks),
+                        result.get("reason"),
+                        result.get("seconds"),
+                        result.get("status_digest"),
+                        *(
+                            int(bool(result.get("complete", {}).get(direction)))
+                            for direction in _COMPLETE_COLUMNS
+                        ),
+                    ),
+                )
+                connection.executemany(
+                    "INSERT OR IGNORE INTO host_commits "
+                    "(run_id, host, direction, hash, subject) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (run_id, result["host"], direction, commit_hash, subject)
+                        for direction, commits in result.get("commits", {}).items()
+                        for commit_hash, subject in (commits or {}).items()
+                    ],
+                )
+        return run_id
+
+    def runs(self, count: int = 10) -> List[Dict]:
+        """Get the most recent runs, newest first.
+
+        Args:
+            count (int): The number of runs to get.
+
+        Returns:
+            list: The id, start time (UTC) and configuration of each run.
+
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT id, started, config FROM runs ORDER BY id DESC LIMIT ?",
+                (count,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def first_seen(
+        self, host: str, commit_hash: str, direction: str = LOCAL
+    ) -> Dict | None:
+        """Find the first run a commit was seen on a host, e.g. when a hotfix appeared.
+
+        Args:
+            host (str): The hostname.
+            commit_hash (str): The commit hash, abbreviated or in full.
+            direction (str): LOCAL for commits on the host but not upstream, UPSTREAM
+                for commits upstream but not on the host.
+
+        Returns:
+            dict: The run id, its start time, the hash and the subject, or None if
+                the commit has never been seen on the host.
+
+        """
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT runs.id AS run_id, runs.started, hash, subject "
+                "FROM host_commits JOIN runs ON runs.id = host_commits.run_id "
+                "WHERE host = ? AND direction = ? "
+                "AND (hash = substr(?, 1, length(hash)) OR hash LIKE ? || '%') "
+                "ORDER BY runs.id LIMIT 1",
+                (host, direction, commit_hash, commit_hash),
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    def consecutive_undeterminable(self, runs: int = 3) -> List[str]:
+        """Get the hosts that were undeterminable in each of the most recent runs.
+
+        Args:
+            runs (int): The number of most recent runs.
+
+        Returns:
+            list: The hostnames, sorted.
+
+        """
+        with closing(self._connect()) as connection:
+            run_ids = [
+                row["id"]
+                for row in connection.execute(
+                    "SELECT id FROM runs ORDER BY id DESC LIMIT ?", (runs,)
+                )
+            ]
+            if len(run_ids) < runs:
+                return []
+            rows = connection.execute(
+                f"SELECT host FROM host_results "
+                f"WHERE run_id IN ({', '.join('?' * len(run_ids))}) "
+                f"AND undeterminable = 1 GROUP BY host HAVING COUNT(*) = ? "
+                f"ORDER BY host",
+                (*run_ids, runs),
+            ).fetchall()
+        return [row["host"] for row in rows]
+
+    def changes_since_previous_run(self, run_id: int = None) -> List[Dict]:
+        """Get what changed on each host between a run and the run before it.
+
+        Args:
+            run_id (int): The run, or None for the latest run.
+
+        Returns:
+            list: A dict per change with the "host", the "kind" of change ("new
+                host", "host gone", "check", "status", "commit appeared" or "commit
+                gone") and its details, sorted by host. Empty if there is no
+                previous run.
+
+        """
+        with closing(self._connect()) as connection:
+            if run_id is None:
+                run_id = connection.execute("SELECT MAX(id) FROM runs").fetchone()[0]
+            previous_id = connection.execute(
+                "SELECT MAX(id) FROM runs WHERE id < ?", (run_id,)
+            ).fetchone()[0]
+            if run_id is None or previous_id is None:
+                return []
+
+            current = self._host_results(connection, run_id)
+            previous = self._host_results(connection, previous_id)
+            changes = []
+            for host in sorted(set(current) | set(previous)):
+                if host not in previous:
+                    changes.append({"host": host, "kind": "new host"})
+                    continue
+                if host not in current:
+                    changes.append({"host": host, "kind": "host gone"})
+                    continue
+                for column in _CHECK_COLUMNS:
+                    if current[host][column] != previous[host][column]:
+                        changes.append(
+                            {
+                                "host": host,
+                                "kind": "check",
+                                "check": column,
+                                "before": previous[host][column],
+                                "after": current[host][column],
+                                "reason": current[host]["reason"],
+                            }
+                        )
+                # a change of status is only news if the check result didn't change
+                if (
+                    current[host]["status_digest"] != previous[host]["status_digest"]
+                    and current[host]["uncommitted_changes"]
+                    == previous[host]["uncommitted_changes"]
+                    and current[host]["status_digest"] is not None
+                    and previous[host]["status_digest"] is not None
+                ):
+                    changes.append({"host": host, "kind": "status"})
+
+            for kind, newer, older in (
+                ("commit appeared", run_id, previous_id),
+                ("commit gone", previous_id, run_id),
+            ):
+                # only hosts in both runs, a new or gone host is reported as such
+                rows = connection.execute(
+                    "SELECT newer.host, newer.direction, newer.hash, newer.subject "
+                    "FROM host_commits AS newer "
+                    "JOIN host_results AS both_runs "
+                    "ON both_runs.host = newer.host AND both_runs.run_id = ? "
+                    "LEFT JOIN host_commits AS older "
+                    "ON older.host = newer.host AND older.hash = newer.hash "
+                    "AND older.direction = newer.direction AND older.run_id = ? "
+                    "WHERE newer.run_id = ? AND older.hash IS NULL",
+                    (older, older, newer),
+                ).fetchall()
+                # a commit missing from an undeterminable or capped list isn't news
+                changes.extend(
+                    {
+                        "host": row["host"],
+                        "kind": kind,
+                        "direction": row["direction"],
+                        "hash": row["hash"],
+                        "subject": row["subject"],
+                    }
+                    for row in rows
+                    if self._commits_complete(current, row["host"], row["direction"])
+                    and self._commits_complete(previous, row["host"], row["direction"])
+                )
+        changes.sort(key=lambda change: change["host"])
+        return changes
+
+    @staticmethod
+    def _host_results(connection: sqlite3.Connection, run_id: int) -> Dict[str, Dict]:
+        """Get every host's results from a run.
+
+        Args:
+            connection (sqlite3.Connection): The open database.
+            run_id (int): The run.
+
+        Returns:
+            dict: The results of each host keyed by hostname.
+
+        """
+        rows = connection.execute(
+            "SELECT * FROM host_results WHERE run_id = ?", (run_id,)
+        ).fetchall()
+        return {row["host"]: dict(row) for row in rows}
+
+    @staticmethod
+    def _commits_complete(
+        host_results: Dict[str, Dict], host: str, direction: str
+    ) -> bool:
+        """Whether a run listed every commit of a host in one direction.
+
+        Args:
+            host_results (dict): The run's results, as returned by _host_results.
+            host (str): The hostname.
+            direction (str): LOCAL or UPSTREAM.
+
+        Returns:
+            bool: False if the commits were undeterminable, only counted or capped,
+                or the run was recorded before completeness was.
+
+        """
+        result = host_results.get(host)
+        return result is not None and bool(result[_COMPLETE_COLUMNS[direction]])
+
+    @staticmethod
+    def change_lines(changes: List[Dict]) -> List[str]:
+        """Get console lines describing the changes since the previous run.
+
+        Args:
+            changes (list): The changes, as returned by changes_since_previous_run.
+
+        Returns:
+            list: The lines.
+
+        """
+        if not changes:
+            return ["INFO: No changes since the previous run"]
+        lines = [f"INFO: Changes since the previous run ({len(changes)}):"]
+        for change in changes:
+            if change["kind"] == "check":
+                detail = f"{change['check']} {change['before']} -> {change['after']}"
+                if change["after"] == CHECK.UNDETERMINABLE.name and change["reason"]:
+                    detail += f" ({change['reason']})"
+            elif change["kind"] == "status":
+                detail = "uncommitted changes are different"
+            elif change["kind"] in ("commit appeared", "commit gone"):
+                where = "on host" if change["direction"] == LOCAL else "upstream"
+                detail = (
+                    f"{change['kind']} {where}: {change['hash']} {change['subject']}"
+                )
+            else:
+                detail = change["kind"]
+            lines.append(f"INFO:   {change['host']}: {detail}")
+        return lines
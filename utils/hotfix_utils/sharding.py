@@ -0,0 +1,167 @@
+"""A module for splitting a run across several agents and merging their results."""
+
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from .check import CHECK
+from .check_result import CHECK_NAMES, CheckResult, ResultSummary
+
+# Why an instrument has no result after merging shards
+SHARD_MISSING = "shard missing"
+NOT_CHECKED = "not checked"
+
+
+def shard_of(hostname: str, count: int) -> int:
+    """Get which shard an instrument belongs to.
+
+    The hash is stable across processes and machines (unlike hash()), and case
+    insensitive, so every agent puts each instrument in the same shard.
+
+    Args:
+        hostname (str): The hostname of the instrument.
+        count (int): The number of shards.
+
+    Returns:
+        int: The shard index, from 0 to count - 1.
+
+    """
+    digest = hashlib.sha256(hostname.strip().lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def shard_results_path(artefact_dir: str, index: int, count: int) -> str:
+    """Get where a shard saves its results.
+
+    Args:
+        artefact_dir (str): The shard's artefact directory.
+        index (int): The shard index.
+        count (int): The number of shards.
+
+    Returns:
+        str: The path of the results file.
+
+    """
+    return os.path.join(artefact_dir, f"results_shard_{index}_of_{count}.json")
+
+
+def save_shard_results(
+    path: str,
+    summary: ResultSummary,
+    index: int,
+    count: int,
+    instruments: List[str],
+    seconds: Dict[str, float],
+) -> None:
+    """Save a shard's results for merging.
+
+    Args:
+        path (str): The file to save the results to.
+        summary (ResultSummary): The shard's results.
+        index (int): The shard index.
+        count (int): The number of shards.
+        instruments (list): Every instrument in the run in order, not just the
+            shard's, so the merge can put them in order and spot missing ones.
+        seconds (dict): How long each instrument's check took, keyed by hostname.
+
+    Returns:
+        None
+
+    """
+    saved = summary.to_dict()
+    saved.update(
+        {
+            "shard": {"index": index, "count": count},
+            "instruments": instruments,
+            "seconds": seconds,
+        }
+    )
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(saved, file, indent=1)
+
+
+def find_shard_results(paths: Iterable[str]) -> List[str]:
+    """Find the shard result files at some paths.
+
+    Args:
+        paths (iterable): Result files, or directories containing them.
+
+    Returns:
+        list: The result files.
+
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "results_shard_*.json"))))
+        else:
+            files.append(path)
+    return files
+
+
+def merge_shard_results(
+    files: Iterable[str],
+) -> Tuple[ResultSummary, List[str], Dict[str, float]]:
+    """Merge the results saved by each shard of a run.
+
+    An instrument whose shard's results are missing, or that has no result in its
+    shard's results, is reported as undeterminable.
+
+    Args:
+        files (iterable): The shard result files.
+
+    Returns:
+        ResultSummary: The merged results.
+        list: Every instrument in the run, in instrument list order.
+        dict: How long each instrument's check took, keyed by hostname.
+
+    Raises:
+        ValueError: If the files aren't from shards of the same run.
+
+    """
+    summary = ResultSummary()
+    instruments: List[str] = []
+    seconds: Dict[str, float] = {}
+    count = None
+    shards = set()
+    for file_name in files:
+        with open(file_name, encoding="utf-8") as file:
+            saved = json.load(file)
+        shard = saved["shard"]
+        if count is None:
+            count = shard["count"]
+        elif shard["count"] != count:
+            raise ValueError(
+                f"{file_name} is from a run split {shard['count']} ways, not {count}"
+            )
+        if shard["index"] in shards:
+            raise ValueError(
+                f"{file_name} is a second result for shard {shard['index']}"
+            )
+        shards.add(shard["index"])
+        summary.merge(ResultSummary.from_dict(saved))
+        instruments.extend(
+            host for host in saved["instruments"] if host not in instruments
+        )
+        seconds.update(saved["seconds"])
+
+    if count is None:
+        raise ValueError("there are no shard results to merge")
+
+    checked = {result.hostname for result in summary.results()}
+    for hostname in instruments:
+        if hostname in checked:
+            continue
+        result = CheckResult(hostname)
+        for name in CHECK_NAMES:
+            setattr(result, name, CHECK.UNDETERMINABLE)
+        result.reason = (
+            NOT_CHECKED if shard_of(hostname, count) in shards else SHARD_MISSING
+        )
+        summary.add(result)
+    return summary, instruments, seconds
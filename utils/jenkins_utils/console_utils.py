@@ -0,0 +1,110 @@
+"""Module provides a console wrapper that keeps each worker's output together."""
+
+import io
+import sys
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, TextIO
+
+# Each thread and each asyncio task sees its own value, so this works for both the
+# thread pool and the async check engine
+_capture_buffer: ContextVar[Optional[io.StringIO]] = ContextVar(
+    "capture_buffer", default=None
+)
+
+
+class BufferedConsole:
+    """Stand-in for sys.stdout that buffers output per worker thread or task.
+
+    Workers that have entered capture() write to their own buffer, everything else
+    goes straight to the real stream. This stops the log lines of instruments
+    checked in parallel from interleaving in the Jenkins console, which the
+    parse_rules log parser relies on.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        """Initialize the BufferedConsole object.
+
+        Args:
+            stream (TextIO): The stream to write to, normally sys.stdout.
+
+        """
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        """Write text to the current worker's buffer, or to the stream if none.
+
+        Args:
+            text (str): The text to write.
+
+        Returns:
+            int: The number of characters written.
+
+        """
+        buffer = _capture_buffer.get()
+        if buffer is not None:
+            return buffer.write(text)
+        with self._lock:
+            return self._stream.write(text)
+
+    def flush(self) -> None:
+        """Flush the underlying stream.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._stream.flush()
+
+    def emit(self, text: str) -> None:
+        """Write a block of text to the stream in one go.
+
+        Args:
+            text (str): The text to write.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._stream.write(text)
+            self._stream.flush()
+
+    def __getattr__(self, name: str) -> object:
+        """Delegate anything else (encoding, isatty etc.) to the real stream."""
+        return getattr(self._stream, name)
+
+    @contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        """Buffer everything printed by the current thread or asyncio task.
+
+        Yields:
+            io.StringIO: The buffer holding the captured output.
+
+        """
+        buffer = io.StringIO()
+        token = _capture_buffer.set(buffer)
+        try:
+            yield buffer
+        finally:
+            _capture_buffer.reset(token)
+
+
+@contextmanager
+def buffered_stdout() -> Iterator[BufferedConsole]:
+    """Replace sys.stdout with a BufferedConsole for the duration of the block.
+
+    Yields:
+        BufferedConsole: The console installed as sys.stdout.
+
+    """
+    original = sys.stdout
+    console = BufferedConsole(original)
+    sys.stdout = console
+    try:
+        yield console
+    finally:
+        sys.stdout = original
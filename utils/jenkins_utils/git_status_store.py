@@ -0,0 +1,359 @@
+"""Module provides a content addressed store for the git status artefacts.
+
+Each unique git status and diff is saved once, gzip compressed, as
+blobs/<sha256>.gz in the git_status directory, and each host gets a small
+<host>.json manifest naming the blob it saved last. Most instruments' status is the
+same from one night to the next, so most runs only rewrite the manifests.
+
+The store is kept in the workspace from one build to the next. Blobs first stored
+by the current run are also linked into new_blobs/, so a build only needs to
+archive the manifests and its new blobs. An unchanged host's blob is in the archive
+of the build that first stored it.
+"""
+
+import glob
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, Iterable, Set
+
+# The name of the directory of the blobs in the git_status directory
+BLOBS_DIR = "blobs"
+
+# The name of the directory of the blobs first stored by the current run
+NEW_BLOBS_DIR = "new_blobs"
+
+
+def _link_new_blob(blob_path: str, new_blobs_dir: str) -> None:
+    """Add a blob to the blobs first stored by this run.
+
+    Args:
+        blob_path (str): The path of the blob in the store.
+        new_blobs_dir (str): The directory of the new blobs.
+
+    Returns:
+        None
+
+    """
+    os.makedirs(new_blobs_dir, exist_ok=True)
+    new_path = os.path.join(new_blobs_dir, os.path.basename(blob_path))
+    if os.path.exists(new_path):
+        return
+    try:
+        os.link(blob_path, new_path)
+    except OSError:
+        # e.g. a file system without hard links
+        shutil.copy2(blob_path, new_path)
+
+
+class BlobWriter:
+    """Compresses and hashes an artefact as it is written, then stores it as a blob.
+
+    The artefact is written through gzip to a temporary file in the blobs
+    directory, with its SHA-256 worked out on the way, so it is never held in
+    memory. The gzip header has no name or time in it, so the same artefact always
+    gives the same blob.
+    """
+
+    def __init__(self, blobs_dir: str, new_blobs_dir: str = None) -> None:
+        """Initialize the BlobWriter object.
+
+        Args:
+            blobs_dir (str): The directory of the blobs.
+            new_blobs_dir (str): The directory to also link the blob into if it is
+                new to the store, if any.
+
+        """
+        os.makedirs(blobs_dir, exist_ok=True)
+        self._blobs_dir = blobs_dir
+        self._new_blobs_dir = new_blobs_dir
+        self._hash = hashlib.sha256()
+        self._bytes = 0
+        self._part = tempfile.NamedTemporaryFile(
+            dir=blobs_dir, suffix=".part", delete=False
+        )
+        self._gzip = gzip.GzipFile(filename="", mode="wb", fileobj=self._part, mtime=0)
+
+    def write(self, data: bytes) -> int:
+        """Write a chunk of the artefact.
+
+        Args:
+            data (bytes): The chunk.
+
+        Returns:
+            int: The number of bytes written.
+
+        """
+        self._hash.update(data)
+        self._bytes += len(data)
+        return self._gzip.write(data)
+
+    def close(self) -> Dict:
+        """Finish the blob and move it into the store, unless it is there already.
+
+        Returns:
+            dict: The "digest", "bytes" of the artefact and "stored" bytes of the
+                blob, for the manifest.
+
+        """
+        self._gzip.close()
+        self._part.close()
+        digest = self._hash.hexdigest()
+        blob_path = os.path.join(self._blobs_dir, f"{digest}.gz")
+        if os.path.exists(blob_path):
+            os.remove(self._part.name)
+        else:
+            os.replace(self._part.name, blob_path)
+            if self._new_blobs_dir is not None:
+                _link_new_blob(blob_path, self._new_blobs_dir)
+        return {
+            "digest": digest,
+            "bytes": self._bytes,
+            "stored": os.path.getsize(blob_path),
+        }
+
+    def discard(self) -> None:
+        """Remove the temporary file without storing the blob.
+
+        Returns:
+            None
+
+        """
+        self._gzip.close()
+        self._part.close()
+        if os.path.exists(self._part.name):
+            os.remove(self._part.name)
+
+
+class GitStatusStore:
+    """The git status artefacts of one git_status directory."""
+
+    def __init__(self, directory: str, archived_blobs_dirs: Iterable[str] = ()) -> None:
+        """Initialize the GitStatusStore object.
+
+        Args:
+            directory (str): The git_status directory.
+            archived_blobs_dirs (iterable): Other directories to look for blobs in
+                when reading artefacts, e.g. the new_blobs of earlier builds.
+
+        """
+        self.directory = directory
+        self.blobs_dir = os.path.join(directory, BLOBS_DIR)
+        self.new_blobs_dir = os.path.join(directory, NEW_BLOBS_DIR)
+        self._archived_blobs_dirs = list(archived_blobs_dirs)
+
+    def manifest_path(self, hostname: str) -> str:
+        """Get the path of the manifest of a host.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            str: The path of the manifest.
+
+        """
+        return os.path.join(self.directory, f"{hostname}.json")
+
+    def blob_path(self, digest: str) -> str:
+        """Get the path of a blob.
+
+        Args:
+            digest (str): The SHA-256 of the artefact.
+
+        Returns:
+            str: The path of the blob.
+
+        """
+        return os.path.join(self.blobs_dir, f"{digest}.gz")
+
+    def find_blob(self, digest: str) -> str | None:
+        """Find a blob in the store, or in its new or archived blobs.
+
+        Args:
+            digest (str): The SHA-256 of the artefact.
+
+        Returns:
+            str: The path of the blob, None if it isn't in any of them.
+
+        """
+        for blobs_dir in (
+            self.blobs_dir,
+            self.new_blobs_dir,
+            *self._archived_blobs_dirs,
+        ):
+            path = os.path.join(blobs_dir, f"{digest}.gz")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def start_run(self) -> None:
+        """Forget which blobs the previous run stored first, before a new run.
+
+        Returns:
+            None
+
+        """
+        shutil.rmtree(self.new_blobs_dir, ignore_errors=True)
+
+    def open_blob(self) -> BlobWriter:
+        """Open a writer for a new artefact, store it with save().
+
+        Returns:
+            BlobWriter: The writer.
+
+        """
+        return BlobWriter(self.blobs_dir, self.new_blobs_dir)
+
+    def save(self, hostname: str, blob: BlobWriter, truncated: bool = False) -> None:
+        """Store an artefact and point the host's manifest at it.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            blob (BlobWriter): The writer the artefact was written to.
+            truncated (bool): Whether the diff in it was cut short.
+
+        Returns:
+            None
+
+        """
+        manifest = blob.close()
+        manifest["truncated"] = truncated
+        path = self.manifest_path(hostname)
+        with open(path + ".part", "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(path + ".part", path)
+        # an artefact saved before the store was used would be archived as well
+        text_path = os.path.join(self.directory, f"{hostname}.txt")
+        if os.path.exists(text_path):
+            os.remove(text_path)
+
+    def manifest(self, hostname: str) -> Dict | None:
+        """Get the manifest of a host.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            dict: The manifest, None if there isn't one or it can't be read.
+
+        """
+        try:
+            with open(self.manifest_path(hostname), "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return manifest if isinstance(manifest, dict) else None
+
+    def has(self, hostname: str) -> bool:
+        """Whether a host has an artefact in the store.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            bool: True if the host has a manifest and the blob it names is there.
+
+        """
+        manifest = self.manifest(hostname)
+        return (
+            manifest is not None
+            and self.find_blob(manifest.get("digest", "")) is not None
+        )
+
+    def remove(self, hostname: str) -> None:
+        """Remove the artefact of a host, its blob is removed by prune().
+
+        Args:
+            hostname (str): The hostname of the instrument.
+
+        Returns:
+            None
+
+        """
+        for path in (
+            self.manifest_path(hostname),
+            os.path.join(self.directory, f"{hostname}.txt"),
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def hostnames(self) -> Set[str]:
+        """Get the hosts with a manifest.
+
+        Returns:
+            set: The hostnames.
+
+        """
+        return {
+            os.path.splitext(os.path.basename(path))[0]
+            for path in glob.glob(os.path.join(self.directory, "*.json"))
+        }
+
+    def extract(self, hostname: str, file: BinaryIO) -> bool:
+        """Write out the artefact of a host, a chunk at a time.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            file (BinaryIO): Where to write the artefact.
+
+        Returns:
+            bool: True if it was written, False if the host has no artefact.
+
+        """
+        manifest = self.manifest(hostname)
+        blob_path = (
+            None if manifest is None else self.find_blob(manifest.get("digest", ""))
+        )
+        if blob_path is None:
+            return False
+        with gzip.open(blob_path, "rb") as blob:
+            shutil.copyfileobj(blob, file)
+        return True
+
+    def prune(self) -> int:
+        """Remove the blobs no manifest points at, and any left part written.
+
+        Unreferenced blobs are also removed from new_blobs, so they aren't archived.
+
+        Returns:
+            int: The number of files removed from the blobs directory.
+
+        """
+        referenced = {
+            f"{manifest['digest']}.gz"
+            for manifest in map(self.manifest, self.hostnames())
+            if manifest is not None and "digest" in manifest
+        }
+        removed = 0
+        for path in glob.glob(os.path.join(self.blobs_dir, "*")):
+            if os.path.basename(path) not in referenced:
+                os.remove(path)
+                removed += 1
+        for path in glob.glob(os.path.join(self.new_blobs_dir, "*")):
+            if os.path.basename(path) not in referenced:
+                os.remove(path)
+        return removed
+
+    def copy_from(self, other: "GitStatusStore") -> None:
+        """Copy the manifests of another store, and the blobs missing from this one.
+
+        The blobs copied are new to this store, so are linked into its new_blobs.
+
+        Args:
+            other (GitStatusStore): The store to copy from.
+
+        Returns:
+            None
+
+        """
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(other.blobs_dir, "*.gz")):
+            blob_path = os.path.join(self.blobs_dir, os.path.basename(path))
+            if not os.path.exists(blob_path):
+                shutil.copy2(path, blob_path)
+                _link_new_blob(blob_path, self.new_blobs_dir)
+        for hostname in other.hostnames():
+            shutil.copy2(other.manifest_path(hostname), self.directory)
@@ -1,11 +1,249 @@
 """Module provides a utility class for interacting with Jenkins."""
 
 import os
+import shutil
+from typing import BinaryIO
+
+from ..settings import get_settings
+from .git_status_store import GitStatusStore
+
+
+class GitStatusWriter:
+    """Streams an instrument's git diff to disk, then saves it after its status.
+
+    The diff is written to a part file as it arrives, so it never has to be held in
+    memory, and save() writes the artefact as the status followed by the diff, the
+    same layout as JenkinsUtils.save_git_status. The status can be streamed to its
+    own part file too. Given a store, the artefact is saved to it as a compressed
+    blob rather than to the path.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = None,
+        store: GitStatusStore = None,
+        hostname: str = None,
+    ) -> None:
+        """Initialize the GitStatusWriter object.
+
+        Args:
+            path (str): The path of the artefact, and of its part files.
+            max_bytes (int): The most bytes of diff to save (0 for no limit), by
+                default GIT_STATUS_MAX_BYTES.
+            store (GitStatusStore): The store to save the artefact to, if any.
+            hostname (str): The hostname of the instrument, needed with a store.
+
+        """
+        if max_bytes is None:
+            max_bytes = get_settings().git_status_max_bytes
+        self._path = path
+        self._max_bytes = max_bytes
+        self._store = store
+        self._hostname = hostname
+        self._written = 0
+        self._truncated = False
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._part = open(path + ".part", "wb")
+        self._status_part = None
+
+    def write(self, data: bytes) -> int:
+        """Write a chunk of the diff, dropping anything past the size limit.
+
+        Args:
+            data (bytes): The chunk.
+
+        Returns:
+            int: The number of bytes handled.
+
+        """
+        if self._max_bytes and self._written + len(data) > self._max_bytes:
+            self._truncated = True
+            self._part.write(data[: max(0, self._max_bytes - self._written)])
+            self._written = max(self._written, self._max_bytes)
+        else:
+            self._part.write(data)
+            self._written += len(data)
+        return len(data)
+
+    def status_sink(self) -> BinaryIO:
+        """Get a file to stream the git status to, for save() to put before the diff.
+
+        Returns:
+            BinaryIO: The status part file.
+
+        """
+        if self._status_part is None:
+            self._status_part = open(self._path + ".status.part", "wb")
+        return self._status_part
+
+    def save(self, status: str = None, include_diff: bool = True) -> None:
+        """Save the artefact.
+
+        Args:
+            status (str): The git status of the instrument, by default the status
+                written to status_sink().
+            include_diff (bool): Whether to save the diff written so far.
+
+        Returns:
+            None
+
+        """
+        self._part.close()
+        if self._status_part is not None:
+            self._status_part.close()
+        if self._store is None:
+            with open(self._path, "wb") as file:
+                self._write_artefact(file, status, include_diff)
+        else:
+            blob = self._store.open_blob()
+            try:
+                self._write_artefact(blob, status, include_diff)
+            except BaseException:
+                blob.discard()
+                raise
+            self._store.save(
+                self._hostname, blob, truncated=include_diff and self._truncated
+            )
+        self.discard()
+
+    def _write_artefact(
+        self, file: BinaryIO, status: str | None, include_diff: bool
+    ) -> None:
+        """Write the status, then the diff, from the part files to the artefact.
+
+        Args:
+            file (BinaryIO): The artefact.
+            status (str): The git status, None for the status part file.
+            include_diff (bool): Whether to write the diff.
+
+        Returns:
+            None
+
+        """
+        if status is not None:
+            file.write(status.encode("utf-8"))
+        elif self._status_part is not None:
+            with open(self._path + ".status.part", "rb") as part:
+                shutil.copyfileobj(part, file)
+        if include_diff:
+            file.write(b"\n\n")
+            with open(self._path + ".part", "rb") as part:
+                shutil.copyfileobj(part, file)
+            if self._truncated:
+                file.write(f"\n[diff truncated at {self._max_bytes} bytes]\n".encode())
+
+    def discard(self) -> None:
+        """Remove the part files without saving the artefact.
+
+        Returns:
+            None
+
+        """
+        self._part.close()
+        if self._status_part is not None:
+            self._status_part.close()
+        for part_path in (self._path + ".part", self._path + ".status.part"):
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def __enter__(self) -> "GitStatusWriter":
+        """Use the writer as a context manager that cleans up its part files.
+
+        Returns:
+            GitStatusWriter: The writer.
+
+        """
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Remove the part files if they are still there.
+
+        Args:
+            args (object): The exception details, if any.
+
+        """
+        self.discard()
 
 
 class JenkinsUtils:
     """Utility class for interacting with Jenkins."""
 
+    @staticmethod
+    def git_status_path(
+        hostname: str,
+        artefact_dir: str,
+    ) -> str:
+        """Get the path of the git status artefact for a host.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            artefact_dir (str): The directory the status is saved in.
+
+        Returns:
+            str: The path of the artefact.
+
+        """
+        return os.path.join(artefact_dir, "git_status", f"{hostname}.txt")
+
+    @staticmethod
+    def git_status_store(artefact_dir: str) -> GitStatusStore | None:
+        """Get the store the git status artefacts are saved to.
+
+        Args:
+            artefact_dir (str): The directory the statuses are saved in.
+
+        Returns:
+            GitStatusStore: The store, None unless GIT_STATUS_STORE is on.
+
+        """
+        if not get_settings().git_status_store:
+            return None
+        return GitStatusStore(os.path.join(artefact_dir, "git_status"))
+
+    @staticmethod
+    def git_status_saved(
+        hostname: str,
+        artefact_dir: str,
+    ) -> bool:
+        """Whether the git status artefact of a host is there.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            artefact_dir (str): The directory the status is saved in.
+
+        Returns:
+            bool: True if the artefact, or its manifest and blob, are there.
+
+        """
+        store = JenkinsUtils.git_status_store(artefact_dir)
+        if store is not None:
+            return store.has(hostname)
+        return os.path.exists(JenkinsUtils.git_status_path(hostname, artefact_dir))
+
+    @staticmethod
+    def open_git_status(
+        hostname: str,
+        artefact_dir: str,
+    ) -> GitStatusWriter:
+        """Open a writer to stream the git diff of a host to its artefact.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            artefact_dir (str): The directory to save the status to.
+
+        Returns:
+            GitStatusWriter: The writer, use it as a context manager.
+
+        """
+        return GitStatusWriter(
+            JenkinsUtils.git_status_path(hostname, artefact_dir),
+            store=JenkinsUtils.git_status_store(artefact_dir),
+            hostname=hostname,
+        )
+
     @staticmethod
     def save_git_status(
         hostname: str,
@@ -23,13 +261,44 @@ class JenkinsUtils:
             None
 
         """
-        # log the output to a workspace file for viewing later
-        if not os.path.exists(os.path.join(artefact_dir, "git_status")):
-            os.makedirs(os.path.join(artefact_dir, "git_status"))
+        # log the output to a workspace file for viewing later, workers saving at
+        # the same time may both find the directory missing
+        os.makedirs(os.path.join(artefact_dir, "git_status"), exist_ok=True)
+
+        store = JenkinsUtils.git_status_store(artefact_dir)
+        if store is not None:
+            blob = store.open_blob()
+            blob.write(status.encode("utf-8"))
+            store.save(hostname, blob)
+            return
 
         with open(
-            os.path.join(artefact_dir, "git_status", f"{hostname}.txt"),
+            JenkinsUtils.git_status_path(hostname, artefact_dir),
             "w",
-            encoding="utf-8"
+            encoding="utf-8",
         ) as file:
             file.write(status)
+
+    @staticmethod
+    def remove_git_status(
+        hostname: str,
+        artefact_dir: str,
+    ) -> None:
+        """Remove the git status artefact of a host, if it has one.
+
+        Args:
+            hostname (str): The hostname of the instrument.
+            artefact_dir (str): The directory the status is saved in.
+
+        Returns:
+            None
+
+        """
+        store = JenkinsUtils.git_status_store(artefact_dir)
+        if store is not None:
+            store.remove(hostname)
+            return
+
+        path = JenkinsUtils.git_status_path(hostname, artefact_dir)
+        if os.path.exists(path):
+            os.remove(path)
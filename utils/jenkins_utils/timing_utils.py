@@ -0,0 +1,280 @@
+"""Module records how long each part of a run takes, per host and per command."""
+
+import csv
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List
+
+# The number of hosts listed in the slowest hosts summary
+SLOWEST_HOSTS_SHOWN = 10
+
+# The phases of SSH commands shown in the slowest hosts summary
+SSH_PHASES = ("connect", "auth", "exec", "read")
+
+
+def describe_command(command: str) -> str:
+    """Get a short name for a command sent to an instrument, to group timings by.
+
+    Args:
+        command (str): The command line.
+
+    Returns:
+        str: e.g. "git log" or "batched probe".
+
+    """
+    command = command.strip()
+    if command.lower().startswith("cd /d ") and "&&" in command:
+        command = command.split("&&", 1)[1].strip()
+    if command.lower().startswith("cmd "):
+        return "batched probe"
+    return " ".join(command.split()[:2])
+
+
+class TimingRecorder:
+    """Collects the time taken by each phase of the work done against each host.
+
+    A record is one phase of one operation against one host, e.g. the "read" phase
+    of "git log" on NDXA, with the bytes transferred during it. Records with no host
+    are for the run as a whole, e.g. instrument discovery.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the TimingRecorder object."""
+        self._lock = threading.Lock()
+        self._records: List[Dict] = []
+
+    def record(
+        self,
+        host: str | None,
+        operation: str,
+        phase: str,
+        seconds: float,
+        size: int = 0,
+    ) -> None:
+        """Record the time taken by a phase of an operation.
+
+        Args:
+            host (str): The host the operation was against, or None for the run.
+            operation (str): What was being done, e.g. "git log".
+            phase (str): The part of the operation, e.g. "read".
+            seconds (float): The time it took.
+            size (int): The bytes transferred.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._records.append(
+                {
+                    "host": host,
+                    "operation": operation,
+                    "phase": phase,
+                    "seconds": round(seconds, 6),
+                    "bytes": size,
+                }
+            )
+
+    @contextmanager
+    def measure(
+        self,
+        host: str | None,
+        operation: str,
+        phase: str,
+    ) -> Iterator[Dict[str, int]]:
+        """Time the body of a with block as a phase of an operation.
+
+        Args:
+            host (str): The host the operation is against, or None for the run.
+            operation (str): What is being done, e.g. "git log".
+            phase (str): The part of the operation, e.g. "read".
+
+        Yields:
+            dict: Set "bytes" in this to record the bytes transferred.
+
+        """
+        transferred = {"bytes": 0}
+        start = time.perf_counter()
+        try:
+            yield transferred
+        finally:
+            self.record(
+                host,
+                operation,
+                phase,
+                time.perf_counter() - start,
+                transferred["bytes"],
+            )
+
+    def records(self) -> List[Dict]:
+        """Get every record made so far.
+
+        Returns:
+            list: The records.
+
+        """
+        with self._lock:
+            return list(self._records)
+
+    def clear(self) -> None:
+        """Forget every record made so far.
+
+        Returns:
+            None
+
+        """
+        with self._lock:
+            self._records = []
+
+    def discard(self, hosts: Iterable[str]) -> None:
+        """Forget the records made for some hosts.
+
+        Args:
+            hosts (iterable): The hostnames to forget.
+
+        Returns:
+            None
+
+        """
+        hosts = set(hosts)
+        with self._lock:
+            self._records = [
+                record for record in self._records if record["host"] not in hosts
+            ]
+
+    def host_summaries(self) -> Dict[str, Dict]:
+        """Get the total time, time per SSH phase and bytes for each host checked.
+
+        A host's total is the time its whole check took, if that was recorded,
+        otherwise the sum of its SSH phases.
+
+        Returns:
+            dict: The summary of each host keyed by hostname.
+
+        """
+        summaries = {}
+        for record in self.records():
+            is_total = record["operation"] == "check" and record["phase"] == "total"
+            if record["host"] is None or not (
+                is_total or record["phase"] in SSH_PHASES
+            ):
+                continue
+            summary = summaries.setdefault(
+                record["host"],
+                {"total": None, "bytes": 0, **{phase: 0.0 for phase in SSH_PHASES}},
+            )
+            if is_total:
+                summary["total"] = record["seconds"]
+            else:
+                summary[record["phase"]] += record["seconds"]
+                summary["bytes"] += record["bytes"]
+        for summary in summaries.values():
+            if summary["total"] is None:
+                summary["total"] = sum(summary[phase] for phase in SSH_PHASES)
+        return summaries
+
+    def summary_lines(self, count: int = SLOWEST_HOSTS_SHOWN) -> List[str]:
+        """Get console lines summarising the run's timings and its slowest hosts.
+
+        Args:
+            count (int): The number of hosts to list.
+
+        Returns:
+            list: The lines.
+
+        """
+        lines = []
+        for record in self.records():
+            if record["host"] is None:
+                lines.append(
+                    f"INFO: {record['operation']} {record['phase']} took "
+                    f"{record['seconds']:.2f}s"
+                )
+
+        summaries = self.host_summaries()
+        slowest = sorted(
+            summaries.items(), key=lambda item: item[1]["total"], reverse=True
+        )[:count]
+        if slowest:
+            lines.append(f"INFO: Slowest hosts (of {len(summaries)}):")
+        for host, summary in slowest:
+            phases = ", ".join(f"{phase} {summary[phase]:.2f}s" for phase in SSH_PHASES)
+            lines.append(
+                f"INFO:   {host} {summary['total']:.2f}s "
+                f"({phases}, {summary['bytes']} bytes)"
+            )
+        return lines
+
+    def save(self, artefact_dir: str) -> None:
+        """Save the records as timings.json and timings.csv in the artefact directory.
+
+        Args:
+            artefact_dir (str): The directory to save the timings to.
+
+        Returns:
+            None
+
+        """
+        if not os.path.exists(artefact_dir):
+            os.makedirs(artefact_dir)
+        records = self.records()
+        with open(
+            os.path.join(artefact_dir, "timings.json"), "w", encoding="utf-8"
+        ) as file:
+            json.dump(
+                {"hosts": self.host_summaries(), "records": records}, file, indent=1
+            )
+        with open(
+            os.path.join(artefact_dir, "timings.csv"), "w", encoding="utf-8", newline=""
+        ) as file:
+            writer = csv.DictWriter(
+                file, fieldnames=["host", "operation", "phase", "seconds", "bytes"]
+            )
+            writer.writeheader()
+            writer.writerows(records)
+
+
+timings = TimingRecorder()
+
+
+def timed(operation: str) -> Callable:
+    """Time every call of a method of an object that has a hostname.
+
+    The phase recorded is the method's name, without any _async suffix so both check
+    engines' timings line up. Works for coroutine methods as well.
+
+    Args:
+        operation (str): The operation to record the calls under.
+
+    Returns:
+        Callable: The decorator.
+
+    """
+
+    def decorator(method: Callable) -> Callable:
+        phase = method.__name__.removesuffix("_async")
+
+        if inspect.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def async_wrapper(
+                self: object, *args: object, **kwargs: object
+            ) -> object:
+                with timings.measure(self.hostname, operation, phase):
+                    return await method(self, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self: object, *args: object, **kwargs: object) -> object:
+            with timings.measure(self.hostname, operation, phase):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
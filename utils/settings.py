@@ -0,0 +1,206 @@
+"""Module provides the checker's configuration, read from the environment once."""
+
+import os
+from typing import List, Mapping
+
+# environment variables whose names don't follow from the setting's name
+_VARIABLES = {
+    "ssh_user": "SSH_CREDENTIALS_USR",
+    "ssh_password": "SSH_CREDENTIALS_PSW",
+}
+
+
+def _flag(environ: Mapping[str, str], name: str, default: bool) -> bool:
+    """Read a true/false setting.
+
+    Args:
+        environ (Mapping): The environment.
+        name (str): The name of the variable.
+        default (bool): The value when the variable isn't set.
+
+    Returns:
+        bool: True if the variable is "true", or unset and the default is True.
+
+    """
+    return environ.get(name, "true" if default else "false") == "true"
+
+
+def _list(environ: Mapping[str, str], name: str, default: str = "") -> List[str]:
+    """Read a comma separated setting.
+
+    Args:
+        environ (Mapping): The environment.
+        name (str): The name of the variable.
+        default (str): The value when the variable isn't set.
+
+    Returns:
+        list: The items, stripped of whitespace, without any empty ones.
+
+    """
+    items = [item.strip() for item in environ.get(name, default).split(",")]
+    return [item for item in items if item != ""]
+
+
+def _optional_float(environ: Mapping[str, str], name: str) -> float | None:
+    """Read a number setting that has no default here.
+
+    Args:
+        environ (Mapping): The environment.
+        name (str): The name of the variable.
+
+    Returns:
+        float: The number, None if the variable isn't set.
+
+    """
+    value = environ.get(name, "")
+    return float(value) if value.strip() != "" else None
+
+
+class Settings:
+    """The checker's configuration.
+
+    Every setting is read and converted once, when the object is made, so a run
+    can't see a setting change part way through and a malformed value fails at
+    start up rather than part way through a check. Settings that have no sensible
+    default are None when unset, call require() before using them.
+    """
+
+    def __init__(self, environ: Mapping[str, str] = None) -> None:
+        """Initialize the Settings object.
+
+        Args:
+            environ (Mapping): The environment to read, by default os.environ.
+
+        """
+        if environ is None:
+            environ = os.environ
+
+        # what to check
+        self.repo_dir = environ.get("REPO_DIR")
+        self.upstream_branch_config = environ.get("UPSTREAM_BRANCH_CONFIG")
+        self.repo_targets = environ.get("REPO_TARGETS", "")
+        self.epics_parent_branches = _list(
+            environ, "EPICS_PARENT_BRANCHES", "galil-old,main"
+        )
+        self.workspace = environ.get("WORKSPACE")
+
+        # where to check it
+        self.ssh_user = environ.get("SSH_CREDENTIALS_USR")
+        self.ssh_password = environ.get("SSH_CREDENTIALS_PSW")
+        self.use_test_instrument_list = _flag(
+            environ, "USE_TEST_INSTRUMENT_LIST", False
+        )
+        self.test_instrument_list = _list(environ, "TEST_INSTRUMENT_LIST")
+        self.instrument_scope = environ.get("INSTRUMENT_SCOPE", "latest_ibex")
+        self.extra_hosts = _list(environ, "EXTRA_HOSTS")
+        self.shard_index = int(environ.get("SHARD_INDEX", "0"))
+        self.shard_count = int(environ.get("SHARD_COUNT", "1"))
+
+        # what to report
+        self.debug_mode = _flag(environ, "DEBUG_MODE", False)
+        self.show_uncommitted_changes_messages = _flag(
+            environ, "SHOW_UNCOMMITTED_CHANGES_MESSAGES", False
+        )
+        self.git_log_max_commits = int(environ.get("GIT_LOG_MAX_COMMITS", "100"))
+        self.git_status_max_files = int(environ.get("GIT_STATUS_MAX_FILES", "100"))
+        self.git_status_max_bytes = int(environ.get("GIT_STATUS_MAX_BYTES", "0"))
+        self.git_status_store = _flag(environ, "GIT_STATUS_STORE", False)
+        self.run_history = _flag(environ, "RUN_HISTORY", True)
+
+        # how to check it
+        self.check_workers = int(environ.get("CHECK_WORKERS", "1"))
+        self.check_engine = environ.get("CHECK_ENGINE", "threads")
+        self.async_max_in_flight = int(environ.get("ASYNC_MAX_IN_FLIGHT", "200"))
+        self.host_timeout = float(environ.get("HOST_TIMEOUT", "0")) or None
+        self.run_timeout = float(environ.get("RUN_TIMEOUT", "0")) or None
+        self.schedule_by_history = _flag(environ, "SCHEDULE_BY_HISTORY", True)
+        self.batched_probe = _flag(environ, "BATCHED_PROBE", False)
+        self.narrow_fetch = _flag(environ, "NARROW_FETCH", False)
+        self.commit_counts_only = _flag(environ, "COMMIT_COUNTS_ONLY", False)
+        self.incremental_check = _flag(environ, "INCREMENTAL_CHECK", False)
+        self.remote_check = _flag(environ, "REMOTE_CHECK", False)
+        self.remote_python = environ.get(
+            "REMOTE_PYTHON", "C:\\Instrument\\Apps\\Python3\\python.exe"
+        )
+
+        # SSH
+        self.ssh_port = int(environ.get("SSH_PORT", "22"))
+        self.ssh_max_output = int(environ.get("SSH_MAX_OUTPUT", str(16 * 1024 * 1024)))
+        self.ssh_reuse_sessions = environ.get("SSH_REUSE_SESSIONS", "true") != "false"
+        self.ssh_connect_timeout = float(environ.get("SSH_CONNECT_TIMEOUT", "10"))
+        self.ssh_retries = int(environ.get("SSH_RETRIES", "2"))
+        self.ssh_retry_backoff = float(environ.get("SSH_RETRY_BACKOFF", "1"))
+        self.ssh_circuit_threshold = int(environ.get("SSH_CIRCUIT_THRESHOLD", "3"))
+        self.reachability_prepass = _flag(environ, "REACHABILITY_PREPASS", True)
+        self.reachability_workers = int(environ.get("REACHABILITY_WORKERS", "32"))
+
+        # instrument discovery, None for the defaults of the modules doing it
+        self.stream_discovery = _flag(environ, "STREAM_DISCOVERY", True)
+        self.instlist_cache_max_age = _optional_float(environ, "INSTLIST_CACHE_MAX_AGE")
+        self.http_timeout = _optional_float(environ, "HTTP_TIMEOUT")
+        self.version_cache_ttl = float(environ.get("VERSION_CACHE_TTL", "0"))
+        self.version_lookup_workers = int(environ.get("VERSION_LOOKUP_WORKERS", "8"))
+
+    def require(self, *names: str) -> None:
+        """Check settings with no default have been given.
+
+        Args:
+            names (str): The attribute names of the settings.
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: Naming the environment variables of any missing settings.
+
+        """
+        missing = [
+            _VARIABLES.get(name, name.upper())
+            for name in names
+            if getattr(self, name) is None
+        ]
+        if missing:
+            raise KeyError(f"Environment variables not set: {', '.join(missing)}")
+
+    def require_for_check(self) -> None:
+        """Check the settings a check run needs have been given.
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: Naming the environment variables of any missing settings.
+
+        """
+        names = ["workspace", "ssh_user", "ssh_password"]
+        if self.repo_targets.strip() == "":
+            names += ["repo_dir", "upstream_branch_config"]
+        self.require(*names)
+
+
+_settings: Settings | None = None
+
+
+def get_settings() -> Settings:
+    """Get the settings of the run, reading them the first time they are needed.
+
+    Returns:
+        Settings: The settings.
+
+    """
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """Read the settings again, e.g. after the environment has been changed.
+
+    Returns:
+        Settings: The new settings.
+
+    """
+    global _settings
+    _settings = Settings()
+    return _settings